@@ -0,0 +1,134 @@
+# POP/audit.py
+# Auditoria de dados: só o contexto de cada BPMN (parser + maps + regras de
+# negócio), sem template ODT, sem render e sem workspace. Um objeto JSON por
+# processo (JSON Lines), em paralelo sobre o corpus:
+#
+#   python -m POP.cli --audit bpmns/ > auditoria.jsonl
+#   python -m POP.cli --audit "bpmns/**/*.bpmn" --audit-out auditoria.jsonl --workers 8
+#   python -m POP.cli --audit lote.zip
+#
+# Cada linha: arquivo, status, codigo, nome_processo, versao, setores, NVL_*,
+# objetivos, indicadores, número de atividades, `faltando` (campos pop:
+# obrigatórios vazios no BPMN: os com constraints.notEmpty no pop-template.json),
+# `avisos` e `valido`.
+from __future__ import annotations
+import contextlib, glob, io, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .limits import JobError
+from .service import DEFAULT_CAM_MAP, _apply_business_rules
+
+def faltando(raw: dict, plan) -> list[str]:
+    """Campos obrigatórios do plano (ExtractionPlan) vazios ou ausentes na saída do parse_bpmn_pop."""
+    props = raw.get("propriedades_pop", {})
+    return [f"pop:{c}" for c in plan.required_fields if not props.get(c) or not str(props[c]).strip()]
+
+def audit_record(nome: str, fonte, camunda_map_path=DEFAULT_CAM_MAP) -> dict:
+    """
+    Registro de auditoria de um BPMN (`fonte`: caminho ou bytes). Erros viram
+    status="erro" em vez de exceção, para não parar o corpus.
+    """
+    from .build_context.extraction_plan import compile_plan
+    from .build_context.parser_bpmn import parse_bpmn_pop
+    from .build_context.pipeline_pop import context_from_raw
+
+    rec = {"arquivo": nome, "status": "ok", "erro": ""}
+    try:
+        plan = compile_plan(str(camunda_map_path))
+        # o parser narra o progresso no stdout, que aqui pode ser a própria saída JSONL
+        with contextlib.redirect_stdout(io.StringIO()):
+            raw = parse_bpmn_pop(io.BytesIO(fonte) if isinstance(fonte, bytes) else fonte, plan=plan)
+        if not raw:
+            raise JobError("bpmn_invalido", "Falha ao ler BPMN: XML inválido ou sem o participante do POP")
+        # mesmo caminho da geração (hydrate_from_bpmn): atividades contadas como no ODT
+        ctx = _apply_business_rules(context_from_raw(raw))
+    except Exception as e:
+        rec.update(status="erro", tipo=getattr(e, "kind", "falha"), erro=str(e), valido=False)
+        return rec
+
+    avisos = []
+    atividades = ctx.get("descricao_processo_atividades") or []
+    if not atividades:
+        avisos.append("sem_atividades")
+    if not raw.get("propriedades_grupos", {}).get("indicadorEstrategico"):
+        avisos.append("sem_indicadores")
+    falta = faltando(raw, plan)
+    rec.update({
+        "codigo": ctx.get("codigo", ""),
+        "nome_processo": ctx.get("nome_processo", ""),
+        "versao": str(raw.get("propriedades_pop", {}).get("versao") or ""),
+        "setor_superior": ctx.get("setor_superior", ""),
+        "setor_executor": ctx.get("setor_executor", ""),
+        "NVL_GERENCIAL": ctx.get("NVL_GERENCIAL", ""),
+        "NVL_OPERACIONAL": ctx.get("NVL_OPERACIONAL", ""),
+        "objetivos_estrategicos": ctx.get("objetivos_estrategicos", []),
+        "indicadores_estrategicos": ctx.get("indicadores_estrategicos", []),
+        "atividades": len(atividades),
+        "faltando": falta,
+        "avisos": avisos,
+        "valido": not falta,
+    })
+    return rec
+
+def _audit_lote(itens: list, camunda_map_path) -> list[dict]:
+    return [audit_record(nome, fonte, camunda_map_path) for nome, fonte in itens]
+
+def iter_corpus(spec: str):
+    """(nome, caminho ou bytes) de um diretório (recursivo), glob, arquivo .bpmn ou .zip/.tar(.gz)."""
+    p = Path(spec)
+    if p.is_dir():
+        for f in sorted(p.rglob("*.bpmn")):
+            yield str(f), str(f)
+    elif p.is_file() and p.suffix.lower() not in (".bpmn", ".xml"):
+        from .batch import iter_archive_bpmns
+        yield from iter_archive_bpmns(p)
+    else:
+        for f in sorted(glob.glob(spec, recursive=True)):
+            yield f, f
+
+def iter_audit(itens, workers: int | None = None, camunda_map_path=DEFAULT_CAM_MAP, chunksize: int = 8):
+    """
+    Registros de auditoria de `itens` ((nome, caminho ou bytes)), na ordem de
+    entrada. Com workers > 1 roda num ProcessPool (o parse é CPU puro), em
+    lotes de `chunksize`, com no máximo 2 lotes por worker em voo: `itens`
+    é consumido aos poucos mesmo quando traz o conteúdo em bytes.
+    """
+    from collections import deque
+    from itertools import islice
+    workers = workers or os.cpu_count() or 1
+    itens = iter(itens)
+    if workers <= 1:
+        for nome, fonte in itens:
+            yield audit_record(nome, fonte, camunda_map_path)
+        return
+    with ProcessPoolExecutor(workers) as ex:
+        voo = deque()
+        while True:
+            while len(voo) < workers * 2:
+                lote = list(islice(itens, chunksize))
+                if not lote:
+                    break
+                voo.append(ex.submit(_audit_lote, lote, str(camunda_map_path)))
+            if not voo:
+                return
+            yield from voo.popleft().result()
+
+def write_jsonl(registros, out) -> dict:
+    """Grava um objeto JSON por linha em `out` (arquivo texto aberto). Devolve totais."""
+    tot = {"processos": 0, "erros": 0, "invalidos": 0}
+    for r in registros:
+        out.write(json.dumps(r, ensure_ascii=False) + "\n")
+        tot["processos"] += 1
+        tot["erros"] += r["status"] != "ok"
+        tot["invalidos"] += r["status"] == "ok" and not r["valido"]
+    out.flush()
+    return tot
+
+def run_audit(spec: str, out=None, workers: int | None = None, camunda_map_path=DEFAULT_CAM_MAP) -> dict:
+    """Audita o corpus `spec` e grava o JSONL em `out` (caminho, '-' ou None = stdout)."""
+    regs = iter_audit(iter_corpus(spec), workers, camunda_map_path)
+    if out in (None, "-"):
+        return write_jsonl(regs, sys.stdout)
+    with open(out, "w", encoding="utf-8") as f:
+        return write_jsonl(regs, f)
@@ -0,0 +1,153 @@
+# POP/batch.py
+# Lote arquivo -> arquivo: lê BPMNs direto de um .zip / .tar(.gz) (sem extrair
+# para disco), gera cada ODT com o template compartilhado e grava tudo num
+# único arquivo de saída (.zip ou .tar/.tar.gz), com um manifest.json no fim:
+#   [{"membro", "codigo", "nome_processo", "arquivo", "status", "tipo", "erro"}, ...]
+# ("tipo" é o JobError.kind das falhas: entrada_grande, xml_invalido, tempo_excedido, ...)
+from __future__ import annotations
+import contextlib, io, json, sys, tarfile, time, zipfile
+from pathlib import Path, PurePosixPath
+
+from .limits import JobError, JobLimits, LimitedWorker
+from .search_index import index_context
+from .workspace import sync_file
+from .service import DEFAULT_TEMPLATE, DEFAULT_CAM_MAP, extract_context, _final_name
+
+BPMN_SUFFIXES = (".bpmn", ".xml")
+MANIFEST_NAME = "manifest.json"
+
+def _is_bpmn_member(name: str) -> bool:
+    p = PurePosixPath(name)
+    if any(part == "__MACOSX" for part in p.parts) or p.name.startswith("."):
+        return False
+    return p.suffix.lower() in BPMN_SUFFIXES
+
+def _open_source(src):
+    """Caminho, '-' (stdin) ou arquivo binário -> arquivo binário com peek()."""
+    if hasattr(src, "read"):
+        return contextlib.nullcontext(src if hasattr(src, "peek") else io.BufferedReader(io.BytesIO(src.read())))
+    if str(src) == "-":
+        return contextlib.nullcontext(sys.stdin.buffer)
+    return open(src, "rb")
+
+def iter_archive_bpmns(src):
+    """
+    Itera (nome, bytes) dos BPMNs de um zip ou tar(.gz/.bz2/.xz), sem extrair.
+    Tar é lido em modo stream; zip precisa de acesso aleatório, então um zip
+    vindo de stream não posicionável é carregado em memória.
+    """
+    with _open_source(src) as f:
+        head = f.peek(4)[:4]
+        if head.startswith(b"PK\x03\x04") or head.startswith(b"PK\x05\x06"):
+            zsrc = f if f.seekable() else io.BytesIO(f.read())
+            with zipfile.ZipFile(zsrc) as zin:
+                for zi in zin.infolist():
+                    if not zi.is_dir() and _is_bpmn_member(zi.filename):
+                        yield zi.filename, zin.read(zi)
+            return
+        with tarfile.open(fileobj=f, mode="r|*") as tin:
+            for ti in tin:
+                if ti.isfile() and _is_bpmn_member(ti.name):
+                    yield ti.name, tin.extractfile(ti).read()
+
+class _ArchiveWriter:
+    """Escrita incremental em .zip ou .tar/.tar.gz/.tgz, conforme a extensão."""
+
+    def __init__(self, dst):
+        self._dst = dst
+        name = str(getattr(dst, "name", dst)).lower()
+        self.kind = "tar" if name.endswith((".tar", ".tar.gz", ".tgz")) else "zip"
+        mode = "w:gz" if name.endswith((".tar.gz", ".tgz")) else "w"
+        if self.kind == "zip":
+            self._zip = zipfile.ZipFile(dst, "w", compression=zipfile.ZIP_DEFLATED)
+        elif hasattr(dst, "write"):
+            self._tar = tarfile.open(fileobj=dst, mode="w|gz" if mode == "w:gz" else "w|")
+        else:
+            self._tar = tarfile.open(dst, mode)
+
+    def add(self, name: str, blob: bytes):
+        if self.kind == "zip":
+            self._zip.writestr(name, blob)
+            return
+        ti = tarfile.TarInfo(name)
+        ti.size = len(blob)
+        ti.mtime = int(time.time())
+        self._tar.addfile(ti, io.BytesIO(blob))
+
+    def close(self):
+        (self._zip if self.kind == "zip" else self._tar).close()
+
+def _unique(name: str, used: set) -> str:
+    if name not in used:
+        used.add(name)
+        return name
+    stem, suffix = name.rsplit(".", 1)
+    i = 2
+    while f"{stem}_{i}.{suffix}" in used:
+        i += 1
+    name = f"{stem}_{i}.{suffix}"
+    used.add(name)
+    return name
+
+def _gera_membro(blob: bytes, template_path: str, camunda_map_path: str, output_format: str):
+    """Um BPMN do lote -> (contexto, documento). Nível de módulo: roda também num LimitedWorker."""
+    ctx = extract_context(io.BytesIO(blob), camunda_map_path)
+    if output_format == "fodt":
+        from .render.flat_odt import render_fodt
+        buf = io.BytesIO()
+        render_fodt(template_path, ctx, buf)
+        return ctx, buf.getvalue()
+    from .render import render_odt
+    return ctx, render_odt(template_path, ctx)
+
+def run_archive_batch(
+    src,
+    dst,
+    template_path: str | Path = DEFAULT_TEMPLATE,
+    camunda_map_path: str | Path = DEFAULT_CAM_MAP,
+    output_format: str = "odt",
+    limits: JobLimits | None = None,
+) -> list[dict]:
+    """
+    Gera um ODT por BPMN de `src` e grava todos em `dst`, mais o manifest.json.
+    Um BPMN com erro não interrompe o lote: vira uma linha status="erro".
+    Com `output_format="fodt"` cada membro é um ODT plano com imagens embutidas.
+    Com durabilidade file/group (workspace.set_durability) o arquivo de saída
+    recebe fsync (e o diretório dele) ao final.
+    `limits` (padrão: JobLimits.from_env) barra BPMNs grandes demais; com tempo
+    ou memória limitados cada membro roda num LimitedWorker, trocado quando estoura.
+    """
+    limits = limits or JobLimits.from_env()
+    manifest, used = [], {MANIFEST_NAME}
+    to_stdout = str(dst) == "-"
+    out = _ArchiveWriter(sys.stdout.buffer if to_stdout else dst)
+    # o parser escreve progresso no stdout; com o arquivo saindo por lá, desvia para stderr
+    quiet = contextlib.redirect_stdout(sys.stderr) if to_stdout else contextlib.nullcontext()
+    worker = LimitedWorker(limits, stdout_to_stderr=to_stdout) if limits.isolado else None
+    try:
+        with quiet:
+            for member, blob in iter_archive_bpmns(src):
+                row = {"membro": member, "codigo": "", "nome_processo": "", "arquivo": "",
+                       "status": "ok", "tipo": "", "erro": ""}
+                try:
+                    limits.check_input(len(blob))
+                    args = (blob, str(template_path), str(camunda_map_path), output_format)
+                    ctx, odt = worker.run(_gera_membro, *args) if worker else _gera_membro(*args)
+                    row["codigo"] = ctx.get("codigo", "")
+                    row["nome_processo"] = ctx.get("nome_processo", "")
+                    index_context(ctx)
+                    row["arquivo"] = _unique(_final_name(ctx, output_format), used)
+                    out.add(row["arquivo"], odt)
+                except JobError as e:
+                    row["status"], row["tipo"], row["erro"] = "erro", e.kind, str(e)
+                except Exception as e:
+                    row["status"], row["tipo"], row["erro"] = "erro", "falha", str(e)
+                manifest.append(row)
+        out.add(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"))
+    finally:
+        out.close()
+        if worker is not None:
+            worker.close()
+    if not to_stdout and not hasattr(dst, "write"):
+        sync_file(dst)
+    return manifest
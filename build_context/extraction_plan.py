@@ -0,0 +1,124 @@
+# extraction_plan.py
+# Compila o pop-template.json num plano de extração das propriedades zeebe:
+#   - quais bindings são listas ("//" na descrição do campo)
+#   - quais mapeiam código -> rótulo via `choices`
+#   - quais formam grupos numerados (dicionarioN_*, objetivoEstrategicoN, palavraChaveN, ...)
+#   - quais são obrigatórios (`constraints.notEmpty`, que o Modeler também valida)
+# O plano é compilado uma vez por template (cache pelo conteúdo) e
+# roda numa única passada sobre as propriedades do participante.
+
+import hashlib, json, re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_TEMPLATE_JSON = Path(__file__).resolve().parent.parent / "templates" / "pop-template.json"
+
+# nomeN  ou  nomeN_campo   (ex.: objetivoEstrategico2, dicionario3_significado)
+_GRUPO_RE = re.compile(r"^([A-Za-z]+?)(\d+)(?:_([A-Za-z]\w*))?$")
+
+class FieldSpec:
+    __slots__ = ("name", "is_list", "choices", "group", "required")
+
+    def __init__(self, name: str, is_list: bool, choices: Optional[Dict[str, str]],
+                 group: Optional[Tuple[str, int, str]], required: bool = False):
+        self.name = name            # sem o prefixo "pop:"
+        self.is_list = is_list
+        self.choices = choices      # código -> rótulo, ou None
+        self.group = group          # (base, N, campo) ou None; campo "valor" quando não há sufixo
+        self.required = required    # constraints.notEmpty no template
+
+class ExtractionPlan:
+    def __init__(self, fields: Dict[str, FieldSpec], header_choices: Optional[Dict[str, Dict[str, str]]] = None):
+        self.fields = fields
+        self.header_choices = header_choices or {}   # "pop:__header_x__" -> choices (só p/ choice_maps)
+
+    @property
+    def list_fields(self) -> List[str]:
+        return [f.name for f in self.fields.values() if f.is_list]
+
+    @property
+    def required_fields(self) -> List[str]:
+        """Campos com constraints.notEmpty, na ordem do template."""
+        return [f.name for f in self.fields.values() if f.required]
+
+    def choice_maps(self) -> Dict[str, Dict[str, str]]:
+        """Mesmo formato de build_maps_from_template_json: "pop:campo" -> {código: rótulo}."""
+        maps = {f"pop:{f.name}": dict(f.choices) for f in self.fields.values() if f.choices}
+        maps.update((k, dict(v)) for k, v in self.header_choices.items())
+        return maps
+
+    def extract(self, pairs: Iterable[Tuple[str, str]]) -> dict:
+        """
+        Uma passada sobre (nome, valor) das propriedades. Devolve:
+          valores : campo -> str (ou lista, para campos "//")
+          rotulos : campo -> rótulo legível (só campos com choices e valor preenchido)
+          grupos  : base -> [{"n": N, campo: valor legível, ...}] em ordem de N
+        Propriedades fora do template entram em `valores` como texto.
+        """
+        valores, rotulos, grupos = {}, {}, {}
+        for name, value in pairs:
+            if not name:
+                continue
+            if name.startswith("pop:"):
+                name = name[4:]
+            value = (value or "").strip()
+            spec = self.fields.get(name)
+            if spec is None:
+                valores[name] = value
+                continue
+            if spec.is_list and value:
+                valores[name] = [item.strip() for item in value.split("//")]
+                continue
+            valores[name] = value
+            legivel = value
+            if spec.choices is not None and value:
+                legivel = spec.choices.get(value, value)
+                rotulos[name] = legivel
+            if spec.group is not None:
+                base, n, campo = spec.group
+                grupos.setdefault(base, {}).setdefault(n, {"n": n})[campo] = legivel
+        return {
+            "valores": valores,
+            "rotulos": rotulos,
+            "grupos": {base: [g[n] for n in sorted(g)] for base, g in grupos.items()},
+        }
+
+def _compile(props: list) -> ExtractionPlan:
+    fields: Dict[str, FieldSpec] = {}
+    headers: Dict[str, Dict[str, str]] = {}
+    for p in props:
+        binding = p.get("binding", {}) or {}
+        full = binding.get("name") or ""
+        name = full[4:] if full.startswith("pop:") else full
+        choices = None
+        if p.get("choices"):
+            choices = {ch.get("value"): ch.get("name") for ch in p["choices"] if ch.get("value") is not None}
+        if not name or name.startswith("__"):   # cabeçalhos visuais do template
+            if name and choices:
+                headers[full] = choices
+            continue
+        is_list = "//" in (p.get("description") or "")
+        group = None
+        m = _GRUPO_RE.match(name)
+        if m and not is_list:
+            group = (m.group(1), int(m.group(2)), m.group(3) or "valor")
+        required = bool((p.get("constraints") or {}).get("notEmpty"))
+        fields[name] = FieldSpec(name, is_list, choices, group, required)
+    return ExtractionPlan(fields, headers)
+
+_PLANS: Dict[str, ExtractionPlan] = {}
+
+def compile_plan(template_json_path=DEFAULT_TEMPLATE_JSON) -> ExtractionPlan:
+    """
+    Plano compilado do pop-template.json. O cache é pelo conteúdo (sha1), pois o
+    serviço isola uma cópia do arquivo por job: caminhos mudam, o conteúdo não.
+    """
+    with open(template_json_path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha1(raw).hexdigest()
+    plan = _PLANS.get(digest)
+    if plan is None:
+        if len(_PLANS) >= 8:
+            _PLANS.clear()
+        plan = _PLANS[digest] = _compile(json.loads(raw)[0].get("properties", []))
+    return plan
@@ -0,0 +1,218 @@
+# model.py
+# Modelo tipado do contexto do POP, para ferramentas que seguram milhares de
+# contextos em memória (lote, índice, diff do catálogo).
+#
+# O contexto "oficial" continua sendo o dict/JSON de hydrate_from_bpmn +
+# regras de negócio; PopContext.from_dict / to_dict convertem sem perda
+# (mesmas chaves, mesma ordem, mesmos valores). Em memória:
+#   - atividades, entradas do dicionário e setores são registros com __slots__
+#   - setores (OrgUnit) são instâncias únicas por rótulo, compartilhadas entre documentos
+#   - rótulos de objetivos, indicadores, palavras-chave e campos calculados são
+#     strings internadas (sys.intern); listas viram tuplas
+#   - os blocos das atividades viram registros compactos com a forma (tupla de
+#     chaves) compartilhada
+# render_odt, write_context e index_context aceitam PopContext direto (as_dict).
+from __future__ import annotations
+import json, re, sys, threading
+
+_IEAPM = re.compile(r"\((IEAPM-[^)]+)\)")
+
+def _i(v):
+    return sys.intern(v) if type(v) is str else v
+
+def _rotulos(xs) -> tuple:
+    return tuple(_i(x) for x in xs)
+
+class OrgUnit:
+    """Setor (rótulo do BPMN). Uma instância por rótulo, compartilhada entre contextos."""
+    __slots__ = ("rotulo", "nome", "codigo")
+    _todas: dict = {}
+    _lock = threading.Lock()
+
+    def __new__(cls, rotulo: str):
+        u = cls._todas.get(rotulo)
+        if u is None:
+            with cls._lock:
+                u = cls._todas.get(rotulo)
+                if u is None:
+                    u = object.__new__(cls)
+                    m = _IEAPM.search(rotulo or "")
+                    u.rotulo = _i(rotulo)
+                    u.nome = _i(_IEAPM.sub("", rotulo or "").strip())
+                    u.codigo = _i(m.group(1) if m else "")
+                    cls._todas[u.rotulo] = u
+        return u
+
+    def __reduce__(self):
+        return (OrgUnit, (self.rotulo,))
+
+    def __repr__(self):
+        return f"OrgUnit({self.rotulo!r})"
+
+class DictEntry:
+    __slots__ = ("termo", "significado")
+
+    def __init__(self, termo: str, significado: str):
+        self.termo = _i(termo)
+        self.significado = significado
+
+    def to_dict(self) -> dict:
+        return {"termo": self.termo, "significado": self.significado}
+
+    def __eq__(self, o):
+        return isinstance(o, DictEntry) and (self.termo, self.significado) == (o.termo, o.significado)
+
+    def __repr__(self):
+        return f"DictEntry({self.termo!r}, {self.significado!r})"
+
+_FORMAS: dict = {}      # tupla de chaves -> a mesma tupla (internada)
+
+class _Registro:
+    """Dict genérico compacto: forma (chaves, compartilhada) + valores. Usado nos blocos."""
+    __slots__ = ("forma", "valores")
+
+    def __init__(self, d: dict):
+        forma = tuple(_i(k) for k in d)
+        self.forma = _FORMAS.setdefault(forma, forma)
+        self.valores = tuple(_compacta(v) for v in d.values())
+
+    def to_dict(self) -> dict:
+        return {k: _expande(v) for k, v in zip(self.forma, self.valores)}
+
+class _Lista(tuple):
+    """Lista compactada (tupla), marcada para voltar a ser list em to_dict."""
+    __slots__ = ()
+
+def _compacta(v):
+    if type(v) is dict:
+        return _Registro(v)
+    if type(v) is list:
+        return _Lista(_compacta(x) for x in v)
+    return _i(v) if type(v) is str and len(v) <= 64 else v
+
+def _expande(v):
+    if type(v) is _Registro:
+        return v.to_dict()
+    if type(v) is _Lista:
+        return [_expande(x) for x in v]
+    return v
+
+class _Ausente:
+    """Marca de campo ausente na atividade. Única também depois de pickle e deepcopy."""
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "_SEM"       # pickle/copy resolvem pelo nome global do módulo
+
+    def __repr__(self):
+        return "_SEM"
+
+_SEM = _Ausente()       # elemento/descricao/blocos/raia/nivel ausentes na atividade
+
+class Activity:
+    __slots__ = ("elemento", "descricao", "blocos", "raia", "nivel", "extras")
+    _ORDEM = ("elemento", "descricao", "blocos", "raia", "nivel")
+
+    def __init__(self, elemento: str = "", descricao: str = _SEM, blocos=_SEM, raia=_SEM, nivel=_SEM, extras=None):
+        self.elemento = elemento
+        self.descricao = descricao
+        self.blocos = blocos
+        self.raia = _i(raia)
+        self.nivel = nivel
+        self.extras = extras        # chaves fora do padrão, em ordem (ou None)
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "Activity":
+        a = cls(d.get("elemento", _SEM), d.get("descricao", _SEM),
+                _compacta(d["blocos"]) if "blocos" in d else _SEM,
+                d.get("raia", _SEM), d.get("nivel", _SEM))
+        if list(d) != [k for k in Activity._ORDEM if k in d]:
+            a.extras = tuple(d.items())     # ordem ou chaves fora do padrão: guarda tudo
+        return a
+
+    def to_dict(self) -> dict:
+        if self.extras is not None:
+            return dict(self.extras)
+        d = {}
+        for k in Activity._ORDEM:
+            v = getattr(self, k)
+            if v is not _SEM:
+                d[k] = _expande(v) if k == "blocos" else v
+        return d
+
+# campos do contexto com representação própria; o resto vai para `campos`
+_LISTAS_ROTULO = ("objetivos_estrategicos", "indicadores_estrategicos", "palavras_chave")
+_SETORES = ("setor_superior", "setor_executor")
+_CHAVES: dict = {}      # ordem das chaves (tupla internada: a mesma para todos os contextos iguais)
+
+class PopContext:
+    __slots__ = ("nome_processo", "codigo", "versao", "setor_superior", "setor_executor",
+                 "objetivos_estrategicos", "indicadores_estrategicos", "palavras_chave",
+                 "dicionario", "atividades", "campos", "_chaves")
+    _PROPRIOS = frozenset(("nome_processo", "codigo", "versao", *_SETORES, *_LISTAS_ROTULO,
+                           "dicionario", "descricao_processo_atividades"))
+
+    @classmethod
+    def from_dict(cls, ctx: dict) -> "PopContext":
+        c = object.__new__(cls)
+        chaves = tuple(_i(k) for k in ctx)
+        c._chaves = _CHAVES.setdefault(chaves, chaves)
+        c.nome_processo = ctx.get("nome_processo")
+        c.codigo = _i(ctx.get("codigo"))
+        c.versao = _i(ctx.get("versao"))
+        for k in _SETORES:
+            v = ctx.get(k)
+            setattr(c, k, OrgUnit(v) if type(v) is str else v)
+        for k in _LISTAS_ROTULO:
+            v = ctx.get(k)
+            setattr(c, k, _rotulos(v) if type(v) is list else v)
+        dic = ctx.get("dicionario")
+        if type(dic) is list and all(type(d) is dict and list(d) == ["termo", "significado"] for d in dic):
+            dic = tuple(DictEntry(d["termo"], d["significado"]) for d in dic)
+        c.dicionario = dic
+        ativ = ctx.get("descricao_processo_atividades")
+        c.atividades = tuple(Activity.from_dict(a) for a in ativ) if type(ativ) is list else ativ
+        c.campos = {k: _compacta(v) for k, v in ctx.items() if k not in cls._PROPRIOS} or None
+        return c
+
+    def _valor(self, k: str):
+        if k in ("nome_processo", "codigo", "versao"):
+            return getattr(self, k)
+        if k in _SETORES:
+            v = getattr(self, k)
+            return v.rotulo if type(v) is OrgUnit else v
+        if k in _LISTAS_ROTULO:
+            v = getattr(self, k)
+            return list(v) if type(v) is tuple else v
+        if k == "dicionario":
+            v = self.dicionario
+            return [d.to_dict() for d in v] if type(v) is tuple else v
+        if k == "descricao_processo_atividades":
+            v = self.atividades
+            return [a.to_dict() for a in v] if type(v) is tuple else v
+        return _expande(self.campos[k])
+
+    def to_dict(self) -> dict:
+        """O dict do contexto, igual (chaves, ordem e valores) ao que gerou o modelo."""
+        return {k: self._valor(k) for k in self._chaves}
+
+    def get(self, k: str, default=None):
+        return self._valor(k) if k in self._chaves else default
+
+    def to_json(self, **kw) -> str:
+        kw.setdefault("ensure_ascii", False)
+        return json.dumps(self.to_dict(), **kw)
+
+    @classmethod
+    def from_json(cls, s) -> "PopContext":
+        return cls.from_dict(json.loads(s))
+
+    def __eq__(self, o):
+        return isinstance(o, PopContext) and self.to_dict() == o.to_dict()
+
+    def __repr__(self):
+        return f"PopContext({self.codigo!r}, v{self.versao!s})"
+
+def as_dict(ctx) -> dict:
+    """Contexto em dict, aceitando tanto o dict quanto o PopContext."""
+    return ctx.to_dict() if isinstance(ctx, PopContext) else ctx
@@ -1,17 +1,200 @@
+import os
 import sys
+from collections import deque
 from lxml import etree
 import json
 
-def parse_bpmn_pop(file_path):
+try:
+    from .extraction_plan import compile_plan
+    from ..limits import JobError, JobLimits
+except ImportError:  # executado como script (python parser_bpmn.py arquivo.bpmn)
+    from extraction_plan import compile_plan
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from limits import JobError, JobLimits
+
+BPMN_NS = 'http://www.omg.org/spec/BPMN/20100524/MODEL'
+
+# Contêineres de nós de fluxo e filhos que não são nós (não entram na ordenação)
+_CONTAINERS = {"process", "subProcess", "transaction", "adHocSubProcess"}
+_NOT_NODES = {
+    "sequenceFlow", "laneSet", "association", "textAnnotation", "group",
+    "dataObject", "dataObjectReference", "dataStoreReference", "property",
+    "ioSpecification", "extensionElements", "documentation", "multiInstanceLoopCharacteristics",
+    "standardLoopCharacteristics",
+}
+
+def _local(tag) -> str:
+    return tag.split('}', 1)[1] if isinstance(tag, str) and '}' in tag else (tag if isinstance(tag, str) else "")
+
+def build_graph_index(process_element) -> dict:
+    """
+    Índice compacto do processo, montado em UMA passada sobre a árvore:
+      nodes   : id -> {"tag", "name", "container", "ordem"}  (ordem = documento)
+      edges   : container -> [(origem, destino)]  (sequenceFlow e boundary -> host)
+      lanes   : id do nó -> nome da raia (a mais interna vence)
+      docs    : id do elemento -> texto da documentação (primeira <documentation>)
+      others  : [(id, rótulo)] documentados que não são nós de fluxo (ordem de documento)
+      root    : id do processo
+    """
+    root_id = process_element.get('id') or ""
+    nodes, edges, lanes, docs, others = {}, {}, {}, {}, []
+    ordem = 0
+    for el in process_element.iter(etree.Element):
+        if el is process_element:
+            continue
+        tag = _local(el.tag)
+        parent = el.getparent()
+        ptag = _local(parent.tag)
+
+        if tag == "documentation":
+            pid = parent.get('id')
+            if pid and pid not in docs:
+                docs[pid] = etree.tostring(el, method='text', encoding='unicode').strip()
+                # o pai já foi visitado: se não virou nó, é fluxo/raia/etc.
+                if pid not in nodes and parent is not process_element:
+                    others.append((pid, parent.get('name') or ptag))
+            continue
+        if tag == "sequenceFlow":
+            cont = parent.get('id') or root_id
+            edges.setdefault(cont, []).append((el.get('sourceRef'), el.get('targetRef')))
+            continue
+        if tag == "flowNodeRef":
+            lane = parent.get('name') or parent.get('id') or ""
+            if el.text:
+                lanes[el.text.strip()] = lane
+            continue
+        if ptag in _CONTAINERS and tag not in _NOT_NODES and el.get('id'):
+            cont = parent.get('id') or root_id
+            nodes[el.get('id')] = {"tag": tag, "name": el.get('name'), "container": cont, "ordem": ordem}
+            ordem += 1
+            host = el.get('attachedToRef')
+            if host:
+                edges.setdefault(cont, []).append((host, el.get('id')))
+    return {"root": root_id, "nodes": nodes, "edges": edges, "lanes": lanes, "docs": docs, "others": others}
+
+def _flow_order(node_ids: list, edges: list) -> list:
+    """
+    Ordem de fluxo de um contêiner: Kahn (FIFO) com desempate pela ordem do
+    documento; em ciclos (retrabalho), força o próximo nó pendente em ordem
+    de documento. O(V+E).
+    """
+    pos = {n: i for i, n in enumerate(node_ids)}
+    succ = {n: [] for n in node_ids}
+    indeg = dict.fromkeys(node_ids, 0)
+    for a, b in edges:
+        if a in pos and b in pos and a != b:
+            succ[a].append(b)
+            indeg[b] += 1
+    fila = deque(n for n in node_ids if indeg[n] == 0)
+    visto, out, cursor = set(), [], 0
+    while len(out) < len(node_ids):
+        if not fila:
+            while node_ids[cursor] in visto:
+                cursor += 1
+            fila.append(node_ids[cursor])
+        n = fila.popleft()
+        if n in visto:
+            continue
+        visto.add(n)
+        out.append(n)
+        for m in succ[n]:
+            indeg[m] -= 1
+            if indeg[m] == 0 and m not in visto:
+                fila.append(m)
+    return out
+
+def ordered_activities(index: dict) -> list:
+    """Todos os nós em ordem de fluxo, com subprocessos expandidos logo após o próprio nó."""
+    por_cont: dict = {}
+    for nid, info in index["nodes"].items():   # dict preserva a ordem de documento
+        por_cont.setdefault(info["container"], []).append(nid)
+
+    out = []
+    # pilha explícita: (lista ordenada, posição, nível, raia herdada)
+    pilha = [(_flow_order(por_cont.get(index["root"], []), index["edges"].get(index["root"], [])), 0, 0, "")]
+    while pilha:
+        ordem, i, nivel, raia_pai = pilha.pop()
+        if i >= len(ordem):
+            continue
+        nid = ordem[i]
+        pilha.append((ordem, i + 1, nivel, raia_pai))
+        info = index["nodes"][nid]
+        raia = index["lanes"].get(nid) or raia_pai
+        out.append({"id": nid, "nivel": nivel, "raia": raia, **info})
+        if nid in por_cont:   # subprocesso: expande os filhos em seguida
+            pilha.append((_flow_order(por_cont[nid], index["edges"].get(nid, [])), 0, nivel + 1, raia))
+    return out
+
+def ordered_documented_activities(index: dict) -> list:
+    """Atividades com documentação, em ordem de fluxo; demais elementos documentados no fim."""
+    docs = index["docs"]
+    out = []
+    for n in ordered_activities(index):
+        txt = docs.get(n["id"])
+        if txt:
+            out.append({"elemento": n["name"] or n["tag"], "descricao": txt,
+                        "id": n["id"], "raia": n["raia"], "nivel": n["nivel"]})
+    for oid, rotulo in index["others"]:
+        txt = docs.get(oid)
+        if txt:
+            out.append({"elemento": rotulo, "descricao": txt, "id": oid, "raia": "", "nivel": 0})
+    return out
+
+
+def _tamanho(fonte) -> int | None:
+    if isinstance(fonte, (str, os.PathLike)):
+        return os.path.getsize(fonte)
+    if hasattr(fonte, "getbuffer"):
+        return fonte.getbuffer().nbytes
+    return None
+
+def parse_seguro(fonte, limits: JobLimits | None = None):
+    """
+    Parse endurecido do BPMN: documento com DOCTYPE é recusado (BPMN não usa
+    DTD; fecha entidades e billion laughs), sem rede, sem huge_tree (nós de
+    texto limitados pelo libxml2), com teto de tamanho, número de elementos e
+    profundidade. Estouro, DTD ou XML inválido -> JobError.
+    """
+    limits = limits or JobLimits.from_env()
+    tamanho = _tamanho(fonte)
+    if tamanho is not None:
+        limits.check_input(tamanho)
+    eventos = etree.iterparse(fonte, events=("start", "end"), resolve_entities=False, no_network=True,
+                              load_dtd=False, huge_tree=False)
+    max_el, max_prof = limits.max_elements, limits.max_depth
+    n = prof = 0
+    try:
+        for ev, el in eventos:
+            if ev == "end":
+                prof -= 1
+                continue
+            if n == 0 and el.getroottree().docinfo.doctype:
+                raise JobError("xml_invalido", "BPMN com DOCTYPE/entidades não é aceito")
+            n += 1
+            prof += 1
+            if max_prof and prof > max_prof:
+                raise JobError("xml_limite", f"BPMN com aninhamento acima de {max_prof} níveis", limite=max_prof)
+            if max_el and n > max_el:
+                raise JobError("xml_limite", f"BPMN com mais de {max_el} elementos", limite=max_el)
+    except etree.XMLSyntaxError as e:
+        raise JobError("xml_invalido", f"XML inválido: {e}")
+    return eventos.root
+
+def parse_bpmn_pop(file_path, plan=None):
     """
     Analisa um arquivo BPMN do Camunda 8 e extrai os metadados do template POP,
     bem como a documentação das tarefas.
 
     Args:
         file_path (str): O caminho para o arquivo .bpmn ou .xml.
+        plan (ExtractionPlan, opcional): plano compilado do pop-template.json;
+            se ausente, usa o template padrão do pacote.
 
     Returns:
         dict: Um dicionário contendo os metadados extraídos, ou None se ocorrer um erro.
+
+    Raises:
+        JobError: XML inválido ou acima dos limites de parse_seguro.
     """
     print(f"INFO: Analisando o arquivo: {file_path}")
 
@@ -22,8 +205,7 @@ def parse_bpmn_pop(file_path):
             'zeebe': 'http://camunda.org/schema/zeebe/1.0'
         }
 
-        tree = etree.parse(file_path)
-        root = tree.getroot()
+        root = parse_seguro(file_path)
 
         # XPath corrigido para encontrar o participante correto (com os dados preenchidos)
         # e usando o método .xpath() que é mais poderoso
@@ -36,39 +218,24 @@ def parse_bpmn_pop(file_path):
         
         participant = participants[0] # Pega o primeiro resultado da busca
 
-        # Lista de campos que devem ser tratados como listas separadas por "//"
-        multi_value_fields = [
-            'palavrasChaveAdicionais',
-            'dicionarioAdicionais_termos',
-            'dicionarioAdicionais_significados',
-            'referenciasAdicionais_refs',
-            'referenciasAdicionais_descs',
-            'sistemasAdicionais',
-            'indicadoresMonAdicionais_nomes',
-            'indicadoresMonAdicionais_descs',
-            'observacoesAdicionais',
-            'riscoDigitado3_adicionais',
-            'alteracao_itens'
-        ]
-
-        pop_properties = {}
+        # Plano compilado do pop-template.json: listas "//", choices e grupos numerados
+        if plan is None:
+            plan = compile_plan()
+
         properties_xpath = ".//zeebe:properties/zeebe:property"
         
         print("INFO: Extraindo propriedades do template POP...")
-        for prop in participant.findall(properties_xpath, namespaces=ns):
-            name = prop.get('name')
-            value = prop.get('value', '').strip()
-
-            if name and name.startswith('pop:'):
-                clean_name = name.split(':', 1)[1]
-                
-                if clean_name in multi_value_fields and value:
-                    pop_properties[clean_name] = [item.strip() for item in value.split('//')]
-                    print(f"  - Encontrado (lista): {clean_name} = {pop_properties[clean_name]}")
-                else:
-                    pop_properties[clean_name] = value
-                    if value:
-                        print(f"  - Encontrado (texto): {clean_name} = {value}")
+        props = plan.extract(
+            (prop.get('name'), prop.get('value', ''))
+            for prop in participant.iterfind(properties_xpath, namespaces=ns)
+            if (prop.get('name') or '').startswith('pop:')
+        )
+        pop_properties = props["valores"]
+        for clean_name, value in pop_properties.items():
+            if isinstance(value, list):
+                print(f"  - Encontrado (lista): {clean_name} = {value}")
+            elif value:
+                print(f"  - Encontrado (texto): {clean_name} = {value}")
 
         print("\nINFO: Extraindo documentação das tarefas para a Seção III...")
         task_documentations = []
@@ -76,27 +243,22 @@ def parse_bpmn_pop(file_path):
         process_element = root.find(f".//bpmn:process[@id='{process_id}']", namespaces=ns)
         
         if process_element is not None:
-            # Busca todos os elementos que possuem uma tag de documentação
-            elements_with_docs = process_element.xpath(".//*[bpmn:documentation]", namespaces=ns)
-            for elem in elements_with_docs:
-                doc_element = elem.find('bpmn:documentation', namespaces=ns)
-                # Lida corretamente com o conteúdo HTML dentro da tag de documentação
-                doc_text = etree.tostring(doc_element, method='text', encoding='unicode').strip()
-                elem_name = elem.get('name')
-                if doc_text:
-                    task_documentations.append({
-                        "elemento": elem_name if elem_name else elem.tag.split('}', 1)[1],
-                        "descricao": doc_text
-                    })
-                    print(f"  - Documentação encontrada para: '{elem_name}'")
+            # Índice do grafo (uma passada) -> atividades documentadas em ordem de fluxo
+            for item in ordered_documented_activities(build_graph_index(process_element)):
+                task_documentations.append(item)
+                print(f"  - Documentação encontrada para: '{item['elemento']}'")
 
         final_data = {
             "propriedades_pop": pop_properties,
+            "propriedades_rotulos": props["rotulos"],
+            "propriedades_grupos": props["grupos"],
             "descricao_processo_atividades": task_documentations
         }
 
         return final_data
 
+    except JobError:
+        raise   # limite ou XML inválido: erro estruturado para o chamador
     except Exception as e:
         print(f"ERRO: Ocorreu um erro inesperado durante a análise. Erro: {e}")
         return None
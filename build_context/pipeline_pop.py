@@ -5,92 +5,110 @@
 import json, os
 from typing import Any, Dict
 
-from .mapping_builder import build_maps_from_template_json
-from .rules_pop import strip_html_preserve_breaks
+from .extraction_plan import compile_plan
+from ..limits import JobError
+from .rules_pop import CONVERSOR_VERSAO, html_to_blocks_batch, blocks_to_text
+from ..cache import TEXTO_LIMPO, ListaCongelada, congela, content_key
+
+def _converte_documentacoes(htmls: list) -> list:
+    """
+    HTML da documentação -> {"texto", "blocos"} para todas as atividades de uma vez.
+    A documentação raramente muda entre builds: o resultado fica em cache por conteúdo
+    e só as entradas novas passam pelo conversor (em lote). Os blocos saem congelados
+    (cache.congela) e são os mesmos objetos para todos os jobs: sem cópia por hit, e
+    quem precisar alterar copia antes. `blocos.chave` guarda a chave do conteúdo, que
+    o render reaproveita para achar o fragmento ODF sem serializar os blocos.
+    """
+    chaves = [content_key("doc", CONVERSOR_VERSAO, h if isinstance(h, str) else "") for h in htmls]
+    res = [TEXTO_LIMPO.get(k) for k in chaves]
+    faltam = [i for i, r in enumerate(res) if r is None]
+    if faltam:
+        for i, blocos in zip(faltam, html_to_blocks_batch([htmls[i] for i in faltam])):
+            res[i] = {"texto": blocks_to_text(blocos), "blocos": congela(blocos, chaves[i])}
+            TEXTO_LIMPO.put(chaves[i], res[i])
+    for i, r in enumerate(res):
+        if not isinstance(r["blocos"], ListaCongelada):
+            # veio do disco (JSON): congela uma vez e deixa na memória já pronto
+            res[i] = {"texto": r["texto"], "blocos": congela(r["blocos"], chaves[i])}
+            TEXTO_LIMPO.put(chaves[i], res[i], disk=False)
+    return res
+
+def _grupo(grupos: dict, base: str, campo: str = "valor") -> list:
+    """Valores legíveis preenchidos de um grupo numerado (ex.: objetivoEstrategicoN)."""
+    return [g[campo] for g in grupos.get(base, []) if g.get(campo)]
+
+def _lista(v) -> list:
+    """Campo "//" (já separado pelo plano) -> itens não vazios."""
+    if isinstance(v, list):
+        return [s for s in v if s]
+    return [s.strip() for s in str(v or "").split("//") if s.strip()]
 
 def hydrate_from_bpmn(bpmn_path: str, template_json: str) -> dict:
     """Lê o .bpmn via seu parser e retorna um contexto 'bruto' + campos mapeados legíveis."""
+    plan = compile_plan(template_json)
     try:
         from .parser_bpmn import parse_bpmn_pop
-        raw = parse_bpmn_pop(bpmn_path)  # espera um dict
+        raw = parse_bpmn_pop(bpmn_path, plan=plan)  # espera um dict
+    except JobError:
+        raise
     except Exception as e:
-        raise RuntimeError(f"Falha ao ler BPMN: {e}")
-
-    maps = build_maps_from_template_json(template_json)
-    props = raw.get("propriedades_pop", raw)
+        raise JobError("bpmn_invalido", f"Falha ao ler BPMN: {e}")
+    if not raw:
+        raise JobError("bpmn_invalido", "Falha ao ler BPMN: XML inválido ou sem o participante do POP")
+    return context_from_raw(raw)
+
+def context_from_raw(raw: dict) -> dict:
+    """Saída do parse_bpmn_pop -> contexto (o mesmo da geração e da auditoria)."""
+    # o plano já separou listas, traduziu choices e agrupou os campos numerados
+    props   = raw.get("propriedades_pop", {})
+    rotulos = raw.get("propriedades_rotulos", {})
+    grupos  = raw.get("propriedades_grupos", {})
 
     ctx: Dict[str, Any] = {}
 
-    ctx["nome_processo"] = props.get("nomeProcesso") or raw.get("nome_processo") or ""
-    ctx["codigo"]        = props.get("codigo") or props.get("pop:codigo") or raw.get("codigo") or ""
-    ctx["versao"]        = props.get("versao") or raw.get("versao") or "1"
-
-    def map_choice(field_name: str, value: str) -> str:
-        if not value:
-            return ""
-        m = maps.get(field_name, {})
-        return m.get(value, value)
-
-    sup_val = props.get("superintendenciaResponsavel") or props.get("pop:superintendenciaResponsavel") or ""
-    exe_val = props.get("departamentoResponsavel")     or props.get("pop:departamentoResponsavel")     or ""
-
-    ctx["setor_superior"] = map_choice("pop:superintendenciaResponsavel", sup_val)
-    ctx["setor_executor"] = map_choice("pop:departamentoResponsavel", exe_val)
-
-    oe_codes = [
-        props.get("objetivoEstrategico1") or props.get("pop:objetivoEstrategico1"),
-        props.get("objetivoEstrategico2") or props.get("pop:objetivoEstrategico2"),
-        props.get("objetivoEstrategico3") or props.get("pop:objetivoEstrategico3"),
-    ]
-    oe_map = maps.get("pop:objetivoEstrategico1", {})
-    ctx["objetivos_estrategicos"] = [oe_map.get(c, c) for c in oe_codes if c]
-
-    ie_codes = [
-        props.get("indicadorEstrategico1") or props.get("pop:indicadorEstrategico1"),
-        props.get("indicadorEstrategico2") or props.get("pop:indicadorEstrategico2"),
-        props.get("indicadorEstrategico3") or props.get("pop:indicadorEstrategico3"),
-    ]
-    ie_map = maps.get("pop:indicadorEstrategico1", {})
-    ctx["indicadores_estrategicos"] = [ie_map.get(c, c) for c in ie_codes if c]
-
-    palavras = []
-    for k in ("palavraChave1","palavraChave2","palavraChave3"):
-        v = props.get(k) or props.get(f"pop:{k}")
-        if v:
-            palavras.append(v)
-    add = props.get("palavrasChaveAdicionais") or props.get("pop:palavrasChaveAdicionais")
-    if add:
-        palavras.extend([s.strip() for s in str(add).split("//") if s.strip()])
-    ctx["palavras_chave"] = palavras
+    ctx["nome_processo"] = props.get("nomeProcesso") or ""
+    ctx["codigo"]        = props.get("codigo") or ""
+    ctx["versao"]        = props.get("versao") or "1"
+
+    ctx["setor_superior"] = rotulos.get("superintendenciaResponsavel", "")
+    ctx["setor_executor"] = rotulos.get("departamentoResponsavel", "")
+
+    ctx["objetivos_estrategicos"]   = _grupo(grupos, "objetivoEstrategico")
+    ctx["indicadores_estrategicos"] = _grupo(grupos, "indicadorEstrategico")
+
+    ctx["palavras_chave"] = _grupo(grupos, "palavraChave") + _lista(props.get("palavrasChaveAdicionais"))
 
     dicionario = []
-    for i in (1,2,3):
-        t = props.get(f"dicionario{i}_termo") or props.get(f"pop:dicionario{i}_termo")
-        s = props.get(f"dicionario{i}_significado") or props.get(f"pop:dicionario{i}_significado")
+    for g in grupos.get("dicionario", []):
+        t, s = g.get("termo", ""), g.get("significado", "")
         if t or s:
-            dicionario.append({"termo": t or "", "significado": s or ""})
-    termos_ad = props.get("dicionarioAdicionais_termos") or props.get("pop:dicionarioAdicionais_termos")
-    sig_ad    = props.get("dicionarioAdicionais_significados") or props.get("pop:dicionarioAdicionais_significados")
-    if termos_ad and sig_ad:
-        ts = [s.strip() for s in str(termos_ad).split("//")]
-        ss = [s.strip() for s in str(sig_ad).split("//")]
-        for i in range(min(len(ts), len(ss))):
-            if ts[i] or ss[i]:
-                dicionario.append({"termo": ts[i], "significado": ss[i]})
+            dicionario.append({"termo": t, "significado": s})
+    ts = props.get("dicionarioAdicionais_termos") or []
+    ss = props.get("dicionarioAdicionais_significados") or []
+    if ts and ss:
+        for t, s in zip(ts, ss):
+            if t or s:
+                dicionario.append({"termo": t, "significado": s})
     ctx["dicionario"] = dicionario
 
     desc = []
-    for item in raw.get("descricao_processo_atividades", []):
+    atividades = raw.get("descricao_processo_atividades", [])
+    convertidas = _converte_documentacoes([item.get("descricao","") for item in atividades])
+    for item, conv in zip(atividades, convertidas):
         elemento = item.get("elemento","");
-        texto = strip_html_preserve_breaks(item.get("descricao",""))
+        texto = conv["texto"]
         if elemento or texto:
-            desc.append({"elemento": elemento, "descricao": texto})
+            ativ = {"elemento": elemento, "descricao": texto, "blocos": conv["blocos"]}
+            for k in ("raia", "nivel"):
+                if k in item:
+                    ativ[k] = item[k]
+            desc.append(ativ)
     if desc:
         ctx["descricao_processo_atividades"] = desc
 
     for k in ("rodape_elaborador","aprovacao_data","aprovacao_responsavel","aprovacao_setor"):
-        if props.get(k) or props.get(f"pop:{k}"):
-            ctx[k] = props.get(k) or props.get(f"pop:{k}")
+        if props.get(k):
+            ctx[k] = props[k]
 
     return ctx
 
@@ -1,19 +1,190 @@
 import re
 from html import unescape
+from html.parser import HTMLParser
 from typing import Optional
 
 _IEAPM_CODE_RE = re.compile(r"\(IEAPM-(\d+(?:\.\d+)?)\)", re.IGNORECASE)
 
+# ---------- documentação HTML -> blocos (parágrafos / listas) ----------
+# Conversor de uma passada sobre o tokenizador do html.parser: quebras,
+# parágrafos, listas (<ul>/<ol>/<li>) e entidades no mesmo scan. A saída em
+# blocos mapeia direto para <text:p> / <text:list> no ODT:
+#   {"tipo": "paragrafo", "linhas": [str, ...]}
+#   {"tipo": "lista", "ordenada": bool,
+#    "itens": [{"nivel": int, "ordenada": bool, "linhas": [str, ...]}]}
+# Texto que segue uma sublista dentro do mesmo <li> vira um item com
+# "continuacao": True (mesmo list-item no ODT, sem marcador novo).
+#
+# Documentação gravada com a marcação escapada (`&lt;p&gt;texto&lt;/p&gt;`,
+# comum em exportações de BPMN) passa de novo pelo tokenizador já decodificada,
+# como fazia o strip_html_preserve_breaks original (unescape antes das tags).
+
+_BLOCK_TAGS = {"p", "div", "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "table", "tr"}
+_SKIP_TAGS = {"script", "style", "head", "title"}
+_WS_RE = re.compile(r"[ \t\r\f\v]+")
+_TAG_RE = re.compile(r"<\s*/?\s*[a-zA-Z][a-zA-Z0-9]*(?:\s[^<>]*)?/?\s*>")
+
+class _DocHTMLParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._zera()
+
+    def _zera(self):
+        self.blocos = []
+        self._linhas = [""]      # linhas do bloco corrente
+        self._listas = []        # pilha de bool (ordenada?) para <ul>/<ol>
+        self._item = None        # item de lista que recebe as linhas
+        self._li = None          # (nivel, ordenada) do <li> aberto, mesmo depois de uma sublista
+        self._pais = []          # _li de fora de cada sublista aberta
+        self._skip = 0
+        self._marcacao = False   # texto decodificado ainda com tags (HTML escapado)
+
+    def _passada(self, html_text: str) -> list:
+        self.reset()
+        self._zera()
+        self.feed(html_text)
+        self.close()
+        self._fecha_bloco()
+        return self.blocos
+
+    def converte(self, html_text: str) -> list:
+        blocos = self._passada(html_text)
+        if self._marcacao:
+            blocos = self._passada(unescape(html_text))
+        return blocos
+
+    # --- acumulação ---
+    def _fecha_bloco(self):
+        linhas = []
+        for ln in self._linhas:
+            ln = ln.strip()
+            if ln or (linhas and linhas[-1]):   # no máximo uma linha vazia seguida
+                linhas.append(ln)
+        while linhas and not linhas[-1]:
+            linhas.pop()
+        self._linhas = [""]
+        if not linhas:
+            return
+        if self._item is None and self._li is not None and self.blocos and self.blocos[-1]["tipo"] == "lista":
+            # texto depois de uma sublista, ainda dentro do <li>: continua o mesmo item
+            nivel, ordenada = self._li
+            self._item = {"nivel": nivel, "ordenada": ordenada, "linhas": [], "continuacao": True}
+            self.blocos[-1]["itens"].append(self._item)
+        if self._item is not None:
+            self._item["linhas"].extend(linhas)
+            return
+        self.blocos.append({"tipo": "paragrafo", "linhas": linhas})
+
+    def _abre_item(self):
+        self._fecha_bloco()
+        ordenada = self._listas[-1] if self._listas else False
+        nivel = max(len(self._listas) - 1, 0)
+        ult = self.blocos[-1] if self.blocos else None
+        if not (ult and ult["tipo"] == "lista" and (nivel > 0 or ult["ordenada"] == ordenada)):
+            ult = {"tipo": "lista", "ordenada": ordenada, "itens": []}
+            self.blocos.append(ult)
+        self._item = {"nivel": nivel, "ordenada": ordenada, "linhas": []}
+        self._li = (nivel, ordenada)
+        ult["itens"].append(self._item)
+
+    def _fecha_item(self):
+        self._fecha_bloco()
+        self._item = self._li = None
+
+    # --- eventos do tokenizador ---
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag == "br":
+            self._linhas.append("")
+        elif tag in ("ul", "ol"):
+            self._fecha_bloco()
+            self._pais.append(self._li)
+            self._item = self._li = None
+            self._listas.append(tag == "ol")
+        elif tag == "li":
+            self._abre_item()
+        elif tag in _BLOCK_TAGS:
+            self._fecha_bloco()
+
+    def handle_startendtag(self, tag, attrs):
+        if tag == "br":
+            self._linhas.append("")
+        elif tag not in _SKIP_TAGS:
+            self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(self._skip - 1, 0)
+        elif tag in ("ul", "ol"):
+            self._fecha_item()
+            if self._listas:
+                self._listas.pop()
+                self._li = self._pais.pop()     # de volta ao <li> de fora (se houver)
+        elif tag == "li":
+            self._fecha_item()
+        elif tag in _BLOCK_TAGS:
+            self._fecha_bloco()
+
+    def handle_data(self, data):
+        if self._skip or not data:
+            return
+        if "<" in data and _TAG_RE.search(data):
+            self._marcacao = True
+        data = data.replace("\xa0", " ").replace("\u200b", "")
+        # quebras do próprio texto valem como <br> (documentação em texto puro)
+        partes = data.split("\n")
+        for i, parte in enumerate(partes):
+            if i:
+                self._linhas.append("")
+            cur = self._linhas[-1] + _WS_RE.sub(" ", parte)
+            self._linhas[-1] = cur.lstrip(" ") if not self._linhas[-1] else cur
+
+# Sobe a cada mudança na saída de html_to_blocks/blocks_to_text: entra na chave
+# do cache da documentação (inclusive em POP_CACHE_DIR).
+CONVERSOR_VERSAO = 2
+
+def html_to_blocks(html_text: str, _parser: Optional[_DocHTMLParser] = None) -> list:
+    """Converte a documentação (HTML ou texto puro) em blocos de parágrafo/lista."""
+    if not isinstance(html_text, str) or not html_text:
+        return []
+    return (_parser or _DocHTMLParser()).converte(html_text)
+
+def html_to_blocks_batch(textos) -> list:
+    """Converte várias documentações reaproveitando um único tokenizador."""
+    parser = _DocHTMLParser()
+    return [html_to_blocks(t, parser) for t in textos]
+
+def blocks_to_text(blocos: list) -> str:
+    """Versão texto dos blocos: parágrafos separados por linha em branco, listas com marcador."""
+    partes = []
+    for b in blocos or []:
+        if b.get("tipo") == "lista":
+            linhas, contagem = [], []
+            for it in b.get("itens", []):
+                nivel = it.get("nivel", 0)
+                if it.get("continuacao"):
+                    linhas.extend(f"{'  ' * nivel}  {ln}" for ln in it.get("linhas") or [])
+                    continue
+                del contagem[nivel + 1:]
+                contagem.extend([0] * (nivel + 1 - len(contagem)))
+                contagem[nivel] += 1
+                ordenada = it.get("ordenada", b.get("ordenada"))
+                marca = f"{contagem[nivel]}." if ordenada else "•"
+                recuo = "  " * nivel
+                ls = it.get("linhas") or [""]
+                linhas.append(f"{recuo}{marca} {ls[0]}".rstrip())
+                linhas.extend(f"{recuo}  {ln}" for ln in ls[1:])
+            partes.append("\n".join(linhas))
+        else:
+            partes.append("\n".join(b.get("linhas", [])))
+    s = "\n\n".join(p for p in partes if p)
+    return re.sub(r"\n{3,}", "\n\n", s)
+
 def strip_html_preserve_breaks(html_text: str) -> str:
     if not isinstance(html_text, str):
         return ""
-    s = unescape(html_text)
-    s = re.sub(r"(?i)<\s*br\s*/?\s*>", "\n", s)
-    s = re.sub(r"(?i)</\s*p\s*>", "\n\n", s)
-    s = re.sub(r"<[^>]+>", "", s)
-    s = s.replace("\xa0", " ").replace("\u200b", "")
-    s = re.sub(r"[ \t]+", " ", s).strip()
-    return re.sub(r"\n{3,}", "\n\n", s)
+    return blocks_to_text(html_to_blocks(html_text))
 
 def format_lista_semicolas(itens):
     xs = [str(s).strip() for s in (itens or []) if s and str(s).strip()]
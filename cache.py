@@ -0,0 +1,226 @@
+# POP/cache.py
+# Cache entre jobs, chaveado por hash do conteúdo, com despejo LRU.
+#
+# Em modo daemon/lote o mesmo processo gera muitos POPs e a documentação das
+# tarefas quase nunca muda entre builds; guardamos o texto limpo e o
+# fragmento ODF de cada atividade para não refazer o trabalho.
+# Camada opcional em disco (POP_CACHE_DIR) para reaproveitar entre processos.
+#
+# Valores em memória são entregues sem cópia: estruturas vindas do cache são
+# congeladas (`congela`), e quem precisa alterar copia antes.
+from __future__ import annotations
+import hashlib, json, os, threading
+from collections import OrderedDict
+from pathlib import Path
+
+_MAX_PADRAO = 4096
+
+_avisados: set = set()
+
+def _max_entries_env() -> int:
+    """POP_CACHE_MAX; valor inválido não derruba o import: avisa (uma vez) e usa o padrão."""
+    v = os.environ.get("POP_CACHE_MAX", "").strip()
+    if not v:
+        return _MAX_PADRAO
+    try:
+        return max(1, int(v))
+    except ValueError:
+        if v not in _avisados:
+            _avisados.add(v)
+            print(f"AVISO: POP_CACHE_MAX={v!r} inválido; usando {_MAX_PADRAO}")
+        return _MAX_PADRAO
+
+def content_key(*parts) -> str:
+    """sha256 das partes (str/bytes), separadas por NUL para não colidirem."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p if isinstance(p, bytes) else str(p).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+_MSG_CONGELADO = "valor compartilhado pelo cache: copie (copy.deepcopy ou cache.descongela) antes de alterar"
+
+def _imutavel(self, *a, **kw):
+    raise TypeError(_MSG_CONGELADO)
+
+class ListaCongelada(list):
+    """list só-leitura: igual a list (==, json, isinstance), mas sem mutação."""
+    __slots__ = ("chave",)      # hash do conteúdo de origem, quando conhecido
+    append = extend = insert = pop = remove = clear = sort = reverse = _imutavel
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _imutavel
+
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return descongela(self)     # cópia comum, editável
+
+    def __reduce__(self):
+        return (_lista_congelada, (list(self), getattr(self, "chave", None)))
+
+class DictCongelado(dict):
+    """dict só-leitura (ver ListaCongelada)."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = pop = popitem = clear = update = setdefault = __ior__ = _imutavel
+
+    def __copy__(self):
+        return dict(self)
+
+    def __deepcopy__(self, memo):
+        return descongela(self)
+
+    def __reduce__(self):
+        return (DictCongelado, (dict(self),))
+
+def _lista_congelada(itens, chave=None):
+    lst = ListaCongelada(itens)
+    if chave is not None:
+        lst.chave = chave
+    return lst
+
+def congela(v, chave: str | None = None):
+    """Cópia congelada de uma estrutura JSON (dicts/listas aninhados); `chave` vai na lista de fora."""
+    if isinstance(v, dict):
+        return DictCongelado((k, congela(x)) for k, x in v.items())
+    if isinstance(v, list):
+        return _lista_congelada([congela(x) for x in v], chave)
+    return v
+
+def descongela(v):
+    """Cópia comum (dicts/listas editáveis) de uma estrutura congelada."""
+    if isinstance(v, dict):
+        return {k: descongela(x) for k, x in v.items()}
+    if isinstance(v, list):
+        return [descongela(x) for x in v]
+    return v
+
+class ContentCache:
+    """
+    LRU em memória, limitado a `max_entries`, com camada opcional em disco.
+
+    Valores devem ser `bytes` ou serializáveis em JSON (a camada de disco grava
+    `<chave>.bin` ou `<chave>.json`). A chave é o hash do conteúdo mais a versão
+    de quem produziu o valor (ex.: `content_key("doc", CONVERSOR_VERSAO, html)`):
+    mudou a saída do conversor ou do render, sobe a versão e as entradas antigas
+    deixam de ser lidas. Arquivos em disco só são removidos por `clear()`.
+    """
+
+    def __init__(self, name: str, max_entries: int | None = None, disk_dir: str | Path | None = None):
+        self.name = name
+        self.max_entries = max(1, int(max_entries)) if max_entries else _max_entries_env()
+        self.disk_dir = Path(disk_dir) / name if disk_dir else None
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.disk_hits = 0
+
+    # ---------- disco ----------
+    def _disk_path(self, key: str, suffix: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}{suffix}"
+
+    def _disk_get(self, key: str):
+        if self.disk_dir is None:
+            return None
+        p = self._disk_path(key, ".bin")
+        try:
+            if p.exists():
+                return p.read_bytes()
+            p = self._disk_path(key, ".json")
+            if p.exists():
+                with open(p, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        except (OSError, ValueError) as e:     # ValueError cobre JSONDecodeError e UTF-8 inválido
+            # entrada truncada ou ilegível: vale como miss e sai do disco (refeita no put)
+            print(f"AVISO: cache {self.name}: entrada ilegível descartada ({e})")
+            try:
+                p.unlink()
+            except OSError:
+                pass
+        return None
+
+    def _disk_put(self, key: str, value):
+        if self.disk_dir is None:
+            return
+        is_blob = isinstance(value, bytes)
+        p = self._disk_path(key, ".bin" if is_blob else ".json")
+        if p.exists():
+            return
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_name(f"{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if is_blob:
+            tmp.write_bytes(value)
+        else:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+        os.replace(tmp, p)
+
+    # ---------- API ----------
+    def get(self, key: str):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, value)
+        return value
+
+    def put(self, key: str, value, disk: bool = True):
+        with self._lock:
+            self._store(key, value)
+        if disk:
+            try:
+                self._disk_put(key, value)
+            except OSError as e:
+                print(f"AVISO: cache {self.name}: não gravado em disco ({e})")
+
+    def _store(self, key: str, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get_or_compute(self, key: str, fn):
+        value = self.get(key)
+        if value is None:
+            value = fn()
+            self.put(key, value)
+        return value
+
+    def clear(self, disk: bool = False):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.disk_hits = 0
+        if disk and self.disk_dir is not None and self.disk_dir.exists():
+            for p in self.disk_dir.rglob("*"):
+                if p.is_file():
+                    p.unlink()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"nome": self.name, "entradas": len(self._data), "max": self.max_entries,
+                    "hits": self.hits, "misses": self.misses, "disk_hits": self.disk_hits}
+
+_DISK_DIR = os.environ.get("POP_CACHE_DIR") or None
+
+# documentação BPMN já convertida ({"texto", "blocos"}) por conteúdo do HTML
+TEXTO_LIMPO = ContentCache("texto_limpo", disk_dir=_DISK_DIR)
+# fragmento ODF (bytes, prefixo `text:`) da descrição de cada atividade
+FRAGMENTOS = ContentCache("fragmentos", disk_dir=_DISK_DIR)
+# os mesmos fragmentos já como elementos lxml (só memória; o render DOM insere cópias)
+ELEMENTOS = ContentCache("fragmentos_el")
+
+def configure(max_entries: int | None = None, disk_dir: str | Path | None = None):
+    """Reconfigura os caches globais (limite em memória e/ou diretório em disco)."""
+    for c in (TEXTO_LIMPO, FRAGMENTOS, ELEMENTOS):
+        if max_entries is not None:
+            c.max_entries = max(1, int(max_entries))
+        if disk_dir is not None and c is not ELEMENTOS:
+            c.disk_dir = Path(disk_dir) / c.name
+
+def stats() -> list[dict]:
+    return [TEXTO_LIMPO.stats(), FRAGMENTOS.stats(), ELEMENTOS.stats()]
@@ -1,19 +1,117 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import argparse
+import argparse, os
 from pathlib import Path
 
-from POP.service import generate_pop_odt
-
 def main():
     ap = argparse.ArgumentParser(description="Gera ODT do POP a partir de um BPMN do Camunda")
-    ap.add_argument("--bpmn", required=True, help="Caminho para o arquivo .bpmn")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--bpmn", help="Caminho para o arquivo .bpmn")
+    src.add_argument("--archive", help="Lote: .zip/.tar(.gz) com BPMNs ('-' = stdin)")
+    src.add_argument("--search", metavar="CONSULTA",
+                     help="Busca no índice dos POPs gerados (sintaxe FTS5, ex.: 'dicionario:INPI')")
+    src.add_argument("--reindex", action="store_true",
+                     help="Reconstrói o índice de busca a partir dos contextos do workspace (arquivos e journal)")
+    src.add_argument("--audit", metavar="CORPUS",
+                     help="Só os dados: um JSON por BPMN (diretório, glob ou .zip/.tar), sem gerar ODT")
+    src.add_argument("--optimize-template", nargs="?", const="", metavar="TEMPLATE",
+                     help="Gera <template>.otimizado.odt (PNGs recomprimidos sem perda, deflate nos "
+                          "demais membros), usado pelo render enquanto estiver em dia com o template "
+                          "(padrão: templates/modelo_POP.odt)")
     ap.add_argument("--out-dir", required=False, help="Diretório de saída (opcional). Se ausente, usa o diretório do BPMN.")
+    ap.add_argument("--out-archive", help="Lote: .zip/.tar(.gz) de saída com os ODTs + manifest.json ('-' = stdout)")
+    ap.add_argument("--context-sink", choices=["files", "journal", "none"],
+                    help="Destino do contexto de auditoria (padrão: POP_CONTEXT_SINK ou files)")
+    ap.add_argument("--audit-out", help="--audit: arquivo .jsonl de saída (padrão: stdout)")
+    ap.add_argument("--workers", type=int, help="--audit: processos em paralelo (padrão: nº de CPUs)")
+    ap.add_argument("--limit", type=int, default=20, help="--search: máximo de resultados (padrão: 20)")
+    ap.add_argument("--format", choices=["odt", "fodt"], default="odt",
+                    help="odt (padrão) ou fodt: ODT plano, um único XML sem zip")
+    ap.add_argument("--fodt-images", choices=["inline", "external"], default="inline",
+                    help="fodt: imagens embutidas em base64 (padrão) ou gravadas em <nome>_imagens/")
+    ap.add_argument("--durability", choices=["none", "file", "group"],
+                    help="fsync das entregas: none, file (cada arquivo) ou group (em grupos); "
+                         "padrão: POP_DURABILITY ou none")
+    ap.add_argument("--group-size", type=int, help="--durability group: entregas por grupo (padrão: 64)")
+    ap.add_argument("--job-timeout", type=float, help="--archive: limite de tempo por BPMN (s), em worker isolado")
+    ap.add_argument("--job-memory-mb", type=int, help="--archive: limite de memória do worker isolado (MB)")
+    ap.add_argument("--max-input-mb", type=float, help="--archive: tamanho máximo de cada BPMN (padrão: 20)")
+    ap.add_argument("--drop-thumbnail", action="store_true",
+                    help="--optimize-template: remove Thumbnails/thumbnail.png da variante")
     args = ap.parse_args()
+    if args.archive and not args.out_archive:
+        ap.error("--archive exige --out-archive")
+
+    # import tardio: --help e erros de argumento não carregam lxml/render
+    if args.context_sink:
+        from POP.workspace import set_context_sink
+        set_context_sink(args.context_sink)
+    if args.durability or args.group_size or os.environ.get("POP_DURABILITY"):
+        from POP.workspace import set_durability, get_durability
+        try:
+            set_durability(args.durability or get_durability(), args.group_size)
+        except ValueError as e:
+            ap.error(str(e))
+    if args.search is not None:
+        from POP.search_index import search
+        hits = search(args.search, args.limit)
+        for h in hits:
+            print(f"{h['codigo']} v{h['versao']}  {h['nome_processo']}  ({h['score']})")
+            print(f"    {' '.join(h['trecho'].split())}")
+        if not hits:
+            print("nenhum POP encontrado")
+        return
+    if args.audit is not None:
+        import sys
+        from POP.audit import run_audit
+        tot = run_audit(args.audit, args.audit_out, args.workers)
+        print(f"OK: {tot['processos']} processo(s), {tot['invalidos']} com campos obrigatórios "
+              f"faltando, {tot['erros']} erro(s)", file=sys.stderr)
+        return
+    if args.optimize_template is not None:
+        from POP.render.template_optimize import build_optimized, report_lines
+        if not args.optimize_template:
+            from POP.service import DEFAULT_TEMPLATE
+            args.optimize_template = DEFAULT_TEMPLATE
+        rel = build_optimized(args.optimize_template, drop_thumbnail=args.drop_thumbnail)
+        print("\n".join(report_lines(rel)))
+        return
+    if args.reindex:
+        from POP.search_index import reindex_contexts
+        print(f"OK: {reindex_contexts()} contexto(s) indexado(s)")
+        return
+    if args.archive:
+        import sys
+        from POP.batch import run_archive_batch
+        if args.format == "fodt" and args.fodt_images == "external":
+            ap.error("--archive com --format fodt só aceita imagens inline")
+        from POP.limits import JobLimits
+        limits = JobLimits.from_env(wall_s=args.job_timeout, mem_mb=args.job_memory_mb,
+                                    input_bytes=int(args.max_input_mb * 1024 * 1024) if args.max_input_mb else None)
+        manifest = run_archive_batch(args.archive, args.out_archive, output_format=args.format, limits=limits)
+        erros = [m for m in manifest if m["status"] != "ok"]
+        print(f"OK: {len(manifest) - len(erros)} ODT(s), {len(erros)} erro(s) -> {args.out_archive}", file=sys.stderr)
+        for m in erros:
+            print(f"  - {m['membro']} [{m['tipo']}]: {m['erro']}", file=sys.stderr)
+        _relata_durabilidade()
+        return
 
-    res = generate_pop_odt(bpmn_path=args.bpmn, out_dir=args.out_dir)
+    from POP.service import generate_pop_odt
+    res = generate_pop_odt(bpmn_path=args.bpmn, out_dir=args.out_dir,
+                           output_format=args.format, pictures=args.fodt_images)
     print(f"OK: {res['output_path']}")
-    print(f"contexto: {res['context_path']}")
+    print(f"contexto: {res['context_path'] or 'não gravado (sink none)'}")
+    _relata_durabilidade()
+
+def _relata_durabilidade():
+    """Efetiva o grupo pendente e mostra o custo de fsync (stderr), se a durabilidade não for none."""
+    import sys
+    from POP.workspace import checkpoint, durability_stats
+    checkpoint()
+    st = durability_stats()
+    if st["modo"] != "none":
+        print(f"durabilidade {st['modo']}: fsync de {st['arquivos']} arquivo(s) e {st['diretorios']} "
+              f"diretório(s) em {st['fsync_ms']:.1f} ms ({st['checkpoints']} checkpoint(s))", file=sys.stderr)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,198 @@
+# POP/limits.py
+# Limites por job e erros estruturados.
+#
+# Um BPMN malformado ou enorme (documentação HTML gigante, aninhamento
+# profundo) não pode travar nem inchar o worker que o processa:
+#   - entrada : tamanho máximo do BPMN (bytes)
+#   - XML     : parser sem entidades, sem rede, sem huge_tree, com teto de
+#               elementos e de profundidade (build_context.parser_bpmn)
+#   - tempo   : tempo de parede por job
+#   - memória : RLIMIT_AS do processo que executa o job
+#
+# Tempo e memória só valem com o job num processo separado (LimitedWorker): o
+# worker que estoura é morto e trocado por um novo, e o job vira JobError.
+#
+# Variáveis de ambiente (padrões de JobLimits.from_env):
+#   POP_MAX_INPUT_MB (20), POP_BPMN_MAX_ELEMENTS (500000), POP_BPMN_MAX_DEPTH (256),
+#   POP_JOB_TIMEOUT (s, desligado), POP_JOB_MEMORY_MB (desligado)
+from __future__ import annotations
+import os, sys
+
+class JobError(Exception):
+    """
+    Falha de um job com tipo estável, para manifestos e respostas HTTP:
+      entrada_grande, xml_invalido, xml_limite, bpmn_invalido (problema na
+      entrada), tempo_excedido, memoria_excedida, worker_morto (limites) e
+      falha (erro interno)
+    """
+
+    def __init__(self, kind: str, message: str, **detalhe):
+        super().__init__(message)
+        self.kind = kind
+        self.detalhe = detalhe
+
+    def to_dict(self) -> dict:
+        return {"tipo": self.kind, "erro": str(self), **self.detalhe}
+
+    @classmethod
+    def from_dict(cls, d: dict) -> "JobError":
+        d = dict(d)
+        return cls(d.pop("tipo", "falha"), d.pop("erro", ""), **d)
+
+    def __reduce__(self):       # atravessa pickle (ProcessPool) com tipo e detalhe
+        return (JobError.from_dict, (self.to_dict(),))
+
+def _env_num(nome: str, padrao, conv=float):
+    """Número positivo da variável; 0 ou negativo = sem limite; malformado avisa e usa o padrão."""
+    v = os.environ.get(nome, "").strip()
+    if not v:
+        return padrao
+    try:
+        n = conv(v)
+    except ValueError:
+        print(f"AVISO: {nome}={v!r} inválido; usando {padrao if padrao else 'sem limite'}",
+              file=sys.stderr)
+        return padrao
+    return n if n > 0 else None
+
+class JobLimits:
+    __slots__ = ("input_bytes", "max_elements", "max_depth", "wall_s", "mem_mb")
+
+    def __init__(self, input_bytes: int | None = 20 * 1024 * 1024, max_elements: int | None = 500_000,
+                 max_depth: int | None = 256, wall_s: float | None = None, mem_mb: int | None = None):
+        self.input_bytes = input_bytes
+        self.max_elements = max_elements
+        self.max_depth = max_depth
+        self.wall_s = wall_s
+        self.mem_mb = mem_mb
+
+    @classmethod
+    def from_env(cls, **over) -> "JobLimits":
+        mb = _env_num("POP_MAX_INPUT_MB", 20)
+        lim = cls(
+            input_bytes=int(mb * 1024 * 1024) if mb else None,
+            max_elements=_env_num("POP_BPMN_MAX_ELEMENTS", 500_000, int),
+            max_depth=_env_num("POP_BPMN_MAX_DEPTH", 256, int),
+            wall_s=_env_num("POP_JOB_TIMEOUT", None),
+            mem_mb=_env_num("POP_JOB_MEMORY_MB", None, int),
+        )
+        for k, v in over.items():
+            if v is not None:
+                setattr(lim, k, v)
+        return lim
+
+    @property
+    def isolado(self) -> bool:
+        """Tempo ou memória limitados: o job precisa rodar num LimitedWorker."""
+        return bool(self.wall_s or self.mem_mb)
+
+    def check_input(self, tamanho: int) -> None:
+        if self.input_bytes and tamanho > self.input_bytes:
+            raise JobError("entrada_grande", f"BPMN com {tamanho} bytes excede o limite de {self.input_bytes}",
+                           bytes=tamanho, limite=self.input_bytes)
+
+# ---------- worker em processo separado ----------
+
+def _limita_memoria(mem_mb: int) -> None:
+    import resource
+    teto = mem_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (teto, teto))
+
+def _filho(conn, mem_mb, stdout_to_stderr, initializer, initargs):
+    if stdout_to_stderr:
+        os.dup2(2, 1)       # progresso do parser não pode cair num stdout que é dado
+    if initializer is not None:
+        initializer(*initargs)
+    if mem_mb and sys.platform != "win32":
+        _limita_memoria(mem_mb)
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+        if msg is None:
+            break
+        fn, args = msg
+        try:
+            res = ("ok", fn(*args))
+        except MemoryError:
+            res = ("erro", {"tipo": "memoria_excedida", "erro": f"job excedeu {mem_mb} MB de memória"})
+        except JobError as e:
+            res = ("erro", e.to_dict())
+        except Exception as e:
+            import traceback
+            traceback.print_exc()       # erro interno: o rastro fica no stderr do filho
+            res = ("erro", {"tipo": "falha", "erro": str(e)})
+        try:
+            conn.send(res)
+        except MemoryError:
+            conn.send(("erro", {"tipo": "memoria_excedida", "erro": f"job excedeu {mem_mb} MB de memória"}))
+
+class LimitedWorker:
+    """
+    Um processo filho (spawn) que executa um job por vez com os limites de
+    tempo e memória. Se o job estoura o tempo, o filho é morto; se estoura a
+    memória ou o filho morre, ele é descartado. Nos dois casos o próximo job
+    sobe um filho novo e o chamador recebe JobError. Como no ProcessPoolExecutor,
+    `initializer(*initargs)` roda em cada filho novo antes do primeiro job.
+    """
+
+    def __init__(self, limits: JobLimits, stdout_to_stderr: bool = False, initializer=None, initargs: tuple = ()):
+        self.limits = limits
+        self.stdout_to_stderr = stdout_to_stderr
+        self.initializer, self.initargs = initializer, tuple(initargs)
+        self._proc = self._conn = None
+        self.trocas = 0
+
+    def _inicia(self):
+        import multiprocessing
+        ctx = multiprocessing.get_context("spawn")
+        pai, filho = ctx.Pipe()
+        self._proc = ctx.Process(target=_filho, args=(filho, self.limits.mem_mb, self.stdout_to_stderr,
+                                                           self.initializer, self.initargs),
+                                 name="pop-job-worker", daemon=True)
+        self._proc.start()
+        filho.close()
+        self._conn = pai
+
+    def _descarta(self, troca: bool = True):
+        if self._proc is not None:
+            if self._proc.is_alive():
+                self._proc.kill()
+            self._proc.join()
+            self._conn.close()
+            self.trocas += troca
+        self._proc = self._conn = None
+
+    def run(self, fn, *args):
+        """Executa `fn(*args)` no filho (fn e args precisam ser picklable)."""
+        if self._proc is not None and not self._proc.is_alive():
+            self._descarta()
+        if self._proc is None:
+            self._inicia()
+        try:
+            self._conn.send((fn, args))
+            pronto = self._conn.poll(self.limits.wall_s)
+            if not pronto:
+                self._descarta()
+                raise JobError("tempo_excedido", f"job excedeu {self.limits.wall_s:g} s", limite_s=self.limits.wall_s)
+            status, res = self._conn.recv()
+        except (EOFError, BrokenPipeError, ConnectionResetError):
+            self._proc.join(1)
+            codigo = self._proc.exitcode
+            self._descarta()
+            raise JobError("worker_morto", f"worker terminou durante o job (código {codigo})", codigo=codigo)
+        if status == "ok":
+            return res
+        if res.get("tipo") == "memoria_excedida":
+            self._descarta()    # heap do filho pode ter ficado em estado ruim
+        raise JobError.from_dict(res)
+
+    def close(self):
+        if self._proc is not None and self._proc.is_alive():
+            try:
+                self._conn.send(None)
+            except OSError:
+                pass
+            self._proc.join(5)
+        self._descarta(troca=False)
@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# POP/loadtest.py
+# Teste de carga da camada de serviço: reexecuta um corpus de BPMNs (reais ou
+# sintéticos) contra uma ou mais configurações e mede, por configuração:
+#   vazão (jobs/s), latência p50/p95/p99, pico de RSS, bytes gravados no workspace
+#   e custo de fsync conforme a durabilidade (--durability none|file|group).
+#
+# Modos:
+#   inproc  : generate_pop_odt em sequência, no próprio processo
+#   thread  : ThreadPoolExecutor com `concorrencia` threads
+#   process : ProcessPoolExecutor com `concorrencia` processos
+#   server  : server.make_server numa porta efêmera + clientes HTTP concorrentes
+#
+# Sem --rate o teste é em malha fechada (sempre `concorrencia` jobs em voo) e a
+# latência é o tempo de serviço. Com --rate os jobs são disparados em instantes
+# fixos (malha aberta) e a latência conta a partir do instante agendado, então
+# a espera por um worker livre também aparece.
+#
+# O índice de busca fica desligado durante a carga (os POPs sintéticos não
+# entram no índice do workspace); --index inclui o custo do upsert na medição.
+#
+# Cada configuração roda num processo filho próprio: ru_maxrss é o pico de vida
+# do processo e, sem isolamento, uma configuração contaminaria a seguinte.
+#
+#   python -m POP.loadtest --synthetic 200 --modes inproc,thread,process --concurrency 1,4
+#   python -m POP.loadtest --corpus "bpmns/*.bpmn" --modes server --concurrency 8 --rate 20
+from __future__ import annotations
+import argparse, glob, json, multiprocessing, os, random, resource, shutil, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import quoteattr, escape
+
+MODES = ("inproc", "thread", "process", "server")
+
+# ---------- corpus ----------
+
+def load_corpus(spec: str) -> list[Path]:
+    """Diretório (todos os .bpmn dentro, recursivo) ou padrão glob."""
+    p = Path(spec)
+    if p.is_dir():
+        files = sorted(p.rglob("*.bpmn"))
+    else:
+        files = sorted(Path(x) for x in glob.glob(spec, recursive=True))
+    if not files:
+        raise SystemExit(f"ERRO: nenhum BPMN encontrado em {spec!r}")
+    return files
+
+def _prop(name: str, value: str) -> str:
+    return f'          <zeebe:property name={quoteattr("pop:" + name)} value={quoteattr(value)} />'
+
+def synthetic_bpmn(i: int, atividades: int = 12, rng: random.Random | None = None) -> str:
+    """
+    BPMN sintético no formato que o parser espera: participante com as
+    propriedades pop:* (valores válidos dos `choices` do template) e um processo
+    linear com `atividades` tarefas documentadas, metade dentro de um subprocesso.
+    """
+    from .build_context.extraction_plan import compile_plan
+    rng = rng or random.Random(i)
+    maps = compile_plan().choice_maps()
+    escolhe = lambda campo: rng.choice(sorted(maps[f"pop:{campo}"]))
+    props = [
+        ("nomeProcesso", f"Processo Sintetico {i:05d}"),
+        ("codigo", f"POP-{i:05d}"),
+        ("versao", f"{rng.randint(1, 9):02d}"),
+        ("objetivoEstrategico1", escolhe("objetivoEstrategico1")),
+        ("objetivoEstrategico2", escolhe("objetivoEstrategico2")),
+        ("indicadorEstrategico1", escolhe("indicadorEstrategico1")),
+        ("superintendenciaResponsavel", escolhe("superintendenciaResponsavel")),
+        ("departamentoResponsavel", escolhe("departamentoResponsavel")),
+        ("palavraChave1", "carga"),
+        ("palavraChave2", f"lote{i % 7}"),
+        ("palavrasChaveAdicionais", "teste // sintetico"),
+        ("dicionario1_termo", "POP"),
+        ("dicionario1_significado", "Procedimento Operacional Padrão"),
+        ("rodape_elaborador", "CT Carga"),
+        ("aprovacao_data", "01/01/2025"),
+    ]
+    doc = escape("<p>Passo {n} do processo {i}<br>com detalhes.</p><ul><li>Conferir</li><li>Registrar &amp; arquivar</li></ul>")
+    meio = atividades // 2
+    fora = [f"T{n}" for n in range(1, atividades - meio + 1)]
+    dentro = [f"T{n}" for n in range(atividades - meio + 1, atividades + 1)]
+
+    def tarefa(tid):
+        n = int(tid[1:])
+        return (f'    <bpmn:task id="{tid}" name="Atividade {n}">\n'
+                f'      <bpmn:documentation>{doc.format(n=n, i=i)}</bpmn:documentation>\n    </bpmn:task>')
+
+    def fluxos(ids, pref):
+        return "\n".join(f'    <bpmn:sequenceFlow id="{pref}{k}" sourceRef="{a}" targetRef="{b}" />'
+                         for k, (a, b) in enumerate(zip(ids, ids[1:])))
+
+    sub = ["S1s"] + dentro
+    topo = ["SE"] + fora + (["S1"] if dentro else []) + ["EE"]
+    corpo_sub = ""
+    if dentro:
+        corpo_sub = ('    <bpmn:subProcess id="S1" name="Subprocesso">\n    <bpmn:startEvent id="S1s" />\n'
+                     + "\n".join(tarefa(t) for t in dentro) + "\n" + fluxos(sub, "fs") + "\n    </bpmn:subProcess>")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<bpmn:definitions xmlns:bpmn="http://www.omg.org/spec/BPMN/20100524/MODEL" xmlns:zeebe="http://camunda.org/schema/zeebe/1.0" id="D{i}">
+  <bpmn:collaboration id="C1">
+    <bpmn:participant id="P1" name="Registro de Software" processRef="Proc1">
+      <bpmn:extensionElements>
+        <zeebe:properties>
+{chr(10).join(_prop(k, v) for k, v in props)}
+        </zeebe:properties>
+      </bpmn:extensionElements>
+    </bpmn:participant>
+  </bpmn:collaboration>
+  <bpmn:process id="Proc1" isExecutable="true">
+    <bpmn:startEvent id="SE" name="Início" />
+{chr(10).join(tarefa(t) for t in fora)}
+{corpo_sub}
+    <bpmn:endEvent id="EE" />
+{fluxos(topo, "f")}
+  </bpmn:process>
+</bpmn:definitions>
+"""
+
+def write_synthetic_corpus(n: int, out_dir, atividades: int = 12, seed: int = 0) -> list[Path]:
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(seed)
+    files = []
+    for i in range(n):
+        p = out_dir / f"sintetico_{i:05d}.bpmn"
+        p.write_text(synthetic_bpmn(i, atividades, rng), encoding="utf-8")
+        files.append(p)
+    return files
+
+# ---------- medição ----------
+
+def _du(root) -> int:
+    """Bytes em disco sob `root` (soma dos tamanhos dos arquivos)."""
+    total, pilha = 0, [str(root)]
+    while pilha:
+        try:
+            it = os.scandir(pilha.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    pilha.append(e.path)
+                elif e.is_file(follow_symlinks=False):
+                    try:
+                        total += e.stat(follow_symlinks=False).st_size
+                    except FileNotFoundError:
+                        pass
+    return total
+
+def percentile(sorted_vals: list[float], q: float) -> float | None:
+    """Percentil por interpolação linear (q em 0..100) de uma lista já ordenada."""
+    if not sorted_vals:
+        return None
+    k = (len(sorted_vals) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+def _rss_kib(who) -> int:
+    # Linux informa em KiB, macOS em bytes
+    v = resource.getrusage(who).ru_maxrss
+    return v // 1024 if sys.platform == "darwin" else v
+
+# ---------- tarefas (nível de módulo: precisam ser picklable para o ProcessPool) ----------
+
+def _job_generate(bpmn: str, out_dir: str) -> tuple[bool, float, str]:
+    from .service import generate_pop_odt
+    t0 = time.perf_counter()
+    try:
+        generate_pop_odt(bpmn, out_dir=out_dir)
+    except Exception as e:
+        return False, time.perf_counter() - t0, f"{type(e).__name__}: {e}"
+    return True, time.perf_counter() - t0, ""
+
+def _job_http(url: str, blob: bytes) -> tuple[bool, float, str]:
+    import http.client
+    from urllib.parse import urlparse
+    u = urlparse(url)
+    t0 = time.perf_counter()
+    conn = http.client.HTTPConnection(u.hostname, u.port, timeout=300)
+    try:
+        conn.request("POST", u.path, body=blob, headers={"Content-Type": "application/xml"})
+        resp = conn.getresponse()
+        resp.read()
+        ok = resp.status == 200
+        err = "" if ok else f"HTTP {resp.status}"
+    except Exception as e:
+        ok, err = False, f"{type(e).__name__}: {e}"
+    finally:
+        conn.close()
+    return ok, time.perf_counter() - t0, err
+
+def _warm_process(durabilidade=None, indice=True):
+    # aquece o worker (imports + template em memória) antes de medir
+    if durabilidade:
+        from .workspace import set_durability
+        set_durability(*durabilidade)     # filhos de spawn não herdam o modo do pai
+    if not indice:
+        from .search_index import set_indexing
+        set_indexing(False)
+    from .service import DEFAULT_TEMPLATE
+    from .render.template_snapshot import load_template
+    load_template(DEFAULT_TEMPLATE)
+
+# ---------- execução de uma configuração ----------
+
+def _drive(submit, itens: list, rate: float | None) -> tuple[list, float]:
+    """
+    Dispara `itens` via `submit(item) -> Future` e devolve ([(ok, latência, erro)], duração).
+    Com `rate`, agenda o i-ésimo job em t0 + i/rate e mede a latência desde o agendamento.
+    """
+    results, lock = [], threading.Lock()
+    futs = []
+    t0 = time.perf_counter()
+    for i, item in enumerate(itens):
+        agendado = None
+        if rate:
+            agendado = t0 + i / rate
+            espera = agendado - time.perf_counter()
+            if espera > 0:
+                time.sleep(espera)
+        fut = submit(item)
+
+        def _done(f, agendado=agendado):
+            fim = time.perf_counter()
+            try:
+                ok, dur, err = f.result()
+            except Exception as e:
+                ok, dur, err = False, 0.0, f"{type(e).__name__}: {e}"
+            with lock:
+                results.append((ok, (fim - agendado) if agendado is not None else dur, err))
+        fut.add_done_callback(_done)
+        futs.append(fut)
+    for f in futs:
+        try:
+            f.result()
+        except Exception:
+            pass
+    return results, time.perf_counter() - t0
+
+def run_config(mode: str, concurrency: int, corpus: list[Path], requests: int, rate: float | None = None,
+               warmup: int = 2, queue_size: int | None = None, durability: str = "none",
+               index: bool = False) -> dict:
+    """
+    Roda uma configuração no processo atual e devolve o relatório (sem isolamento de RSS).
+    Os contadores de fsync só cobrem o processo atual: no modo process ficam vazios.
+    Sem `index`, as gerações não atualizam o índice de busca: o tempo medido é o
+    da geração e os POPs da carga não entram no índice do workspace.
+    """
+    from concurrent.futures import Future
+    from .workspace import (WORKDIR, ensure_workdirs, set_durability, checkpoint, durability_stats,
+                            durability_config)
+
+    if mode not in MODES:
+        raise ValueError(f"modo desconhecido: {mode!r} (use {', '.join(MODES)})")
+    concurrency = 1 if mode == "inproc" else max(1, concurrency)
+    itens = [str(corpus[i % len(corpus)]) for i in range(requests)]
+    aquece = [str(corpus[i % len(corpus)]) for i in range(warmup)]
+    from .search_index import set_indexing
+    ensure_workdirs()
+    set_durability(durability)
+    set_indexing(index)
+    out_dir = tempfile.mkdtemp(prefix="pop-carga-")
+    extra = {}
+
+    httpd = pool = None
+    if mode == "inproc":
+        def submit(b):
+            f = Future()
+            f.set_result(_job_generate(b, out_dir))
+            return f
+        fechar = lambda: None
+    elif mode == "thread":
+        ex = ThreadPoolExecutor(concurrency)
+        submit = lambda b: ex.submit(_job_generate, b, out_dir)
+        fechar = ex.shutdown
+    elif mode == "process":
+        ex = ProcessPoolExecutor(concurrency, initializer=_warm_process,
+                                 initargs=(durability_config(), index))
+        submit = lambda b: ex.submit(_job_generate, b, out_dir)
+        fechar = ex.shutdown
+    else:
+        from .server import GenerationPool, make_server
+        pool = GenerationPool(workers=concurrency, queue_size=queue_size or concurrency * 2).start()
+        httpd = make_server("127.0.0.1", 0, pool)
+        httpd.RequestHandlerClass.log_message = lambda *a, **k: None   # sem log de acesso por job
+        threading.Thread(target=httpd.serve_forever, name="pop-carga-http", daemon=True).start()
+        url = f"http://127.0.0.1:{httpd.server_address[1]}/pop"
+        blobs = {b: Path(b).read_bytes() for b in set(itens) | set(aquece)}
+        # clientes: com --rate, folga para não virarem o gargalo da malha aberta
+        ex = ThreadPoolExecutor(concurrency * (4 if rate else 1))
+        submit = lambda b: ex.submit(_job_http, url, blobs[b])
+
+        def fechar():
+            ex.shutdown()
+            httpd.shutdown()
+            httpd.server_close()
+            pool.shutdown()
+
+    try:
+        if aquece:
+            _drive(submit, aquece, None)
+        checkpoint()
+        fs0 = durability_stats()
+        ws0 = _du(WORKDIR)
+        results, dur = _drive(submit, itens, rate)
+        t0 = time.perf_counter()
+        checkpoint()                # o último grupo entra na duração medida
+        dur += time.perf_counter() - t0
+        fs1 = durability_stats()
+        ws1 = _du(WORKDIR)
+        if pool is not None:
+            extra["servidor"] = pool.snapshot()
+    finally:
+        fechar()
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    lat = sorted(r[1] for r in results if r[0])
+    erros = [r[2] for r in results if not r[0]]
+    ms = lambda v: round(v * 1000, 1) if v is not None else None
+    return {
+        "modo": mode,
+        "concorrencia": concurrency,
+        "rate": rate,
+        "jobs": len(results),
+        "ok": len(lat),
+        "erros": len(erros),
+        "amostra_erros": sorted(set(erros))[:3],
+        "duracao_s": round(dur, 3),
+        "vazao_jobs_s": round(len(lat) / dur, 2) if dur else None,
+        "p50_ms": ms(percentile(lat, 50)),
+        "p95_ms": ms(percentile(lat, 95)),
+        "p99_ms": ms(percentile(lat, 99)),
+        "max_ms": ms(lat[-1] if lat else None),
+        "rss_pico_kib": _rss_kib(resource.RUSAGE_SELF),
+        "rss_pico_filhos_kib": _rss_kib(resource.RUSAGE_CHILDREN),
+        "workspace_bytes": ws1 - ws0,
+        "durabilidade": durability,
+        "indice": index,
+        **({k: (round(fs1[k] - fs0[k], 3) if mode != "process" else None)
+            for k in ("arquivos", "diretorios", "checkpoints", "fsync_ms")}),
+        **extra,
+    }
+
+def _isolated_child(conn, kwargs):
+    # silencia o progresso do parser (stdout) também nos netos do ProcessPool
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        conn.send(("ok", run_config(**kwargs)))
+    except BaseException as e:
+        conn.send(("erro", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+def run_isolated(**kwargs) -> dict:
+    """`run_config` num processo novo, para que o pico de RSS seja só daquela configuração."""
+    ctx = multiprocessing.get_context("spawn")
+    rx, tx = ctx.Pipe(duplex=False)
+    p = ctx.Process(target=_isolated_child, args=(tx, kwargs), name=f"pop-carga-{kwargs['mode']}")
+    p.start()
+    tx.close()
+    try:
+        status, res = rx.recv()
+    except EOFError:
+        status, res = "erro", f"processo de teste terminou com código {p.exitcode}"
+    p.join()
+    if status != "ok":
+        raise RuntimeError(res)
+    return res
+
+# ---------- CLI ----------
+
+_COLS = [("modo", 8), ("concorrencia", 5), ("jobs", 6), ("erros", 6), ("vazao_jobs_s", 9),
+         ("p50_ms", 9), ("p95_ms", 9), ("p99_ms", 9), ("rss_pico_kib", 10), ("workspace_bytes", 12),
+         ("fsync_ms", 9)]
+_TITULOS = {"concorrencia": "conc", "vazao_jobs_s": "jobs/s", "rss_pico_kib": "RSS KiB",
+            "workspace_bytes": "ws bytes", "fsync_ms": "fsync ms"}
+
+def _tabela(rows: list[dict]) -> str:
+    linhas = [" ".join(f"{_TITULOS.get(c, c):>{w}}" for c, w in _COLS)]
+    for r in rows:
+        rss = r["rss_pico_kib"] + (r["rss_pico_filhos_kib"] if r["modo"] == "process" else 0)
+        vals = {**r, "rss_pico_kib": rss}
+        linhas.append(" ".join(f"{'-' if vals[c] is None else vals[c]!s:>{w}}" for c, w in _COLS))
+    return "\n".join(linhas)
+
+def _lista_int(s: str) -> list[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+def main():
+    ap = argparse.ArgumentParser(description="Teste de carga da geração de POP (vazão, latência, RSS, workspace)")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--corpus", help="Diretório ou glob de BPMNs reais")
+    src.add_argument("--synthetic", type=int, metavar="N", help="Gera N BPMNs sintéticos")
+    ap.add_argument("--atividades", type=int, default=12, help="Atividades por BPMN sintético (padrão: 12)")
+    ap.add_argument("--modes", default="inproc,thread", help=f"Lista separada por vírgula: {','.join(MODES)}")
+    ap.add_argument("--concurrency", default="1,4", help="Lista de concorrências (padrão: 1,4)")
+    ap.add_argument("--requests", type=int, help="Jobs por configuração (padrão: tamanho do corpus)")
+    ap.add_argument("--rate", type=float, help="Malha aberta: jobs disparados por segundo")
+    ap.add_argument("--warmup", type=int, default=2, help="Jobs de aquecimento fora da medição (padrão: 2)")
+    ap.add_argument("--queue-size", type=int, help="Modo server: vagas na fila (padrão: 2x concorrência)")
+    ap.add_argument("--durability", choices=["none", "file", "group"], default="none",
+                    help="Durabilidade das gravações (padrão: none)")
+    ap.add_argument("--index", action="store_true",
+                    help="Inclui a atualização do índice de busca na medição (padrão: desligada)")
+    ap.add_argument("--json", dest="json_out", help="Grava os relatórios em JSON neste arquivo")
+    args = ap.parse_args()
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for m in modes:
+        if m not in MODES:
+            ap.error(f"modo desconhecido: {m} (use {', '.join(MODES)})")
+
+    tmp = None
+    if args.synthetic:
+        tmp = tempfile.TemporaryDirectory(prefix="pop-corpus-")
+        corpus = write_synthetic_corpus(args.synthetic, tmp.name, args.atividades)
+    else:
+        corpus = load_corpus(args.corpus)
+    requests = args.requests or len(corpus)
+
+    rows = []
+    try:
+        for m in modes:
+            for c in (_lista_int(args.concurrency) if m != "inproc" else [1]):
+                print(f"... {m} x{c} ({requests} jobs)", file=sys.stderr)
+                rows.append(run_isolated(mode=m, concurrency=c, corpus=corpus, requests=requests,
+                                         rate=args.rate, warmup=args.warmup, queue_size=args.queue_size,
+                                         durability=args.durability, index=args.index))
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+
+    print(_tabela(rows))
+    for r in rows:
+        if r["erros"]:
+            print(f"  {r['modo']} x{r['concorrencia']}: {r['erros']} erro(s), ex.: {r['amostra_erros']}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,6 @@
-from .fill_first_page_xml import render_odt
-
+# Import preguiçoso: `from POP.render import render_odt` só carrega o lxml no primeiro uso.
+def __getattr__(name):
+    if name == "render_odt":
+        from .fill_first_page_xml import render_odt
+        return render_odt
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
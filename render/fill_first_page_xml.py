@@ -1,10 +1,20 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import copy
+import json
+import os
+import threading
+import time
+import weakref
 import zipfile
 from pathlib import Path
 import re
 from lxml import etree as ET
 
+from ..cache import ELEMENTOS, FRAGMENTOS, content_key
+from ..build_context.model import as_dict
+from .template_snapshot import load_template
+
 def _find_paragraph(el):
     """Sobe na árvore até achar o <text:p> que contém o elemento."""
     cur = el
@@ -249,35 +259,63 @@ def fill_bookmark_range_same_parent(root, name: str, linhas, as_paragraphs=False
 def _serialize(root) -> bytes:
     return ET.tostring(root, xml_declaration=True, encoding="UTF-8")
 
-def _write_odt_like_template(src_zip: zipfile.ZipFile, files_to_update: dict, out_path: Path) -> bytes:
+_BASES = weakref.WeakKeyDictionary()     # template -> {membros atualizados: zip base}
+_BASES_LOCK = threading.Lock()
+
+def _zipinfo(src_zip, name: str, compress_type=None) -> zipfile.ZipInfo:
+    """ZipInfo novo com data e compressão do membro no template (o original não é reaproveitado)."""
+    try:
+        orig = src_zip.getinfo(name)
+    except KeyError:
+        zi = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        zi.compress_type = compress_type if compress_type is not None else zipfile.ZIP_DEFLATED
+        return zi
+    zi = zipfile.ZipInfo(name, date_time=orig.date_time)
+    zi.compress_type = compress_type if compress_type is not None else orig.compress_type
+    zi.external_attr = orig.external_attr
+    return zi
+
+def _base_zip(src_zip, atualizados: frozenset) -> bytes:
+    """
+    Zip com mimetype (primeiro, sem compressão) e todos os membros estáticos do
+    template, cada um com a compressão que tem no template. Montado uma vez por
+    template e conjunto de membros atualizados; cada render só acrescenta os XML.
+    """
+    with _BASES_LOCK:
+        por_tpl = _BASES.setdefault(src_zip, {})
+        base = por_tpl.get(atualizados)
+        if base is not None:
+            return base
+        from io import BytesIO
+        buff = BytesIO()
+        nomes = src_zip.namelist()
+        with zipfile.ZipFile(buff, "w") as zout:
+            # Exige mimetype como primeira entrada, sem compressão
+            mt = src_zip.read("mimetype") if "mimetype" in nomes else b"application/vnd.oasis.opendocument.text"
+            zout.writestr(_zipinfo(src_zip, "mimetype", zipfile.ZIP_STORED), mt)
+            for name in nomes:
+                if name == "mimetype" or name in atualizados:
+                    continue
+                zout.writestr(_zipinfo(src_zip, name), src_zip.read(name), compresslevel=9)
+        por_tpl[atualizados] = base = buff.getvalue()
+        return base
+
+def _write_odt_like_template(src_zip, files_to_update: dict, out_path: Path) -> bytes:
     """
     Grava um novo arquivo ODT baseado em um template, atualizando os arquivos
     cujos conteúdos são passados no dicionário `files_to_update`.
+    `src_zip` pode ser um ZipFile ou um TemplateSnapshot (mesma interface de leitura).
+    Os membros estáticos saem com a compressão do template; os atualizados, com deflate.
     """
     from io import BytesIO
-    buff = BytesIO()
-    with zipfile.ZipFile(buff, "w") as zout:
-        # Exige mimetype como primeira entrada, sem compressão
-        mt = src_zip.read("mimetype") if "mimetype" in src_zip.namelist() else b"application/vnd.oasis.opendocument.text"
-        zi = zipfile.ZipInfo("mimetype")
-        zi.compress_type = zipfile.ZIP_STORED
-        zout.writestr(zi, mt)
-
-        # Copia todos os arquivos do original, exceto os que vamos atualizar
-        files_to_ignore = {"mimetype"} | files_to_update.keys()
-        for name in src_zip.namelist():
-            if name in files_to_ignore:
-                continue
-            zout.writestr(name, src_zip.read(name))
-
-        # Escreve os arquivos modificados
+    buff = BytesIO(_base_zip(src_zip, frozenset(files_to_update) - {"mimetype"}))
+    with zipfile.ZipFile(buff, "a") as zout:
         for name, content in files_to_update.items():
-            zout.writestr(name, content)
-            
+            if name == "mimetype":
+                continue
+            zout.writestr(_zipinfo(src_zip, name, zipfile.ZIP_DEFLATED), content, compresslevel=6)
     return buff.getvalue()
 
-import ast # Garanta que esta linha está no topo do seu arquivo
-
 def processa_lista_aninhada(itens_brutos: list) -> list:
     """
     Processa uma lista do contexto onde apenas o último item pode
@@ -294,6 +332,7 @@ def processa_lista_aninhada(itens_brutos: list) -> list:
     
     # Tenta interpretar o último item como uma literal Python (ex: "['a', 'b']")
     if ultimo_item_str.startswith('[') and ultimo_item_str.endswith(']'):
+        import ast  # só carrega quando há sub-lista para interpretar
         try:
             sub_lista = ast.literal_eval(ultimo_item_str)
             if isinstance(sub_lista, list):
@@ -354,6 +393,116 @@ def insere_lista_como_bullets(root, bookmark_name: str, lista_de_itens: list):
 
     return len(hits)
 
+_FRAG_ABRE  = f'<pop-frag xmlns:text="{TEXT_NS}">'.encode("utf-8")
+_FRAG_FECHA = b"</pop-frag>"
+
+def _serializa_fragmento(el) -> bytes:
+    """Serializa `el` com prefixo `text:` e sem declaração de namespace."""
+    raw = ET.tostring(el, encoding="UTF-8", xml_declaration=False)
+    return raw.replace(f' xmlns:text="{TEXT_NS}"'.encode("utf-8"), b"", 1)
+
+def _fragmento_para_elementos(frag: bytes) -> list:
+    """Reconstrói os elementos de um fragmento gerado por `_serializa_fragmento`."""
+    return list(ET.fromstring(_FRAG_ABRE + frag + _FRAG_FECHA))
+
+def _elementos_descricao(atividade: dict, style_descricao: str) -> list:
+    """
+    Elementos da descrição prontos para inserir: o parse do fragmento fica em
+    cache (só memória) e cada chamada recebe cópias, que o documento pode adotar.
+    """
+    chave = _chave_descricao(atividade, style_descricao)
+    modelo = ELEMENTOS.get(chave)
+    if modelo is None:
+        modelo = _fragmento_para_elementos(_fragmento_descricao(atividade, style_descricao, chave))
+        ELEMENTOS.put(chave, modelo, disk=False)
+    return [copy.copy(e) for e in modelo]
+
+# estilos de lista do template usados nos blocos da documentação
+ESTILO_LISTA_BULLET   = "L1"
+ESTILO_LISTA_NUMERADA = "Numbering_20_123"
+# parágrafo da descrição das atividades ('Text_20_body' é comum nos templates)
+ESTILO_DESCRICAO      = "Text_20_body"
+
+def _paragrafo_linhas(linhas, style: str):
+    """<text:p> com um <text:span> por linha, separados por <text:line-break/>."""
+    p = ET.Element(_t("p"), nsmap={"text": TEXT_NS})
+    if style:
+        p.set(f"{{{TEXT_NS}}}style-name", style)
+    for j, linha in enumerate(linhas):
+        span = ET.SubElement(p, _t("span"))
+        span.text = linha
+        if j < len(linhas) - 1:
+            ET.SubElement(p, _t("line-break"))
+    return p
+
+def _lista_de_blocos(bloco: dict, style: str):
+    """Bloco {"tipo": "lista"} -> <text:list>, aninhando <text:list> por nível."""
+    def _nova_lista(ordenada):
+        el = ET.Element(_t("list"), nsmap={"text": TEXT_NS})
+        el.set(f"{{{TEXT_NS}}}style-name", ESTILO_LISTA_NUMERADA if ordenada else ESTILO_LISTA_BULLET)
+        return el
+
+    raiz = _nova_lista(bloco.get("ordenada"))
+    pilha = [raiz]              # pilha[n] = <text:list> do nível n
+    ultimo_item = [None]        # último <text:list-item> de cada nível
+    for it in bloco.get("itens", []):
+        nivel = min(int(it.get("nivel", 0)), len(pilha))
+        if it.get("continuacao") and nivel < len(ultimo_item) and ultimo_item[nivel] is not None:
+            # texto depois de uma sublista no mesmo <li>: outro parágrafo no mesmo list-item
+            del pilha[nivel + 1:]
+            del ultimo_item[nivel + 1:]
+            ultimo_item[nivel].append(_paragrafo_linhas(it.get("linhas") or [""], style))
+            continue
+        del pilha[nivel + 1:]
+        del ultimo_item[nivel + 1:]
+        if nivel == len(pilha):
+            pai = ultimo_item[nivel - 1]
+            if pai is None:
+                pai = ET.SubElement(pilha[-1], _t("list-item"))
+            sub = _nova_lista(it.get("ordenada"))
+            pai.append(sub)
+            pilha.append(sub)
+            ultimo_item.append(None)
+        item = ET.SubElement(pilha[nivel], _t("list-item"))
+        item.append(_paragrafo_linhas(it.get("linhas") or [""], style))
+        ultimo_item[nivel] = item
+    return raiz
+
+# Sobe a cada mudança no XML gerado por _fragmento_descricao: entra na chave do
+# cache de fragmentos (inclusive em POP_CACHE_DIR).
+FRAGMENTO_VERSAO = 2
+
+def _chave_descricao(atividade: dict, style_descricao: str) -> str:
+    """
+    Chave do fragmento da descrição. Blocos vindos do conversor (congelados)
+    já trazem a chave do conteúdo de origem; os demais (contexto lido de JSON,
+    editado à mão) são serializados para o hash.
+    """
+    blocos = atividade.get("blocos")
+    origem = getattr(blocos, "chave", None) if blocos else None
+    if origem is None:
+        origem = json.dumps(blocos, ensure_ascii=False, sort_keys=True) if blocos else atividade.get('descricao', '')
+    return content_key("descricao", FRAGMENTO_VERSAO, style_descricao, bool(blocos), origem)
+
+def _fragmento_descricao(atividade: dict, style_descricao: str, chave: str | None = None) -> bytes:
+    """Descrição de uma atividade (parágrafos e listas), serializada e guardada em cache."""
+    blocos = atividade.get("blocos")
+    texto_descricao = atividade.get('descricao', '')
+
+    def _monta() -> bytes:
+        if not blocos:
+            # sem blocos: um parágrafo, tratando possíveis quebras de linha
+            return _serializa_fragmento(_paragrafo_linhas(texto_descricao.split('\n'), style_descricao))
+        partes = []
+        for b in blocos:
+            if b.get("tipo") == "lista":
+                partes.append(_serializa_fragmento(_lista_de_blocos(b, style_descricao)))
+            else:
+                partes.append(_serializa_fragmento(_paragrafo_linhas(b.get("linhas") or [""], style_descricao)))
+        return b"".join(partes)
+
+    return FRAGMENTOS.get_or_compute(chave or _chave_descricao(atividade, style_descricao), _monta)
+
 def insere_lista_numerada_atividades(root, bookmark_name: str, lista_atividades: list):
     """
     Encontra um marcador e o substitui por uma lista numerada de atividades.
@@ -376,7 +525,7 @@ def insere_lista_numerada_atividades(root, bookmark_name: str, lista_atividades:
         # Define um estilo padrão para o parágrafo de descrição.
         # 'Text_20_body' é um estilo comum em muitos templates.
         # Se a formatação da descrição não ficar boa, este nome pode ser ajustado.
-        style_descricao = 'Text_20_body'
+        style_descricao = ESTILO_DESCRICAO
 
         # Remove o parágrafo original que contém o marcador
         parent.remove(par_original)
@@ -394,21 +543,10 @@ def insere_lista_numerada_atividades(root, bookmark_name: str, lista_atividades:
             parent.insert(idx, p_titulo)
             idx += 1
 
-            # 2. Cria o parágrafo da Descrição
-            p_desc = ET.Element(_t("p"))
-            p_desc.set(f"{{{TEXT_NS}}}style-name", style_descricao)
-            
-            # Trata possíveis quebras de linha na descrição
-            linhas_desc = texto_descricao.split('\n')
-            for j, linha in enumerate(linhas_desc):
-                span = ET.Element(_t("span"))
-                span.text = linha
-                p_desc.append(span)
-                if j < len(linhas_desc) - 1:
-                    p_desc.append(ET.Element(_t("line-break")))
-
-            parent.insert(idx, p_desc)
-            idx += 1
+            # 2. Cria a Descrição: parágrafos e listas (fragmento em cache por conteúdo)
+            for p_desc in _elementos_descricao(atividade, style_descricao):
+                parent.insert(idx, p_desc)
+                idx += 1
             
     return len(hits)
 
@@ -536,79 +674,113 @@ def insert_toc_at_bookmark(root, name="BM_TOC", title="SUMÁRIO",
 
     return changed
 
+def campos_escalares(ctx: dict) -> dict:
+    """User fields "comuns" (content e styles) -> valor a escrever."""
+    return {
+        "POP_NOME_PROCESSO":  ctx.get("nome_processo",""),
+        "POP_CODIGO":         ctx.get("codigo",""),
+        "POP_VERSAO":         _versao_fem_ordinal(ctx.get("versao","")),
+        "POP_SETOR_SUPERIOR": ctx.get("POP_SETOR_SUPERIOR",""),
+        "POP_SETOR_EXECUTOR": ctx.get("POP_SETOR_EXECUTOR",""),
+        "NVL_GERENCIAL":      ctx.get("NVL_GERENCIAL",""),
+        "NVL_OPERACIONAL":    ctx.get("NVL_OPERACIONAL",""),
+        "POP_REVISOR":        ctx.get("rodape_elaborador", ""),
+        "POP_APROVADOR":      ctx.get("aprovacao_responsavel", ""),
+        "POP_DATA_APROVACAO": ctx.get("aprovacao_data", ""),
+    }
+
+# user fields cujo parágrafo some (com a quebra anterior) quando o valor é vazio
+CAMPOS_EORG = ("EORG_SUP", "EORG_EXEC")
+
+def linhas_oe_ie(ctx: dict) -> tuple[list, list]:
+    """Linhas dos objetivos e indicadores estratégicos (; "; e" ".")."""
+    oe_lines = format_lista_semicolas(ctx.get("objetivos_estrategicos", []))
+    ie_raw   = ctx.get("indicadores_estrategicos", [])
+    ie_lines = format_lista_semicolas(ie_raw) if ie_raw else ["Não há indicador sensibilizado"]
+    return oe_lines, ie_lines
+
+def render_parts(template_path: str | Path, ctx: dict):
+    """
+    (template, {"content.xml": bytes, "styles.xml": bytes}) já preenchidos.
+    Usa o esqueleto de bytes do template (render/skeleton.py) e cai para o
+    caminho DOM quando o template não pôde ser compilado ou algum valor
+    precisa do tratamento do lxml. `ctx` pode ser dict ou build_context.model.PopContext.
+    """
+    ctx = as_dict(ctx)
+    if os.environ.get("POP_RENDER", "").lower() != "dom":
+        from .skeleton import render_skeleton_parts
+        parts = render_skeleton_parts(str(template_path), ctx)
+        if parts is not None:
+            return parts
+    return render_parts_dom(template_path, ctx)
+
 def render_odt(template_path: str | Path, ctx: dict) -> bytes:
+    zin, files = render_parts(template_path, ctx)
+    return _write_odt_like_template(zin, files, Path(template_path))
+
+def render_odt_dom(template_path: str | Path, ctx: dict) -> bytes:
+    zin, files = render_parts_dom(template_path, ctx)
+    return _write_odt_like_template(zin, files, Path(template_path))
+
+def render_parts_dom(template_path: str | Path, ctx: dict):
+    ctx = as_dict(ctx)
     template_path = str(template_path)
-    with zipfile.ZipFile(template_path, "r") as zin:
-        # Dicionários para guardar as árvores XML e os novos conteúdos
-        roots = {}
-        files_to_update = {}
-        
-        # Lê os arquivos XML relevantes (content.xml e styles.xml)
-        if 'content.xml' in zin.namelist():
-            xml_content = zin.read("content.xml")
-            roots['content.xml'] = ET.fromstring(xml_content)
-            
-        if 'styles.xml' in zin.namelist():
-            xml_styles = zin.read("styles.xml")
-            roots['styles.xml'] = ET.fromstring(xml_styles)
-
-        # --- Início da Lógica de Substituição ---
-
-        # 1) User fields "comuns"
-        fields = {
-            "POP_NOME_PROCESSO":  ctx.get("nome_processo",""),
-            "POP_CODIGO":         ctx.get("codigo",""),
-            "POP_VERSAO":         _versao_fem_ordinal(ctx.get("versao","")),
-            "POP_SETOR_SUPERIOR": ctx.get("POP_SETOR_SUPERIOR",""),
-            "POP_SETOR_EXECUTOR": ctx.get("POP_SETOR_EXECUTOR",""),
-            "NVL_GERENCIAL":      ctx.get("NVL_GERENCIAL",""),
-            "NVL_OPERACIONAL":    ctx.get("NVL_OPERACIONAL",""),
-            "POP_REVISOR":        ctx.get("rodape_elaborador", ""),
-            "POP_APROVADOR":      ctx.get("aprovacao_responsavel", ""),
-            "POP_DATA_APROVACAO": ctx.get("aprovacao_data", ""),
-            # Remova a linha de teste se ainda estiver aqui
-            # "TESTE_ABC": "SE ISTO APARECER, FUNCIONOU!" 
-        }
+    # template já descomprimido (snapshot mmap ou zip lido uma vez por processo)
+    zin = load_template(template_path)
+    # Dicionários para guardar as árvores XML e os novos conteúdos
+    roots = {}
+    files_to_update = {}
+    
+    # Lê os arquivos XML relevantes (content.xml e styles.xml)
+    if 'content.xml' in zin.namelist():
+        xml_content = zin.read("content.xml")
+        roots['content.xml'] = ET.fromstring(xml_content)
         
-        # Aplica a substituição em todos os XMLs carregados (content e styles)
-        for root in roots.values():
-            for k, v in fields.items():
-                replace_userfield(root, k, v)
-
-        # 1.1) EORGs com limpeza de quebra quando vazios
-        eorg_sup  = ctx.get("EORG_SUP", "")
-        eorg_exec = ctx.get("EORG_EXEC", "")
-        for root in roots.values():
-            replace_userfield_cleanup(root, "EORG_SUP",  eorg_sup,  remove_prev_break_if_empty=True)
-            replace_userfield_cleanup(root, "EORG_EXEC", eorg_exec, remove_prev_break_if_empty=True)
-
-        # 2) Listas (ENTER real entre itens) - Geralmente ficam só no content.xml
-        if 'content.xml' in roots:
-            content_root = roots['content.xml']
-            oe_lines = format_lista_semicolas(ctx.get("objetivos_estrategicos", []))
-            ie_raw   = ctx.get("indicadores_estrategicos", [])
-            ie_lines = format_lista_semicolas(ie_raw) if ie_raw else ["Não há indicador sensibilizado"]
-
-            _ = (fill_bookmark_single(content_root, "BM_OE_LIST", oe_lines, as_paragraphs=True)
-                 or fill_bookmark_range_same_parent(content_root, "BM_OE_LIST", oe_lines, as_paragraphs=True))
-
-            _ = (fill_bookmark_single(content_root, "BM_IE_LIST", ie_lines, as_paragraphs=True)
-                 or fill_bookmark_range_same_parent(content_root, "BM_IE_LIST", ie_lines, as_paragraphs=True))
-            # 1. Processa a lista "suja" do contexto para garantir que esteja limpa
-            palavras_chave_processadas = processa_lista_aninhada(ctx.get("palavras_chave", []))
-            # 2. Insere a lista limpa como bullets, encontrando qualquer tipo de marcador
-            insere_lista_como_bullets(content_root, "BM_PALAVRAS_CHAVE", palavras_chave_processadas)
-            
-            atividades_list = ctx.get("descricao_processo_atividades", [])
-            insere_lista_numerada_atividades(content_root, "BM_ATIVIDADES", atividades_list)
+    if 'styles.xml' in zin.namelist():
+        xml_styles = zin.read("styles.xml")
+        roots['styles.xml'] = ET.fromstring(xml_styles)
 
-            _ = insert_toc_at_bookmark(content_root, name="BM_TOC", title="SUMÁRIO", outline_levels=3)
+    # --- Início da Lógica de Substituição ---
+
+    # 1) User fields "comuns"
+    fields = campos_escalares(ctx)
+    
+    # Aplica a substituição em todos os XMLs carregados (content e styles)
+    for root in roots.values():
+        for k, v in fields.items():
+            replace_userfield(root, k, v)
+
+    # 1.1) EORGs com limpeza de quebra quando vazios
+    eorg_sup  = ctx.get("EORG_SUP", "")
+    eorg_exec = ctx.get("EORG_EXEC", "")
+    for root in roots.values():
+        replace_userfield_cleanup(root, "EORG_SUP",  eorg_sup,  remove_prev_break_if_empty=True)
+        replace_userfield_cleanup(root, "EORG_EXEC", eorg_exec, remove_prev_break_if_empty=True)
+
+    # 2) Listas (ENTER real entre itens) - Geralmente ficam só no content.xml
+    if 'content.xml' in roots:
+        content_root = roots['content.xml']
+        oe_lines, ie_lines = linhas_oe_ie(ctx)
+
+        _ = (fill_bookmark_single(content_root, "BM_OE_LIST", oe_lines, as_paragraphs=True)
+             or fill_bookmark_range_same_parent(content_root, "BM_OE_LIST", oe_lines, as_paragraphs=True))
+
+        _ = (fill_bookmark_single(content_root, "BM_IE_LIST", ie_lines, as_paragraphs=True)
+             or fill_bookmark_range_same_parent(content_root, "BM_IE_LIST", ie_lines, as_paragraphs=True))
+        # 1. Processa a lista "suja" do contexto para garantir que esteja limpa
+        palavras_chave_processadas = processa_lista_aninhada(ctx.get("palavras_chave", []))
+        # 2. Insere a lista limpa como bullets, encontrando qualquer tipo de marcador
+        insere_lista_como_bullets(content_root, "BM_PALAVRAS_CHAVE", palavras_chave_processadas)
         
-        # --- Fim da Lógica de Substituição ---
+        atividades_list = ctx.get("descricao_processo_atividades", [])
+        insere_lista_numerada_atividades(content_root, "BM_ATIVIDADES", atividades_list)
+
+        _ = insert_toc_at_bookmark(content_root, name="BM_TOC", title="SUMÁRIO", outline_levels=3)
+    
+    # --- Fim da Lógica de Substituição ---
 
-        # Serializa todos os arquivos XML que foram modificados
-        for name, root in roots.items():
-            files_to_update[name] = _serialize(root)
+    # Serializa todos os arquivos XML que foram modificados
+    for name, root in roots.items():
+        files_to_update[name] = _serialize(root)
 
-        # Grava o novo ODT com todas as alterações
-        return _write_odt_like_template(zin, files_to_update, Path(template_path))
\ No newline at end of file
+    return zin, files_to_update
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Saída em ODT "plano" (.fodt): um único XML <office:document> com meta,
+# settings, estilos e conteúdo já preenchidos, sem zip. Serve para indexação,
+# diff e grep direto no documento gerado.
+#
+# Imagens:
+#   inline   : cada <draw:image> recebe o arquivo em <office:binary-data> (base64)
+#   external : as imagens são gravadas em `pictures_dir` e o xlink:href passa a
+#              apontar para `<nome de pictures_dir>/<arquivo>` (o .fodt deve ficar
+#              no diretório pai de `pictures_dir`)
+#
+# O documento é escrito seção a seção com lxml.etree.xmlfile; num caminho, via
+# arquivo temporário + os.replace.
+from __future__ import annotations
+import base64, os, uuid
+from pathlib import Path
+from lxml import etree as ET
+
+from .fill_first_page_xml import render_parts, OFFICE_NS
+
+STYLE_NS = "urn:oasis:names:tc:opendocument:xmlns:style:1.0"
+DRAW_NS  = "urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+FODT_MIME = "application/vnd.oasis.opendocument.text"
+PICTURE_MODES = ("inline", "external")
+
+def _o(tag): return f"{{{OFFICE_NS}}}{tag}"
+
+# ordem das seções de um office:document (ODF 1.x, 3.1.2)
+_SECOES = ("meta", "settings", "scripts", "font-face-decls", "styles",
+           "automatic-styles", "master-styles", "body")
+
+def _parse(zin, files: dict, name: str):
+    if name in files:
+        return ET.fromstring(files[name])
+    if name in zin.namelist():
+        return ET.fromstring(zin.read(name))
+    return None
+
+def _renomeia_automaticos(styles_root, content_root) -> int:
+    """
+    Estilos automáticos de styles.xml e de content.xml vivem em espaços de nomes
+    separados no pacote, mas no .fodt ficam juntos. Os nomes de styles.xml que
+    colidirem ganham o prefixo "M" (como o LibreOffice faz), e as referências
+    dentro de styles.xml são atualizadas.
+    """
+    auto_s = styles_root.find(_o("automatic-styles"))
+    auto_c = content_root.find(_o("automatic-styles"))
+    if auto_s is None or auto_c is None:
+        return 0
+    nome_attr = f"{{{STYLE_NS}}}name"
+    usados = {e.get(nome_attr) for e in auto_c} | {e.get(nome_attr) for e in auto_s}
+    novos = {}
+    for e in auto_s:
+        nome = e.get(nome_attr)
+        if nome and any(c.get(nome_attr) == nome for c in auto_c):
+            novo = "M" + nome
+            while novo in usados:
+                novo = "M" + novo
+            usados.add(novo)
+            novos[nome] = novo
+    if not novos:
+        return 0
+    for e in styles_root.iter():
+        for k, v in e.attrib.items():
+            if v in novos and (k == nome_attr or k.endswith("style-name") or k.endswith("layout-name")):
+                e.set(k, novos[v])
+    return len(novos)
+
+def _imagens(roots, zin, pictures: str, pictures_dir: Path | None) -> int:
+    """Resolve os <draw:image xlink:href="Pictures/..."> conforme o modo de imagens."""
+    href_attr = f"{{{XLINK_NS}}}href"
+    gravadas = {}       # href -> base64 (inline) ou arquivo gravado (external)
+    n = 0
+    for root in roots:
+        for img in root.iter(f"{{{DRAW_NS}}}image"):
+            href = img.get(href_attr) or ""
+            if href not in zin.namelist():
+                continue        # link externo ou imagem já embutida
+            if pictures == "inline":
+                for k in list(img.attrib):
+                    if k.startswith(f"{{{XLINK_NS}}}"):
+                        del img.attrib[k]
+                if href not in gravadas:
+                    gravadas[href] = base64.encodebytes(zin.read(href)).decode("ascii")
+                dados = ET.Element(_o("binary-data"))
+                dados.text = gravadas[href]
+                img.insert(0, dados)
+            else:
+                alvo = gravadas.get(href)
+                if alvo is None:
+                    alvo = pictures_dir / Path(href).name
+                    tmp = alvo.with_name(f".{alvo.name}.{os.getpid()}.tmp")
+                    tmp.write_bytes(zin.read(href))
+                    os.replace(tmp, alvo)
+                    gravadas[href] = alvo
+                img.set(href_attr, f"{pictures_dir.name}/{alvo.name}")
+            n += 1
+    return n
+
+def write_fodt(zin, files: dict, out, pictures: str = "inline", pictures_dir=None) -> dict:
+    """
+    Grava o .fodt de um render já feito (`files` = content.xml/styles.xml
+    preenchidos; meta.xml e settings.xml vêm do template). `out` é caminho ou
+    arquivo binário. Devolve {"imagens": n, "estilos_renomeados": n}.
+    """
+    if pictures not in PICTURE_MODES:
+        raise ValueError(f"modo de imagens desconhecido: {pictures!r} (use inline ou external)")
+    if pictures == "external":
+        if pictures_dir is None:
+            raise ValueError("pictures='external' exige pictures_dir")
+        pictures_dir = Path(pictures_dir)
+        pictures_dir.mkdir(parents=True, exist_ok=True)
+
+    content = _parse(zin, files, "content.xml")
+    styles = _parse(zin, files, "styles.xml")
+    meta = _parse(zin, files, "meta.xml")
+    settings = _parse(zin, files, "settings.xml")
+    if content is None:
+        raise ValueError("template sem content.xml")
+    roots = [r for r in (meta, settings, styles, content) if r is not None]
+
+    renomeados = _renomeia_automaticos(styles, content) if styles is not None else 0
+    n_imgs = _imagens([r for r in (styles, content) if r is not None], zin, pictures, pictures_dir)
+
+    # seções: font-face-decls sem repetição; estilos automáticos de styles.xml antes dos de content.xml
+    secoes = {}
+    for root in roots:
+        for sec in root:
+            local = ET.QName(sec).localname
+            if sec.tag != _o(local) or local not in _SECOES:
+                continue
+            atual = secoes.get(local)
+            if atual is None:
+                secoes[local] = sec
+            elif local == "font-face-decls":
+                nomes = {f.get(f"{{{STYLE_NS}}}name") for f in atual}
+                for f in list(sec):
+                    if f.get(f"{{{STYLE_NS}}}name") not in nomes:
+                        atual.append(f)
+            elif local == "automatic-styles":
+                for e in list(sec):
+                    atual.append(e)
+
+    nsmap = {}
+    for root in roots:
+        for k, v in root.nsmap.items():
+            nsmap.setdefault(k, v)
+    mime = zin.read("mimetype").decode("ascii").strip() if "mimetype" in zin.namelist() else FODT_MIME
+    attrib = {_o("mimetype"): mime}
+    versao = content.get(_o("version"))
+    if versao:
+        attrib[_o("version")] = versao
+
+    def escreve(fh):
+        with ET.xmlfile(fh, encoding="UTF-8") as xf:
+            xf.write_declaration()
+            with xf.element(_o("document"), attrib, nsmap=nsmap):
+                for local in _SECOES:
+                    if local in secoes:
+                        sec = secoes[local]
+                        sec.tail = None
+                        xf.write(sec)
+
+    if hasattr(out, "write"):
+        escreve(out)
+    else:
+        # num caminho: tmp ao lado + os.replace, para um erro no meio não deixar .fodt truncado
+        out = Path(out)
+        tmp = out.with_name(f".{out.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with open(tmp, "wb") as fh:
+                escreve(fh)
+            os.replace(tmp, out)
+        finally:
+            if tmp.exists(): tmp.unlink()
+    return {"imagens": n_imgs, "estilos_renomeados": renomeados}
+
+def render_fodt(template_path, ctx: dict, out, pictures: str = "inline", pictures_dir=None) -> dict:
+    """Preenche o template com `ctx` e grava o resultado como .fodt em `out`."""
+    zin, files = render_parts(template_path, ctx)
+    return write_fodt(zin, files, out, pictures=pictures, pictures_dir=pictures_dir)
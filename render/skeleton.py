@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Esqueleto de bytes do template (caminho rápido do render_odt).
+#
+# A maior parte do content.xml e do styles.xml é igual em todo documento. Em
+# vez de parsear, alterar e serializar o DOM a cada geração, o template é
+# compilado uma vez por processo: cada ponto variável (user fields, parágrafos
+# dos EORG, parágrafos de bookmark das listas e das atividades) vira um
+# marcador <?pop-esqueleto N?>, o documento é serializado uma vez e cortado
+# nos marcadores. Gerar passa a ser escapar os valores, montar os fragmentos
+# de lista/atividade e juntar bytes — o custo acompanha o conteúdo dinâmico,
+# não o tamanho do template.
+#
+# O sumário (BM_TOC) não depende do contexto e já entra pronto no esqueleto.
+# Se o template não puder ser cortado com segurança (parágrafos com mais de um
+# ponto variável, campo fora de parágrafo, prefixo `text` diferente...) ou se
+# a verificação contra o caminho DOM divergir, `render_skeleton` devolve None
+# e o render_odt usa o DOM.
+from __future__ import annotations
+import copy, re, threading, weakref
+from pathlib import Path
+from lxml import etree as ET
+
+from .template_snapshot import load_template
+from .fill_first_page_xml import (
+    NS, TEXT_NS, _t, _find_paragraph, _serialize, _serializa_fragmento, _write_odt_like_template,
+    campos_escalares, CAMPOS_EORG, linhas_oe_ie, processa_lista_aninhada, _fragmento_descricao,
+    replace_userfield_cleanup, insert_toc_at_bookmark, render_parts_dom, ESTILO_DESCRICAO,
+)
+
+_PI = "pop-esqueleto"
+_MARCA_RE = re.compile(rb"<\?pop-esqueleto (\d+)\?>")
+# caracteres que o lxml recusa em texto: o DOM levanta o erro certo
+_INVALIDO_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+_SPAN_ABRE, _SPAN_FECHA = b"<text:span>", b"</text:span>"
+_P_FECHA = b"</text:p>"
+
+class _NaoSepara(Exception):
+    """O template não pode ser cortado com segurança: fica no caminho DOM."""
+
+class _ValorInvalido(Exception):
+    """Valor com caractere que o XML não aceita: deixa o DOM reportar o erro."""
+
+def _esc(valor) -> bytes:
+    s = "" if valor is None else str(valor)
+    if _INVALIDO_RE.search(s):
+        raise _ValorInvalido(s)
+    # mesmo escape de texto do libxml2
+    return (s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+             .replace("\r", "&#13;").encode("utf-8"))
+
+def _abre_p(style: str | None) -> bytes:
+    """Tag de abertura de <text:p> com o estilo já escapado como o lxml faria."""
+    if not style:
+        return b"<text:p>"
+    p = ET.Element(_t("p"), nsmap={"text": TEXT_NS})
+    p.set(f"{{{TEXT_NS}}}style-name", style)
+    p.text = "\ue000"
+    return _serializa_fragmento(p).split("\ue000".encode("utf-8"))[0]
+
+# ---------- compilação ----------
+
+class _Compilador:
+    """Marca os pontos variáveis de um XML do template e produz o programa de bytes."""
+
+    def __init__(self, xml: bytes, is_content: bool):
+        if _MARCA_RE.search(xml):
+            raise _NaoSepara("template já contém marcadores do esqueleto")
+        self.root = ET.fromstring(xml)
+        if self.root.nsmap.get("text") != TEXT_NS:
+            raise _NaoSepara("prefixo 'text' não aponta para o namespace do ODF")
+        self.is_content = is_content
+        self.specs: list[tuple] = []
+        self.donos: dict = {}       # parágrafo -> slot que o ocupa
+
+    def _marca(self, *spec):
+        self.specs.append(spec)
+        return ET.ProcessingInstruction(_PI, str(len(self.specs) - 1))
+
+    def _reserva(self, par, dono) -> bool:
+        """True se `par` ficou com `dono`; False se já era dele; erro se de outro slot."""
+        if par is None or par.getparent() is None:
+            raise _NaoSepara(f"{dono}: marcador fora de parágrafo")
+        atual = self.donos.get(par)
+        if atual == dono:
+            return False
+        if atual is not None:
+            raise _NaoSepara(f"parágrafo com {atual} e {dono}")
+        self.donos[par] = dono
+        return True
+
+    def _troca_campos(self, root, nome):
+        for el in root.xpath(f".//text:user-field-get[@text:name='{nome}']", namespaces=NS):
+            el.addprevious(self._marca("campo", nome))
+            el.getparent().remove(el)       # como no DOM, o tail do campo se perde
+
+    def _troca_paragrafo(self, par, *spec):
+        par.addprevious(self._marca(*spec))
+        par.getparent().remove(par)         # o tail do parágrafo também
+
+    def _bookmarks(self, nome, so_ponto=False):
+        xp = (f".//text:bookmark[@text:name='{nome}']" if so_ponto else
+              f".//*[self::text:bookmark or self::text:bookmark-start][@text:name='{nome}']")
+        return self.root.xpath(xp, namespaces=NS)
+
+    def compila(self) -> list:
+        root = self.root
+        for nome in campos_escalares({}):
+            self._troca_campos(root, nome)
+
+        # EORG: o parágrafo inteiro é o slot (some com a quebra anterior quando vazio)
+        regioes = {}
+        for nome in CAMPOS_EORG:
+            for el in root.xpath(f".//text:user-field-get[@text:name='{nome}']", namespaces=NS):
+                par = _find_paragraph(el)
+                if not self._reserva(par, nome):
+                    raise _NaoSepara(f"{nome} repetido no mesmo parágrafo")
+                rid = len(regioes)
+                regioes[rid] = nome
+                par.addprevious(self._marca("ini", rid))
+                par.addnext(self._marca("fim", rid))    # o tail do parágrafo fica dentro da região
+
+        if self.is_content:
+            for nome, kind in (("BM_OE_LIST", "oe"), ("BM_IE_LIST", "ie")):
+                # mesma precedência do DOM: bookmark de ponto; senão bookmark-start
+                pars = [p for p in map(_find_paragraph, self._bookmarks(nome, so_ponto=True)) if p is not None]
+                if not pars:
+                    xp = f".//text:bookmark-start[@text:name='{nome}']"
+                    pars = [p for p in map(_find_paragraph, root.xpath(xp, namespaces=NS)) if p is not None]
+                for par in pars:
+                    if self._reserva(par, nome):
+                        self._troca_paragrafo(par, "linhas", kind, _abre_p(par.get(f"{{{TEXT_NS}}}style-name")))
+            for nome, kind in (("BM_PALAVRAS_CHAVE", "palavras"), ("BM_ATIVIDADES", "atividades")):
+                for bm in self._bookmarks(nome):
+                    par = _find_paragraph(bm)
+                    if par is None or par.getparent() is None:
+                        continue
+                    if self._reserva(par, nome):
+                        self._troca_paragrafo(par, kind, _abre_p(par.get(f"{{{TEXT_NS}}}style-name")))
+            for bm in self._bookmarks("BM_TOC"):
+                if _find_paragraph(bm) in self.donos:
+                    raise _NaoSepara("BM_TOC num parágrafo variável")
+            insert_toc_at_bookmark(root, name="BM_TOC", title="SUMÁRIO", outline_levels=3)
+
+        # variante "vazio" das regiões EORG: aplica a limpeza do DOM numa cópia
+        vazio = None
+        if regioes:
+            vazio = copy.deepcopy(root)
+            for nome in CAMPOS_EORG:
+                replace_userfield_cleanup(vazio, nome, "", remove_prev_break_if_empty=True)
+            for nome in CAMPOS_EORG:
+                self._troca_campos(root, nome)
+
+        prog, vistos = self._programa(_serialize(root))
+        if vistos != set(range(len(self.specs))):
+            raise _NaoSepara("marcador perdido na serialização")
+        vazias = {}
+        if vazio is not None:
+            self._programa(_serialize(vazio), vazias)
+        return self._resolve(prog, regioes, vazias)
+
+    def _programa(self, blob: bytes, regioes: dict | None = None):
+        """Corta `blob` nos marcadores; regiões ini/fim viram ("regiao", rid, subprograma)."""
+        partes = _MARCA_RE.split(blob)
+        pilha, vistos = [[]], set()
+        abertas = []
+        for i, parte in enumerate(partes):
+            if i % 2 == 0:
+                if parte:
+                    pilha[-1].append(parte)
+                continue
+            n = int(parte)
+            if n in vistos:
+                raise _NaoSepara("marcador duplicado")
+            vistos.add(n)
+            spec = self.specs[n]
+            if spec[0] == "ini":
+                pilha.append([])
+                abertas.append(spec[1])
+            elif spec[0] == "fim":
+                if not abertas or abertas[-1] != spec[1]:
+                    raise _NaoSepara("região EORG cruzada")
+                sub = pilha.pop()
+                abertas.pop()
+                if regioes is not None:
+                    regioes[spec[1]] = sub
+                pilha[-1].append(("regiao", spec[1], sub))
+            else:
+                pilha[-1].append(spec)
+        if abertas:
+            raise _NaoSepara("região EORG sem fim")
+        return pilha[0], vistos
+
+    def _resolve(self, prog, regioes, vazias):
+        out = []
+        for it in prog:
+            if isinstance(it, tuple) and it[0] == "regiao":
+                rid = it[1]
+                if rid not in vazias:
+                    raise _NaoSepara("região EORG sem variante vazia")
+                out.append(("escolha", regioes[rid],
+                            self._resolve(it[2], regioes, vazias), self._resolve(vazias[rid], regioes, vazias)))
+            elif out and isinstance(it, bytes) and isinstance(out[-1], bytes):
+                out[-1] += it
+            else:
+                out.append(it)
+        return out
+
+# ---------- execução ----------
+
+class _Valores:
+    """Valores do contexto já no formato do template (calculados uma vez por geração)."""
+
+    def __init__(self, ctx: dict):
+        self.ctx = ctx
+        self.campos = campos_escalares(ctx)
+        for nome in CAMPOS_EORG:
+            self.campos[nome] = ctx.get(nome, "")
+        self._linhas = None
+
+    def linhas(self, kind):
+        if self._linhas is None:
+            oe, ie = linhas_oe_ie(self.ctx)
+            self._linhas = {"oe": oe, "ie": ie}
+        return self._linhas[kind]
+
+def _executa(prog, vals: _Valores, out: list):
+    for it in prog:
+        if isinstance(it, bytes):
+            out.append(it)
+            continue
+        kind = it[0]
+        if kind == "campo":
+            out += (_SPAN_ABRE, _esc(vals.campos.get(it[1])), _SPAN_FECHA)
+        elif kind == "escolha":
+            _executa(it[2] if vals.campos.get(it[1]) else it[3], vals, out)
+        elif kind == "linhas":
+            for ln in vals.linhas(it[1]):
+                out += (it[2], _SPAN_ABRE, _esc(ln), _SPAN_FECHA, _P_FECHA)
+        elif kind == "palavras":
+            itens = [x for x in processa_lista_aninhada(vals.ctx.get("palavras_chave", [])) if x]
+            if not itens:
+                out.append(b"<text:list/>")
+                continue
+            out.append(b"<text:list>")
+            for x in itens:
+                out += (b"<text:list-item>", it[1], _SPAN_ABRE, _esc(x), _SPAN_FECHA, _P_FECHA, b"</text:list-item>")
+            out.append(b"</text:list>")
+        elif kind == "atividades":
+            for i, atv in enumerate(vals.ctx.get("descricao_processo_atividades", []), start=1):
+                out += (it[1], _esc(f"{i}. {atv.get('elemento', '')}"), _P_FECHA,
+                        _fragmento_descricao(atv, ESTILO_DESCRICAO))
+
+class Esqueleto:
+    """content.xml/styles.xml compilados: `render(ctx)` -> {membro: bytes}."""
+
+    def __init__(self, programas: dict):
+        self.programas = programas
+
+    def render(self, ctx: dict) -> dict:
+        vals = _Valores(ctx)
+        files = {}
+        for nome, prog in self.programas.items():
+            out: list = []
+            _executa(prog, vals, out)
+            files[nome] = b"".join(out)
+        return files
+
+def compile_skeleton(zin) -> Esqueleto:
+    """Compila o esqueleto de um template aberto (ZipFile ou TemplateSnapshot)."""
+    progs = {}
+    for nome in ("content.xml", "styles.xml"):
+        if nome in zin.namelist():
+            progs[nome] = _Compilador(zin.read(nome), nome == "content.xml").compila()
+    return Esqueleto(progs)
+
+# contextos de verificação: campos preenchidos e vazios, listas e atividades
+_SONDAS = (
+    {"nome_processo": "Sonda & <teste>", "codigo": "S-1", "versao": "01", "POP_SETOR_SUPERIOR": "Sup",
+     "POP_SETOR_EXECUTOR": "Exec", "NVL_GERENCIAL": "G", "NVL_OPERACIONAL": "O", "rodape_elaborador": "R",
+     "aprovacao_responsavel": "A", "aprovacao_data": "01/01/2025", "EORG_SUP": "(IEAPM-1)",
+     "EORG_EXEC": "(IEAPM-2)", "objetivos_estrategicos": ["a", "b", "c"], "indicadores_estrategicos": ["i"],
+     "palavras_chave": ["x", "['y', 'z']"],
+     "descricao_processo_atividades": [{"elemento": "E1", "descricao": "d1\nd2"},
+                                        {"elemento": "E2", "descricao": "", "blocos": [
+                                            {"tipo": "lista", "ordenada": True,
+                                             "itens": [{"nivel": 0, "ordenada": True, "linhas": ["l"]}]}]}]},
+    {},
+)
+
+def _c14n(xml: bytes) -> bytes:
+    return ET.tostring(ET.fromstring(xml), method="c14n")
+
+def _confere(esq: Esqueleto, template_path: str) -> None:
+    """Compara o esqueleto com o caminho DOM (C14N) nas sondas; diverge -> _NaoSepara."""
+    for ctx in _SONDAS:
+        _, ref = render_parts_dom(template_path, ctx)
+        for nome, blob in esq.render(ctx).items():
+            if _c14n(blob) != _c14n(ref[nome]):
+                raise _NaoSepara(f"{nome} diverge do caminho DOM")
+
+_lock = threading.Lock()
+_compilados: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()   # template -> Esqueleto | None
+
+def skeleton_for(template_path: str):
+    """Esqueleto do template (compilado e conferido uma vez por versão carregada) ou None."""
+    zin = load_template(template_path)
+    with _lock:
+        if zin in _compilados:
+            return zin, _compilados[zin]
+        try:
+            esq = compile_skeleton(zin)
+            _confere(esq, template_path)
+        except (_NaoSepara, _ValorInvalido) as e:
+            print(f"AVISO: template {template_path} fica no render DOM ({e})")
+            esq = None
+        _compilados[zin] = esq
+        return zin, esq
+
+def render_skeleton_parts(template_path: str, ctx: dict):
+    """(template, {membro: bytes}) pelo esqueleto; None quando é preciso usar o caminho DOM."""
+    zin, esq = skeleton_for(template_path)
+    if esq is None:
+        return None
+    try:
+        return zin, esq.render(ctx)
+    except _ValorInvalido:
+        return None
+
+def render_skeleton(template_path: str, ctx: dict) -> bytes | None:
+    """ODT pelo esqueleto de bytes; None quando é preciso usar o caminho DOM."""
+    parts = render_skeleton_parts(template_path, ctx)
+    if parts is None:
+        return None
+    return _write_odt_like_template(parts[0], parts[1], Path(template_path))
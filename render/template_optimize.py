@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Variante otimizada do template ODT (`<template>.otimizado.odt`).
+#
+# Tudo o que o template carrega vai para cada documento gerado, então cada
+# byte economizado aqui se repete em todo ODT produzido:
+#   - PNGs: os fluxos IDAT são recomprimidos (zlib nível 9, sem perda; os
+#     pixels e os demais chunks ficam idênticos) — só se ficar menor
+#   - EMF, XML e demais membros não-PNG: deflate
+#   - Thumbnails/thumbnail.png: mantido (recomprimido) ou removido
+#   - Configurations2/: entradas de diretório vazias são removidas
+#   - META-INF/manifest.xml: sem as entradas dos membros removidos
+#
+# O comentário do zip guarda o sha1 do template de origem; `optimized_template`
+# só devolve a variante enquanto ela corresponder ao template atual. Como o
+# snapshot, a variante só é gerada por este comando — o render nunca grava ao
+# lado do template. Rode-o a cada troca do template (sem ele, o render segue
+# com o template original):
+#
+#   python -m POP.cli --optimize-template [templates/modelo_POP.odt] [--drop-thumbnail]
+#   python -m POP.render.template_optimize templates/modelo_POP.odt [saida.odt] [--drop-thumbnail]
+from __future__ import annotations
+import argparse, hashlib, io, json, os, struct, threading, zipfile, zlib
+from pathlib import Path
+
+PNG_SIG = b"\x89PNG\r\n\x1a\n"
+THUMBNAIL = "Thumbnails/thumbnail.png"
+MANIFEST = "META-INF/manifest.xml"
+MANIFEST_NS = "urn:oasis:names:tc:opendocument:xmlns:manifest:1.0"
+_SUFIXO = ".otimizado.odt"
+
+def _chunks(data: bytes):
+    pos = len(PNG_SIG)
+    while pos + 8 <= len(data):
+        n, tipo = struct.unpack(">I4s", data[pos:pos + 8])
+        yield tipo, data[pos + 8:pos + 8 + n], data[pos:pos + 12 + n]
+        pos += 12 + n
+
+def _chunk(tipo: bytes, corpo: bytes) -> bytes:
+    return struct.pack(">I", len(corpo)) + tipo + corpo + struct.pack(">I", zlib.crc32(tipo + corpo) & 0xFFFFFFFF)
+
+def recompress_png(data: bytes) -> bytes:
+    """
+    PNG com os IDAT concatenados e recomprimidos num único chunk. Os dados
+    descomprimidos (filtros + pixels) não mudam. Devolve o original se não
+    for PNG válido ou se não houver ganho.
+    """
+    if not data.startswith(PNG_SIG):
+        return data
+    try:
+        chunks = list(_chunks(data))
+        idat = b"".join(corpo for tipo, corpo, _ in chunks if tipo == b"IDAT")
+        if not idat:
+            return data
+        raw = zlib.decompress(idat)
+    except (zlib.error, struct.error):
+        return data
+    melhor = idat
+    for estrategia in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        c = zlib.compressobj(9, zlib.DEFLATED, 15, 9, estrategia)
+        novo = c.compress(raw) + c.flush()
+        if len(novo) < len(melhor):
+            melhor = novo
+    if melhor is idat:
+        return data
+    out, idat_feito = [PNG_SIG], False
+    for tipo, _, bruto in chunks:
+        if tipo != b"IDAT":
+            out.append(bruto)
+        elif not idat_feito:
+            out.append(_chunk(b"IDAT", melhor))
+            idat_feito = True
+    return b"".join(out)
+
+def _manifesto_sem(xml: bytes, removidos: set) -> bytes:
+    from lxml import etree as ET
+    root = ET.fromstring(xml)
+    attr = f"{{{MANIFEST_NS}}}full-path"
+    for e in list(root):
+        if e.get(attr) in removidos:
+            root.remove(e)
+    return ET.tostring(root, xml_declaration=True, encoding="UTF-8")
+
+def _sha1_arquivo(path) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def variant_path(template_path) -> Path:
+    p = Path(template_path)
+    return p.with_name(p.stem + _SUFIXO)
+
+def build_optimized(template_path, out_path=None, drop_thumbnail: bool = False) -> dict:
+    """Gera a variante otimizada e devolve um relatório de tamanhos por membro."""
+    template_path = Path(template_path)
+    out = Path(out_path) if out_path else variant_path(template_path)
+    relatorio = {"origem": str(template_path), "destino": str(out), "membros": []}
+    with zipfile.ZipFile(template_path) as zin:
+        infos = zin.infolist()
+        nomes = [zi.filename for zi in infos]
+        removidos = set()
+        if drop_thumbnail and THUMBNAIL in nomes:
+            removidos.add(THUMBNAIL)
+        # diretórios de Configurations2/ sem nenhum arquivo dentro
+        conf_arquivos = [n for n in nomes if n.startswith("Configurations2/") and not n.endswith("/")]
+        if not conf_arquivos:
+            removidos |= {n for n in nomes if n.startswith("Configurations2/")}
+            removidos.add("Configurations2/")
+
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zout:
+            for zi in infos:
+                if zi.filename in removidos:
+                    continue
+                data = zin.read(zi)
+                novo = zipfile.ZipInfo(zi.filename, date_time=zi.date_time)
+                novo.external_attr = zi.external_attr
+                if zi.filename == "mimetype" or zi.is_dir():
+                    novo.compress_type = zipfile.ZIP_STORED
+                elif zi.filename.lower().endswith(".png"):
+                    data = recompress_png(data)
+                    novo.compress_type = zipfile.ZIP_STORED     # PNG já é deflate por dentro
+                else:
+                    if zi.filename == MANIFEST:
+                        data = _manifesto_sem(data, removidos)
+                    novo.compress_type = zipfile.ZIP_DEFLATED
+                zout.writestr(novo, data, compresslevel=9)
+                relatorio["membros"].append({"nome": zi.filename, "antes": zi.compress_size,
+                                             "depois": zout.getinfo(zi.filename).compress_size})
+            zout.comment = json.dumps({"fonte_sha1": _sha1_arquivo(template_path)}).encode("utf-8")
+
+    tmp = out.with_name(f".{out.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(buf.getvalue())
+    os.replace(tmp, out)
+    relatorio["removidos"] = sorted(removidos & set(nomes))
+    relatorio["antes"] = template_path.stat().st_size
+    relatorio["depois"] = out.stat().st_size
+    return relatorio
+
+def _variante_em_dia(template_path, variante: Path) -> bool:
+    try:
+        with zipfile.ZipFile(variante) as z:
+            meta = json.loads(z.comment or b"{}")
+    except (OSError, zipfile.BadZipFile, ValueError):
+        return False
+    return meta.get("fonte_sha1") == _sha1_arquivo(template_path)
+
+_lock = threading.Lock()
+_resolvidos: dict = {}      # (caminho absoluto, size, mtime_ns) -> caminho efetivo
+
+def optimized_template(template_path) -> str:
+    """
+    Caminho do template a usar no render: a variante otimizada quando ela
+    existe e está em dia com `template_path`, senão o próprio template.
+    POP_TEMPLATE_OTIMIZADO=0 desliga.
+    """
+    template_path = str(template_path)
+    if os.environ.get("POP_TEMPLATE_OTIMIZADO", "1").lower() in ("0", "off", "no"):
+        return template_path
+    if template_path.endswith(_SUFIXO):
+        return template_path
+    st = os.stat(template_path)
+    chave = (os.path.abspath(template_path), st.st_size, st.st_mtime_ns)
+    with _lock:
+        efetivo = _resolvidos.get(chave)
+        if efetivo is None:
+            variante = variant_path(template_path)
+            efetivo = template_path
+            if variante.exists() and _variante_em_dia(template_path, variante):
+                efetivo = str(variante)
+            _resolvidos[chave] = efetivo
+        return efetivo
+
+def report_lines(rel: dict) -> list[str]:
+    """Linhas do relatório de build_optimized para o terminal."""
+    linhas = [f"  {m['nome']}: {m['antes']} -> {m['depois']}" for m in rel["membros"] if m["antes"] != m["depois"]]
+    linhas += [f"  {n}: removido" for n in rel["removidos"]]
+    linhas.append(f"OK: {rel['destino']} ({rel['antes']} -> {rel['depois']} bytes)")
+    return linhas
+
+# --- Bloco de Execução ---
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Gera a variante otimizada de um template ODT")
+    ap.add_argument("template", help="Template .odt de origem")
+    ap.add_argument("saida", nargs="?", help=f"Destino (padrão: <template>{_SUFIXO})")
+    ap.add_argument("--drop-thumbnail", action="store_true", help="Remove Thumbnails/thumbnail.png")
+    args = ap.parse_args()
+    rel = build_optimized(args.template, args.saida, drop_thumbnail=args.drop_thumbnail)
+    print("\n".join(report_lines(rel)))
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# Snapshot pré-compilado do template ODT.
+#
+# O template é um zip de ~1 MB; abrir e descomprimir todos os membros a cada
+# geração custa mais do que o próprio preenchimento. O snapshot guarda os
+# membros já descomprimidos num único arquivo (`<template>.snap`) que é
+# mapeado em memória (mmap) no primeiro uso e reaproveitado no processo.
+#
+# Formato: MAGIC | u64 tamanho do cabeçalho | cabeçalho JSON | membros crus.
+# O cabeçalho registra tamanho e mtime do template de origem; se não baterem,
+# o snapshot é ignorado e o zip é lido normalmente (também em cache).
+from __future__ import annotations
+import json, mmap, os, struct, sys, threading, zipfile
+from pathlib import Path
+
+MAGIC = b"POPSNAP1"
+_HDR = struct.Struct("<Q")
+_lock = threading.Lock()
+_loaded: dict = {}       # caminho absoluto -> (fonte, TemplateSnapshot)
+
+class TemplateSnapshot:
+    """Template em memória com a interface mínima de ZipFile (namelist/read/getinfo)."""
+
+    def __init__(self, origem: str, members: list[dict], buf, base: int = 0):
+        self.origem = origem
+        self._members = {m["name"]: m for m in members}
+        self._order = [m["name"] for m in members]
+        self._buf = buf          # bytes ou mmap
+        self._base = base
+
+    def namelist(self) -> list[str]:
+        return list(self._order)
+
+    def read(self, name: str) -> bytes:
+        m = self._members[name]
+        a = self._base + m["offset"]
+        return bytes(self._buf[a:a + m["size"]])
+
+    def getinfo(self, name: str) -> zipfile.ZipInfo:
+        m = self._members[name]
+        zi = zipfile.ZipInfo(name, date_time=tuple(m["date_time"]))
+        zi.compress_type = m["compress_type"]
+        zi.external_attr = m["external_attr"]
+        zi.file_size = m["size"]
+        return zi
+
+def snapshot_path(template_path) -> Path:
+    p = Path(template_path)
+    return p.with_name(p.name + ".snap")
+
+def _fonte(template_path) -> dict:
+    st = os.stat(template_path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+def _extrai(template_path) -> tuple[list[dict], list[bytes]]:
+    """Descomprime todos os membros do zip, guardando os metadados de cada um."""
+    members, blobs, offset = [], [], 0
+    with zipfile.ZipFile(template_path, "r") as zin:
+        for zi in zin.infolist():
+            data = zin.read(zi.filename)
+            members.append({
+                "name": zi.filename, "offset": offset, "size": len(data),
+                "compress_type": zi.compress_type, "date_time": list(zi.date_time),
+                "external_attr": zi.external_attr,
+            })
+            blobs.append(data)
+            offset += len(data)
+    return members, blobs
+
+def build_snapshot(template_path, out_path=None) -> Path:
+    """Gera o snapshot de `template_path` (padrão: `<template>.snap` ao lado)."""
+    template_path = Path(template_path)
+    out = Path(out_path) if out_path else snapshot_path(template_path)
+    members, blobs = _extrai(template_path)
+    header = json.dumps({"fonte": _fonte(template_path), "members": members}).encode("utf-8")
+    tmp = out.with_name(f"{out.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as f:
+        f.write(MAGIC)
+        f.write(_HDR.pack(len(header)))
+        f.write(header)
+        for b in blobs:
+            f.write(b)
+    os.replace(tmp, out)
+    return out
+
+def _abre_snapshot(template_path, snap: Path):
+    with open(snap, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(MAGIC)] != MAGIC:
+        mm.close()
+        return None
+    n = _HDR.unpack_from(mm, len(MAGIC))[0]
+    ini = len(MAGIC) + _HDR.size
+    header = json.loads(mm[ini:ini + n])
+    if header.get("fonte") != _fonte(template_path):
+        mm.close()  # snapshot desatualizado em relação ao template
+        return None
+    return TemplateSnapshot(str(template_path), header["members"], mm, ini + n)
+
+def _le_zip(template_path) -> TemplateSnapshot:
+    members, blobs = _extrai(template_path)
+    return TemplateSnapshot(str(template_path), members, b"".join(blobs))
+
+def load_template(template_path) -> TemplateSnapshot:
+    """
+    Template pronto para leitura, reaproveitado enquanto o arquivo não mudar.
+    Usa a variante otimizada do template quando disponível (template_optimize)
+    e o snapshot mapeado em memória quando existe e está em dia; senão lê o zip.
+    """
+    from .template_optimize import optimized_template
+    template_path = str(template_path)
+    chave, fonte = os.path.abspath(template_path), _fonte(template_path)
+    with _lock:
+        atual = _loaded.get(chave)
+        if atual is not None and atual[0] == fonte:
+            return atual[1]
+        template_path = optimized_template(template_path)
+        snap = snapshot_path(template_path)
+        tpl = _abre_snapshot(template_path, snap) if snap.exists() else None
+        if tpl is None:
+            tpl = _le_zip(template_path)
+        _loaded[chave] = (fonte, tpl)   # um por caminho: versão antiga é descartada
+        return tpl
+
+# --- Bloco de Execução ---
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Uso: python -m POP.render.template_snapshot /caminho/para/modelo.odt [saida.snap]")
+        sys.exit(1)
+    out = build_snapshot(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"OK: {out}")
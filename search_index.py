@@ -0,0 +1,194 @@
+# POP/search_index.py
+# Índice de texto completo (SQLite FTS5) sobre os contextos gerados.
+#
+# Cada geração atualiza o índice com o contexto do job, chaveado por
+# (codigo, versao): gerar de novo a mesma versão substitui a entrada antiga.
+# Consulta com ranking bm25 e trechos (snippet) por coluna:
+#
+#   python -m POP.cli --search "dicionario:INPI"
+#   python -m POP.cli --search "registro software" --limit 5
+#
+# Local: WORKDIR/index/pop.sqlite3 (POP_INDEX=<caminho> troca; POP_INDEX=none desliga).
+from __future__ import annotations
+import hashlib, json, os, sqlite3, threading, time
+from pathlib import Path
+
+from .workspace import WORKDIR
+
+# colunas do FTS e peso de cada uma no bm25 (mesma ordem)
+COLUNAS = ("codigo", "nome_processo", "setores", "objetivos", "palavras_chave", "dicionario", "atividades")
+PESOS   = (8.0, 10.0, 2.0, 2.0, 5.0, 4.0, 1.0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pops (
+    codigo        TEXT NOT NULL,
+    versao        TEXT NOT NULL,
+    nome_processo TEXT,
+    job_id        TEXT,
+    hash          TEXT,
+    atualizado    REAL,
+    PRIMARY KEY (codigo, versao)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS pops_fts USING fts5(
+    codigo, nome_processo, setores, objetivos, palavras_chave, dicionario, atividades,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+def index_path() -> Path | None:
+    v = os.environ.get("POP_INDEX", "").strip()
+    if v.lower() in ("none", "0", "off"):
+        return None
+    return Path(v) if v else WORKDIR / "index" / "pop.sqlite3"
+
+def _linhas(xs) -> str:
+    return "\n".join(str(x).strip() for x in (xs or []) if x and str(x).strip())
+
+def documento(ctx: dict) -> dict:
+    """Contexto (dict ou build_context.model.PopContext) -> texto de cada coluna do índice."""
+    if not isinstance(ctx, dict):
+        ctx = ctx.to_dict()
+    atividades = [f"{a.get('elemento', '')}\n{a.get('descricao', '')}".strip()
+                  for a in ctx.get("descricao_processo_atividades") or []]
+    dicionario = [f"{d.get('termo', '')}: {d.get('significado', '')}".strip(": ")
+                  for d in ctx.get("dicionario") or [] if isinstance(d, dict)]
+    return {
+        "codigo": ctx.get("codigo", "") or "",
+        "nome_processo": ctx.get("nome_processo", "") or "",
+        "setores": _linhas([ctx.get("setor_superior"), ctx.get("setor_executor")]),
+        "objetivos": _linhas(list(ctx.get("objetivos_estrategicos") or []) + list(ctx.get("indicadores_estrategicos") or [])),
+        "palavras_chave": _linhas(ctx.get("palavras_chave")),
+        "dicionario": _linhas(dicionario),
+        "atividades": _linhas(atividades),
+    }
+
+class SearchIndex:
+    """Conexão por thread; WAL + busy_timeout para vários processos gerando ao mesmo tempo."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._conn() as c:
+            c.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=30.0)
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = c
+        return c
+
+    def upsert(self, ctx: dict, job_id: str = "") -> bool:
+        """Indexa o contexto; devolve False se a mesma versão já estava com o mesmo conteúdo."""
+        doc = documento(ctx)
+        codigo, versao = doc["codigo"], str(ctx.get("versao", "") or "")
+        if not codigo:
+            return False
+        digest = hashlib.sha1(json.dumps(doc, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+        c = self._conn()
+        with c:
+            row = c.execute("SELECT rowid, hash FROM pops WHERE codigo = ? AND versao = ?", (codigo, versao)).fetchone()
+            if row is not None and row[1] == digest:
+                c.execute("UPDATE pops SET job_id = ?, atualizado = ? WHERE rowid = ?", (job_id, time.time(), row[0]))
+                return False
+            if row is not None:
+                rowid = row[0]
+                c.execute("DELETE FROM pops_fts WHERE rowid = ?", (rowid,))
+                c.execute("UPDATE pops SET nome_processo = ?, job_id = ?, hash = ?, atualizado = ? WHERE rowid = ?",
+                          (doc["nome_processo"], job_id, digest, time.time(), rowid))
+            else:
+                rowid = c.execute("INSERT INTO pops (codigo, versao, nome_processo, job_id, hash, atualizado) "
+                                  "VALUES (?, ?, ?, ?, ?, ?)",
+                                  (codigo, versao, doc["nome_processo"], job_id, digest, time.time())).lastrowid
+            c.execute(f"INSERT INTO pops_fts (rowid, {', '.join(COLUNAS)}) VALUES (?{', ?' * len(COLUNAS)})",
+                      (rowid, *(doc[k] for k in COLUNAS)))
+        return True
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        """
+        Busca FTS5 (aceita a sintaxe do FTS: frases, OR/NOT, prefixo*, coluna:termo).
+        Se a consulta não for sintaxe válida, cada palavra é buscada como termo literal.
+        """
+        pesos = ", ".join(str(p) for p in PESOS)
+        sql = (f"SELECT p.codigo, p.versao, p.nome_processo, p.job_id, bm25(pops_fts, {pesos}) AS score, "
+               f"snippet(pops_fts, -1, '[', ']', '…', 12) "
+               f"FROM pops_fts JOIN pops p ON p.rowid = pops_fts.rowid "
+               f"WHERE pops_fts MATCH ? ORDER BY score LIMIT ?")
+        c = self._conn()
+        try:
+            rows = c.execute(sql, (query, limit)).fetchall()
+        except sqlite3.OperationalError:
+            literal = " ".join('"' + t.replace('"', '""') + '"' for t in query.split())
+            if not literal:
+                return []
+            rows = c.execute(sql, (literal, limit)).fetchall()
+        return [{"codigo": r[0], "versao": r[1], "nome_processo": r[2], "job_id": r[3],
+                 "score": round(-r[4], 6), "trecho": r[5]} for r in rows]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT count(*) FROM pops").fetchone()[0]
+
+    def close(self):
+        c = getattr(self._local, "conn", None)
+        if c is not None:
+            c.close()
+            self._local.conn = None
+
+_INDEX = None
+_INDEX_LOCK = threading.Lock()
+
+def get_index() -> SearchIndex | None:
+    """Índice padrão do processo (None se desligado por POP_INDEX=none)."""
+    global _INDEX
+    path = index_path()
+    if path is None:
+        return None
+    with _INDEX_LOCK:
+        if _INDEX is None or _INDEX.path != path:
+            _INDEX = SearchIndex(path)
+        return _INDEX
+
+_DESLIGADO = False
+
+def set_indexing(ativo: bool) -> None:
+    """Liga/desliga a atualização do índice nas gerações deste processo (busca e reindex seguem)."""
+    global _DESLIGADO
+    _DESLIGADO = not ativo
+
+def index_context(ctx: dict, job_id: str = "") -> None:
+    """Atualiza o índice padrão; falha de índice não derruba a geração."""
+    if _DESLIGADO:
+        return
+    try:
+        idx = get_index()
+        if idx is not None:
+            idx.upsert(ctx, job_id)
+    except (sqlite3.Error, OSError) as e:
+        print(f"AVISO: índice de busca não atualizado ({e})")
+
+def search(query: str, limit: int = 20) -> list[dict]:
+    idx = get_index()
+    return idx.search(query, limit) if idx is not None else []
+
+def reindex_contexts(base_dir=None) -> int:
+    """
+    Reconstrói o índice a partir dos contextos do workspace (WORKDIR/contexts):
+    os `*.contexto.json` do FileSink e os segmentos do JournalSink (`journal/`).
+    """
+    from .sinks import iter_journal
+    idx = get_index()
+    if idx is None:
+        return 0
+    base = Path(base_dir) if base_dir else WORKDIR / "contexts"
+    n = 0
+    for p in sorted(base.rglob("*.contexto.json")):
+        with open(p, "r", encoding="utf-8") as f:
+            ctx = json.load(f)
+        job_id = p.name.rsplit("-", 1)[0]       # <job_id>-<arquivo>.contexto.json
+        n += idx.upsert(ctx, job_id)
+    for job_id, _, ctx in iter_journal(base / "journal"):
+        n += idx.upsert(ctx, job_id)
+    return n
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# POP/server.py
+# Serviço HTTP local (só stdlib) em cima da camada de serviço.
+#
+#   POST /pop            corpo = BPMN  -> ODT (attachment)
+#   POST /pop?format=json corpo = BPMN -> JSON com contexto + ODT em base64
+#   GET  /health         status + profundidade da fila
+#   GET  /stats          contadores do pool
+#
+# Uma fila limitada fica na frente de um pool de workers aquecidos; com a
+# fila cheia a resposta é 503 + Retry-After (backpressure), em vez de abrir
+# um processo `cli.py` por requisição.
+#
+# Limites por job (limits.JobLimits): com --job-timeout/--job-memory-mb cada
+# worker despacha para um processo filho próprio, morto e trocado quando o
+# job estoura; o cliente recebe o erro estruturado ({"tipo", "erro", ...}).
+from __future__ import annotations
+import argparse, base64, json, math, queue, threading, time, traceback
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+from . import service
+from .limits import JobError, JobLimits, LimitedWorker
+from .workspace import new_job, stage_blob, set_durability, durability_config
+
+ODT_MIME = "application/vnd.oasis.opendocument.text"
+MAX_BODY = 20 * 1024 * 1024
+
+class GenerationPool:
+    """
+    Pool de threads com fila limitada na frente de `service.render_pop`. Com
+    limites de tempo/memória, cada thread roda os jobs no seu LimitedWorker.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_size: int = 8,
+        template_path: str | Path = service.DEFAULT_TEMPLATE,
+        camunda_map_path: str | Path = service.DEFAULT_CAM_MAP,
+        limits: JobLimits | None = None,
+    ):
+        self.workers = max(1, int(workers))
+        self.limits = limits or JobLimits.from_env()
+        self.template_path = template_path
+        self.camunda_map_path = camunda_map_path
+        self.jobs: queue.Queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._started = time.monotonic()
+        self.ativos = 0
+        self.contadores = {"aceitos": 0, "rejeitados": 0, "concluidos": 0, "falhas": 0,
+                           "cancelados": 0, "abandonados": 0}
+        self._tempo_total = 0.0
+        self._isolados: list[LimitedWorker] = []
+        self._abandonados: set = set()      # futures rodando cujo cliente já desistiu
+
+    def start(self):
+        # resolvida aqui e não nas threads: POP_DURABILITY inválido falha no start()
+        self._durabilidade = durability_config()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"pop-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def shutdown(self):
+        for _ in self._threads:
+            self.jobs.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads.clear()
+
+    def submit(self, blob: bytes, name: str = "upload.bpmn") -> Future:
+        """Enfileira um BPMN; levanta `queue.Full` se não houver vaga."""
+        fut: Future = Future()
+        try:
+            self.jobs.put_nowait((blob, name, fut))
+        except queue.Full:
+            with self._lock:
+                self.contadores["rejeitados"] += 1
+            raise
+        with self._lock:
+            self.contadores["aceitos"] += 1
+        return fut
+
+    def abandon(self, fut: Future) -> None:
+        """
+        O cliente desistiu do job (timeout da requisição). Ainda na fila: é
+        cancelado e a thread o descarta sem processar. Já rodando: vai até o
+        fim, mas o resultado é jogado fora.
+        """
+        if fut.cancel():
+            with self.jobs.mutex:       # devolve a vaga na hora, sem esperar uma thread livre
+                for item in self.jobs.queue:
+                    if item is not None and item[2] is fut:
+                        self.jobs.queue.remove(item)
+                        self.jobs.not_full.notify()
+                        break
+            with self._lock:
+                self.contadores["cancelados"] += 1
+            return
+        with self._lock:
+            if not fut.done():
+                self._abandonados.add(fut)
+
+    def retry_after(self) -> int:
+        """Estimativa (s) para a fila esvaziar, a partir do tempo médio por job."""
+        with self._lock:
+            feitos = self.contadores["concluidos"] + self.contadores["falhas"]
+            media = self._tempo_total / feitos if feitos else 1.0
+        return max(1, math.ceil(media * self.jobs.qsize() / self.workers))
+
+    def _worker(self):
+        isolado = None
+        if self.limits.isolado:
+            # o filho (spawn) não herda a configuração do processo: repassa a durabilidade
+            isolado = LimitedWorker(self.limits, initializer=set_durability, initargs=self._durabilidade)
+            with self._lock:
+                self._isolados.append(isolado)
+        try:
+            self._loop(isolado)
+        finally:
+            if isolado is not None:
+                isolado.close()
+
+    def _loop(self, isolado: LimitedWorker | None):
+        while True:
+            item = self.jobs.get()
+            if item is None:
+                break
+            blob, name, fut = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            with self._lock:
+                self.ativos += 1
+            t0 = time.monotonic()
+            res = erro = None
+            try:
+                job_id, _ = new_job(prefix="pop")
+                bpmn_in = stage_blob(job_id, blob, name)
+                args = (str(bpmn_in), str(self.template_path), str(self.camunda_map_path), job_id)
+                res = isolado.run(service.render_pop, *args) if isolado else service.render_pop(*args)
+            except BaseException as e:
+                erro = e
+            # sob o lock: abandon() não pode marcar um future que já foi resolvido
+            with self._lock:
+                self.ativos -= 1
+                self._tempo_total += time.monotonic() - t0
+                self.contadores["concluidos" if erro is None else "falhas"] += 1
+                if fut in self._abandonados:
+                    self._abandonados.discard(fut)
+                    self.contadores["abandonados"] += 1
+                elif erro is not None:
+                    fut.set_exception(erro)
+                else:
+                    fut.set_result(res)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            feitos = self.contadores["concluidos"] + self.contadores["falhas"]
+            return {
+                "fila": self.jobs.qsize(),
+                "fila_max": self.jobs.maxsize,
+                "workers": self.workers,
+                "ativos": self.ativos,
+                **self.contadores,
+                "tempo_medio_s": round(self._tempo_total / feitos, 4) if feitos else None,
+                "workers_trocados": sum(w.trocas for w in self._isolados),
+                "uptime_s": round(time.monotonic() - self._started, 1),
+            }
+
+# JobError.kind -> status HTTP; tipos fora da tabela (xml_invalido, bpmn_invalido...) são 422
+STATUS_JOB_ERROR = {"entrada_grande": 413, "tempo_excedido": 504, "memoria_excedida": 507,
+                    "worker_morto": 500, "falha": 500}
+
+class PopRequestHandler(BaseHTTPRequestHandler):
+    server_version = "POP/1.0"
+    pool: GenerationPool = None        # preenchido por make_server
+    request_timeout: float = 120.0
+
+    def _send_json(self, status: int, data: dict, headers: dict | None = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            snap = self.pool.snapshot()
+            self._send_json(200, {"status": "ok", "fila": snap["fila"], "fila_max": snap["fila_max"]})
+        elif path == "/stats":
+            self._send_json(200, self.pool.snapshot())
+        else:
+            self._send_json(404, {"erro": "rota inexistente"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/pop":
+            self._send_json(404, {"erro": "rota inexistente"})
+            return
+        try:
+            size = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            size = 0
+        if size <= 0:
+            self._send_json(411, {"erro": "corpo vazio ou sem Content-Length"})
+            return
+        limite = self.pool.limits.input_bytes or MAX_BODY
+        if size > limite:
+            self._send_json(413, {"tipo": "entrada_grande", "erro": f"BPMN maior que {limite} bytes"})
+            return
+        blob = self.rfile.read(size)
+
+        try:
+            fut = self.pool.submit(blob)
+        except queue.Full:
+            self._send_json(503, {"erro": "fila cheia"}, {"Retry-After": str(self.pool.retry_after())})
+            return
+
+        try:
+            res = fut.result(timeout=self.request_timeout)
+        except FutureTimeout:
+            self.pool.abandon(fut)
+            self._send_json(504, {"erro": "tempo de geração excedido"})
+            return
+        except JobError as e:
+            status = STATUS_JOB_ERROR.get(e.kind, 422)      # demais tipos: problema na entrada
+            if e.kind == "falha":
+                self.log_error("job falhou: %s", e)
+                self._send_json(500, {"tipo": "falha", "erro": "erro interno na geração"})
+                return
+            self._send_json(status, e.to_dict())
+            return
+        except Exception:
+            # bug, disco, sqlite...: não é culpa da entrada, e o rastro fica no log
+            self.log_error("erro interno na geração:\n%s", traceback.format_exc())
+            self._send_json(500, {"tipo": "falha", "erro": "erro interno na geração"})
+            return
+
+        fmt = (parse_qs(url.query).get("format") or ["odt"])[0]
+        if fmt == "json":
+            self._send_json(200, {
+                "job_id": res["job_id"],
+                "filename": res["filename"],
+                "contexto": res["context"],
+                "odt_base64": base64.b64encode(res["odt_bytes"]).decode("ascii"),
+            })
+            return
+
+        body = res["odt_bytes"]
+        self.send_response(200)
+        self.send_header("Content-Type", ODT_MIME)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Disposition", f'attachment; filename="{res["filename"]}"')
+        self.send_header("X-POP-Job", res["job_id"])
+        self.end_headers()
+        self.wfile.write(body)
+
+def make_server(host: str = "127.0.0.1", port: int = 8765, pool: GenerationPool | None = None,
+                request_timeout: float = 120.0) -> ThreadingHTTPServer:
+    """Cria o servidor já ligado a um pool iniciado (não chama serve_forever)."""
+    pool = pool or GenerationPool().start()
+    handler = type("BoundPopRequestHandler", (PopRequestHandler,),
+                   {"pool": pool, "request_timeout": request_timeout})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    httpd.pool = pool
+    return httpd
+
+def main():
+    ap = argparse.ArgumentParser(description="Serviço HTTP local de geração de POP")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=2, help="Workers de geração (padrão: 2)")
+    ap.add_argument("--queue-size", type=int, default=8, help="Vagas na fila antes de responder 503 (padrão: 8)")
+    ap.add_argument("--timeout", type=float, default=120.0, help="Tempo máximo de espera por job, em segundos")
+    ap.add_argument("--job-timeout", type=float, help="Limite de tempo por job (s); o worker que estoura é trocado")
+    ap.add_argument("--job-memory-mb", type=int, help="Limite de memória (RLIMIT_AS) do processo de cada worker")
+    ap.add_argument("--max-input-mb", type=float, help="Tamanho máximo do BPMN (padrão: 20)")
+    args = ap.parse_args()
+
+    limits = JobLimits.from_env(wall_s=args.job_timeout, mem_mb=args.job_memory_mb,
+                                input_bytes=int(args.max_input_mb * 1024 * 1024) if args.max_input_mb else None)
+    try:
+        pool = GenerationPool(workers=args.workers, queue_size=args.queue_size, limits=limits).start()
+    except ValueError as e:
+        ap.error(str(e))
+    httpd = make_server(args.host, args.port, pool, args.timeout)
+    print(f"POP ouvindo em http://{args.host}:{httpd.server_address[1]} "
+          f"(workers={pool.workers}, fila={pool.jobs.maxsize})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        pool.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,17 @@
 # POP/service.py
 from __future__ import annotations
-import re, unicodedata
+import queue, re, threading, unicodedata
 from pathlib import Path
 
-from .build_context.pipeline_pop import hydrate_from_bpmn
 from .build_context.rules_pop import calcula_nvl_gerencial, calcula_nvl_operacional
-from .render import render_odt
-from .workspace import new_job, stage_input, write_context, write_artifact, deliver
+from .search_index import index_context
+from .workspace import (new_job, stage_input, write_context, write_artifact, deliver, job_path, _no_shard,
+                        get_durability, checkpoint, delivery_group, committed_group)
 
 PKG_DIR = Path(__file__).resolve().parent
 DEFAULT_TEMPLATE = PKG_DIR / "templates" / "modelo_POP.odt"
 DEFAULT_CAM_MAP  = PKG_DIR / "templates" / "pop-template.json"
+OUTPUT_FORMATS   = ("odt", "fodt")
 
 _IEAPM = re.compile(r"\((IEAPM-[^)]+)\)")
 
@@ -88,45 +89,275 @@ def _apply_business_rules(ctx: dict) -> dict:
 
     return ctx
 
-def generate_pop_odt(
-    bpmn_path: str,
-    out_dir: str | None = None,
-    template_path: str | Path = DEFAULT_TEMPLATE,
-    camunda_map_path: str | Path = DEFAULT_CAM_MAP,
-):
-    job_id, _ = new_job(prefix="pop")
+def _final_name(ctx: dict, ext: str = "odt") -> str:
+    # nome de entrega: codigo_nomeprocesso.odt (ou .fodt)
+    codigo = _slug(ctx.get("codigo", "") or "CODIGO")
+    nome   = _slug(ctx.get("nome_processo", "") or "NOME_PROCESSO")
+    return f"{codigo}_{nome}.{ext}"
+
+def extract_context(bpmn_source, camunda_map_path: str | Path = DEFAULT_CAM_MAP) -> dict:
+    """
+    BPMN -> contexto final (parser + maps + regras de negócio), sem template e
+    sem workspace. `bpmn_source` pode ser um caminho ou um arquivo aberto.
+    """
+    from .build_context.pipeline_pop import hydrate_from_bpmn
+    ctx = hydrate_from_bpmn(bpmn_source, str(camunda_map_path))
+    return _apply_business_rules(ctx)
+
+def _prepara(bpmn_path, camunda_map_path, job_id: str | None = None):
+    """Isola os insumos, extrai o contexto e grava o contexto de auditoria."""
+    if job_id is None:
+        job_id, _ = new_job(prefix="pop")
+        bpmn_in = stage_input(job_id, bpmn_path)
+    else:
+        bpmn_in = Path(bpmn_path)
 
     # isola insumos
-    bpmn_in = stage_input(job_id, bpmn_path)
-    tpl_in  = stage_input(job_id, template_path)
     cmap_in = stage_input(job_id, camunda_map_path)
 
-    # contexto base (BPMN + maps)
-    ctx = hydrate_from_bpmn(str(bpmn_in), str(cmap_in))
-
-    # aplica regras de negócio locais
-    ctx = _apply_business_rules(ctx)
+    # contexto base (BPMN + maps) + regras de negócio locais
+    ctx = extract_context(str(bpmn_in), cmap_in)
 
     # salva contexto para auditoria/depuração
     ctx_path = write_context(job_id, ctx, "primeira_pagina.contexto.json")
+    index_context(ctx, job_id)
+    return job_id, ctx, ctx_path
+
+def render_pop(
+    bpmn_path: str | Path,
+    template_path: str | Path = DEFAULT_TEMPLATE,
+    camunda_map_path: str | Path = DEFAULT_CAM_MAP,
+    job_id: str | None = None,
+) -> dict:
+    """
+    Gera o ODT em memória, sem entregar nada fora do workspace.
+
+    Se `job_id` vier preenchido, assume que `bpmn_path` já foi isolado no
+    workspace daquele job (ex.: upload recebido pelo servidor HTTP).
+
+    O template não é copiado para o workspace: `load_template` fixa uma versão
+    em memória (snapshot mmap ou zip lido uma vez) e só a troca se o arquivo mudar.
+    """
+    # import pesado (lxml) só quando há o que gerar
+    from .render import render_odt
+
+    job_id, ctx, ctx_path = _prepara(bpmn_path, camunda_map_path, job_id)
 
     # renderiza ODT -> bytes
-    odt_bytes = render_odt(str(tpl_in), ctx)
-    odt_int   = write_artifact(job_id, odt_bytes, "odt", "primeira_pagina.odt")
+    odt_bytes = render_odt(str(template_path), ctx)
 
-    # nome de entrega: codigo_nomeprocesso.odt
-    codigo = _slug(ctx.get("codigo", "") or "CODIGO")
-    nome   = _slug(ctx.get("nome_processo", "") or "NOME_PROCESSO")
-    final_name = f"{codigo}_{nome}.odt"
+    return {
+        "job_id": job_id,
+        "context": ctx,
+        "context_path": ctx_path,
+        "odt_bytes": odt_bytes,
+        "filename": _final_name(ctx),
+    }
+
+def generate_pop_odt(
+    bpmn_path: str,
+    out_dir: str | None = None,
+    template_path: str | Path = DEFAULT_TEMPLATE,
+    camunda_map_path: str | Path = DEFAULT_CAM_MAP,
+    output_format: str = "odt",
+    pictures: str = "inline",
+):
+    """
+    Gera e entrega o documento. `output_format="fodt"` grava o ODT plano (um
+    XML só, sem zip); `pictures` escolhe imagens embutidas ("inline") ou em
+    `<nome>_imagens/` ao lado do arquivo ("external").
 
+    Com durabilidade "group" (workspace.set_durability) o `output_path`
+    devolvido ainda não existe: a entrega fica pendente e só aparece no destino,
+    já com fsync, no próximo workspace.checkpoint() (chamado pelo CLI no fim,
+    automaticamente a cada `group_size` entregas e na saída do processo). Quem
+    precisa ler o arquivo logo em seguida chama checkpoint() antes. Nos modos
+    none/file o arquivo já está no destino quando a função retorna.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"formato desconhecido: {output_format!r} (use odt ou fodt)")
     # destino: mesmo diretório do BPMN, salvo se out_dir for passado
     out_dir = Path(out_dir) if out_dir else Path(bpmn_path).resolve().parent
+
+    if output_format == "fodt":
+        from .render.flat_odt import render_fodt
+        job_id, ctx, ctx_path = _prepara(bpmn_path, camunda_map_path)
+        final_name = _final_name(ctx, "fodt")
+        pictures_dir = out_dir / f"{Path(final_name).stem}_imagens" if pictures == "external" else None
+        interno = job_path("odt", job_id, "primeira_pagina.fodt")
+        _no_shard(interno, lambda d: render_fodt(str(template_path), ctx, d, pictures=pictures,
+                                                 pictures_dir=pictures_dir))
+        final = deliver(interno, out_dir / final_name)
+        return {
+            "job_id": job_id,
+            "context_path": ctx_path,
+            "output_path": str(final),
+            "filename": final_name,
+        }
+
+    res = render_pop(bpmn_path, template_path, camunda_map_path)
+    job_id = res["job_id"]
+
+    odt_int = write_artifact(job_id, res["odt_bytes"], "odt", "primeira_pagina.odt")
+
+    final_name = res["filename"]
     final = deliver(odt_int, out_dir / final_name)
 
     return {
         "job_id": job_id,
-        "context_path": str(ctx_path),
+        "context_path": res["context_path"],
         "output_path": str(final),
         "filename": final_name,
     }
 
+_FIM = object()
+
+def iter_generate(
+    bpmn_paths,
+    out_dir: str | None = None,
+    template_path: str | Path = DEFAULT_TEMPLATE,
+    camunda_map_path: str | Path = DEFAULT_CAM_MAP,
+    parse_workers: int = 2,
+    render_workers: int = 2,
+    write_workers: int = 1,
+    queue_size: int = 4,
+):
+    """
+    Versão em pipeline de `generate_pop_odt` para lotes. Três etapas em threads,
+    ligadas por filas limitadas (`queue_size`):
+
+      ler       : isola os insumos no workspace e faz o parse do BPMN
+      renderizar: regras de negócio, contexto de auditoria e ODT em memória
+      gravar    : artefato no workspace + entrega no destino
+
+    Assim a cópia/gravação em disco de um job corre junto com o render do
+    seguinte. Os resultados saem na ordem em que ficam prontos (use "indice"
+    para voltar à ordem de entrada); um BPMN com erro vira um item
+    status="erro" com a etapa que falhou, sem interromper o lote. As filas
+    cheias seguram as etapas anteriores, então a memória fica limitada mesmo
+    com `bpmn_paths` muito grande (ele é consumido aos poucos).
+
+    Com durabilidade "group" (workspace.set_durability), um item "ok" só sai
+    depois que o grupo da sua entrega foi efetivado (arquivo já no destino e
+    com fsync); o fim do lote efetiva o último grupo.
+    """
+    from .build_context.pipeline_pop import hydrate_from_bpmn
+    from .render import render_odt
+
+    parar = threading.Event()
+    q_ler, q_render, q_gravar, q_saida = (queue.Queue(maxsize=max(1, queue_size)) for _ in range(4))
+
+    def _put(q, item) -> bool:
+        while not parar.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(q):
+        while not parar.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return _FIM
+
+    def ler(job):
+        job_id, _ = new_job(prefix="pop")
+        job["job_id"] = job_id
+        bpmn_in = stage_input(job_id, job["bpmn"])
+        cmap_in = stage_input(job_id, camunda_map_path)
+        job["ctx"] = hydrate_from_bpmn(str(bpmn_in), str(cmap_in))
+
+    def renderizar(job):
+        ctx = _apply_business_rules(job.pop("ctx"))
+        job["context_path"] = write_context(job["job_id"], ctx, "primeira_pagina.contexto.json")
+        index_context(ctx, job["job_id"])
+        job["filename"] = _final_name(ctx)
+        job["odt_bytes"] = render_odt(str(template_path), ctx)
+
+    def gravar(job):
+        odt_int = write_artifact(job["job_id"], job.pop("odt_bytes"), "odt", "primeira_pagina.odt")
+        destino = Path(out_dir) if out_dir else Path(job["bpmn"]).resolve().parent
+        job["output_path"] = str(deliver(odt_int, destino / job["filename"]))
+        job["grupo"] = delivery_group() if get_durability() == "group" else 0
+        job["status"] = "ok"
+
+    etapas = [("ler", ler, q_ler, q_render, parse_workers),
+              ("renderizar", renderizar, q_render, q_gravar, render_workers),
+              ("gravar", gravar, q_gravar, q_saida, write_workers)]
+    n_workers = [max(1, e[4]) for e in etapas]
+    vivos, vivos_lock = list(n_workers), threading.Lock()
+
+    def worker(k):
+        nome, fn, q_in, q_out, _ = etapas[k]
+        while True:
+            job = _get(q_in)
+            if job is _FIM:
+                break
+            try:
+                fn(job)
+            except Exception as e:
+                job.pop("ctx", None); job.pop("odt_bytes", None)
+                job.update(status="erro", etapa=nome, erro=str(e))
+                if not _put(q_saida, job):
+                    break
+                continue
+            if not _put(q_out, job):
+                break
+        # o último worker da etapa avisa a seguinte (ou o consumidor) que acabou
+        with vivos_lock:
+            vivos[k] -= 1
+            ultimo = vivos[k] == 0
+        if ultimo:
+            for _ in range(n_workers[k + 1] if k + 1 < len(etapas) else 1):
+                _put(q_out, _FIM)
+
+    def alimentar():
+        try:
+            for i, bpmn in enumerate(bpmn_paths):
+                if not _put(q_ler, {"indice": i, "bpmn": str(bpmn)}):
+                    return
+        except Exception as e:
+            _put(q_saida, {"indice": -1, "bpmn": "", "status": "erro", "etapa": "entrada", "erro": str(e)})
+        for _ in range(n_workers[0]):
+            _put(q_ler, _FIM)
+
+    threads = [threading.Thread(target=alimentar, name="pop-pipe-entrada", daemon=True)]
+    for k, (nome, *_) in enumerate(etapas):
+        threads += [threading.Thread(target=worker, args=(k,), name=f"pop-pipe-{nome}-{i}", daemon=True)
+                    for i in range(n_workers[k])]
+    for t in threads:
+        t.start()
+    aguardando = []         # itens ok cujo grupo de entrega ainda não foi efetivado
+
+    def _liberados(todos=False):
+        nonlocal aguardando
+        ok = committed_group()
+        prontos = [j for j in aguardando if todos or j["grupo"] <= ok]
+        aguardando = [j for j in aguardando if not (todos or j["grupo"] <= ok)]
+        for j in prontos:
+            del j["grupo"]
+        return prontos
+
+    try:
+        while True:
+            job = q_saida.get()
+            if job is _FIM:
+                break
+            if job.get("grupo"):
+                aguardando.append(job)
+                yield from _liberados()
+                continue
+            job.pop("grupo", None)
+            yield job
+        checkpoint()
+        yield from _liberados(todos=True)
+    finally:
+        # consumidor saiu antes do fim (break/close): destrava e encerra as etapas
+        parar.set()
+        for t in threads:
+            t.join()
+        checkpoint()
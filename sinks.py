@@ -0,0 +1,271 @@
+# POP/sinks.py
+# Destinos ("sinks") do contexto de auditoria de cada job.
+#
+#   files   : um JSON indentado por job em .work/contexts (modo original)
+#   journal : JSON lines compacto, só-append, com rotação e índice; gravado
+#             por uma thread, em lotes (quem chegar junto vai no mesmo lote)
+#   none    : descarta (lotes em que a auditoria não interessa)
+#
+# O sink ativo é escolhido em workspace (POP_CONTEXT_SINK ou set_context_sink).
+from __future__ import annotations
+import atexit, json, os, queue, threading, time
+from pathlib import Path
+
+class ContextSink:
+    """
+    Interface: `write` grava (ou agenda) o contexto e devolve onde encontrá-lo
+    (caminho do arquivo, `<journal>/index.jsonl#<job_id>` ou None); `read`
+    recupera por job.
+    """
+    name = "base"
+
+    def write(self, job_id: str, ctx: dict, filename: str) -> Path | str | None:
+        raise NotImplementedError
+
+    def read(self, job_id: str, filename: str | None = None) -> dict | None:
+        return None
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+class NullSink(ContextSink):
+    name = "none"
+
+    def write(self, job_id, ctx, filename):
+        return None
+
+class FileSink(ContextSink):
+    """Um arquivo JSON (indent=2) por job — o comportamento original de write_context."""
+    name = "files"
+
+    def __init__(self, base_dir, shard=None):
+        self.base_dir = Path(base_dir)
+        self.shard = shard          # job_id -> subdiretório relativo (layout fragmentado)
+
+    def _dir(self, job_id: str) -> Path:
+        return self.base_dir / self.shard(job_id) if self.shard else self.base_dir
+
+    def write(self, job_id, ctx, filename):
+        out = self._dir(job_id) / f"{job_id}-{filename}"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f: json.dump(ctx, f, ensure_ascii=False, indent=2)
+        return out
+
+    def read(self, job_id, filename=None):
+        # shard atual primeiro; depois o layout plano antigo
+        dirs = [self._dir(job_id), self.base_dir] if self.shard else [self.base_dir]
+        cands = []
+        for d in dirs:
+            cands += [d / f"{job_id}-{filename}"] if filename else sorted(d.glob(f"{job_id}-*"))
+        for p in cands:
+            if p.exists():
+                with open(p, "r", encoding="utf-8") as f:
+                    return json.load(f)
+        return None
+
+class _Linha:
+    __slots__ = ("job_id", "arquivo", "linha", "gravada", "ok")
+
+    def __init__(self, job_id, arquivo, linha: bytes):
+        self.job_id, self.arquivo, self.linha = job_id, arquivo, linha
+        self.gravada = threading.Event()
+        self.ok = False
+
+def _entrada(ln: bytes) -> dict | None:
+    """Entrada do index.jsonl; None para linha vazia ou corrompida (meia linha de processo morto)."""
+    if not ln.strip():
+        return None
+    try:
+        e = json.loads(ln)
+    except ValueError:
+        return None
+    return e if isinstance(e, dict) and {"job_id", "arquivo", "segmento", "offset", "tamanho"} <= e.keys() else None
+
+class JournalSink(ContextSink):
+    """
+    Journal JSON lines só-append em `base_dir`:
+      ctx-<inicio>-<pid>.jsonl : uma linha compacta por contexto (segmentos por processo)
+      index.jsonl              : {"job_id", "arquivo", "segmento", "offset", "tamanho"}
+
+    Uma thread grava em lotes de até `batch_size` linhas: tudo o que já está
+    na fila (mais o que chegar em `flush_interval` s) vai numa só escrita.
+    `write` espera o próprio lote: o localizador devolvido aponta para dado
+    já no arquivo, e um processo morto depois disso não perde o contexto.
+    O segmento roda ao passar de `max_bytes` ou de `rotate_seconds`. `read`
+    consulta o índice (carregado de forma incremental) e lê só a linha do job.
+
+    O índice é compartilhado entre processos, e um worker morto no meio de
+    uma escrita deixa meia linha: cada lote começa com "\n" (a meia linha
+    termina ali) e a leitura pula linhas que não decodificam.
+    """
+    name = "journal"
+
+    def __init__(self, base_dir, max_bytes: int = 64 * 1024 * 1024, rotate_seconds: float = 3600.0,
+                 batch_size: int = 256, flush_interval: float = 0.0, queue_size: int = 10000):
+        self.base_dir = Path(base_dir)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.base_dir / "index.jsonl"
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._q: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._seg = None            # arquivo aberto do segmento corrente
+        self._seg_path: Path | None = None
+        self._seg_started = 0.0
+        self._index: dict = {}      # (job_id, arquivo) -> entrada
+        self._index_pos = 0         # quanto do index.jsonl já foi lido
+        self._index_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="pop-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- escrita ----------
+    def write(self, job_id, ctx, filename):
+        if self._closed:
+            raise RuntimeError("journal de contextos já foi fechado")
+        line = json.dumps({"job_id": job_id, "arquivo": filename, "ts": time.time(), "contexto": ctx},
+                          ensure_ascii=False, separators=(",", ":"))
+        item = _Linha(job_id, filename, line.encode("utf-8") + b"\n")
+        self._q.put(item)           # bloqueia se a fila encher
+        while not item.gravada.wait(1.0):
+            if not self._thread.is_alive():
+                return None         # thread de escrita morreu: a linha não foi gravada
+        if not item.ok:
+            return None             # falha já avisada pela thread; nada no disco para apontar
+        return f"{self.index_path}#{job_id}"
+
+    def _rotate_if_needed(self):
+        now = time.time()
+        if self._seg is not None:
+            if self._seg.tell() < self.max_bytes and now - self._seg_started < self.rotate_seconds:
+                return
+            self._seg.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+        self._seg_path = self.base_dir / f"ctx-{stamp}-{os.getpid()}.jsonl"
+        self._seg = open(self._seg_path, "ab")
+        self._seg_started = now
+
+    def _write_batch(self, batch: list[tuple]):
+        self._rotate_if_needed()
+        offset = self._seg.tell()
+        idx = []
+        for it in batch:
+            idx.append(json.dumps({"job_id": it.job_id, "arquivo": it.arquivo,
+                                   "segmento": self._seg_path.name, "offset": offset,
+                                   "tamanho": len(it.linha)}, ensure_ascii=False, separators=(",", ":")))
+            offset += len(it.linha)
+        self._seg.write(b"".join(it.linha for it in batch))
+        self._seg.flush()
+        # índice depois dos dados: uma entrada nunca aponta para linha inexistente.
+        # O "\n" inicial fecha a meia linha de um processo morto no meio da escrita.
+        with open(self.index_path, "ab") as f:
+            f.write(("\n" + "\n".join(idx) + "\n").encode("utf-8"))
+
+    def _run(self):
+        while True:
+            item = self._q.get()
+            if item is None:
+                self._q.task_done()
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    nxt = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+            ok = True
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                ok = False
+                print(f"ERRO: falha ao gravar o journal de contextos: {e}")
+            finally:
+                for it in batch:
+                    it.ok = ok
+                    it.gravada.set()
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._q.task_done()
+            if stop:
+                break
+        if self._seg is not None:
+            self._seg.close()
+            self._seg = None
+
+    def flush(self):
+        """Espera a thread gravar tudo o que já foi enfileirado."""
+        if not self._closed:
+            self._q.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(None)
+        self._thread.join()
+
+    # ---------- leitura ----------
+    def _load_index(self):
+        if not self.index_path.exists():
+            return
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_pos)
+            for ln in f:
+                if not ln.endswith(b"\n"):
+                    break       # linha ainda sendo gravada por outro processo
+                self._index_pos += len(ln)
+                e = _entrada(ln)
+                if e is not None:
+                    self._index[(e["job_id"], e["arquivo"])] = e
+                    self._index[(e["job_id"], None)] = e
+
+    def read(self, job_id, filename=None):
+        self.flush()
+        with self._index_lock:
+            e = self._index.get((job_id, filename))
+            if e is None:
+                self._load_index()
+                e = self._index.get((job_id, filename))
+        if e is None:
+            return None
+        with open(self.base_dir / e["segmento"], "rb") as f:
+            f.seek(e["offset"])
+            return json.loads(f.read(e["tamanho"]))["contexto"]
+
+def iter_journal(base_dir):
+    """
+    (job_id, arquivo, contexto) de um journal na ordem de gravação (a do
+    index.jsonl, comum a todos os processos), sem abrir o JournalSink nem a
+    thread de escrita. Linhas incompletas ou corrompidas do índice são puladas.
+    """
+    base = Path(base_dir)
+    idx = base / "index.jsonl"
+    if not idx.exists():
+        return
+    segs: dict = {}
+    try:
+        with open(idx, "rb") as fi:
+            for ln in fi:
+                if not ln.endswith(b"\n"):
+                    break       # linha ainda sendo gravada por outro processo
+                e = _entrada(ln)
+                if e is None:
+                    continue
+                f = segs.get(e["segmento"])
+                if f is None:
+                    f = segs[e["segmento"]] = open(base / e["segmento"], "rb")
+                f.seek(e["offset"])
+                yield e["job_id"], e["arquivo"], json.loads(f.read(e["tamanho"]))["contexto"]
+    finally:
+        for f in segs.values():
+            f.close()
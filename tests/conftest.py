@@ -0,0 +1,24 @@
+# Registra o pacote como `POP`, qualquer que seja o nome do diretório do checkout,
+# com o workspace (e o índice de busca) num diretório temporário da sessão.
+import importlib.util, os, sys, tempfile
+from pathlib import Path
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parents[1]
+DADOS = Path(__file__).resolve().parent / "data"
+
+os.environ.setdefault("POP_WORKDIR", tempfile.mkdtemp(prefix="pop-testes-"))
+
+if "POP" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("POP", RAIZ / "__init__.py",
+                                                  submodule_search_locations=[str(RAIZ)])
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules["POP"] = mod
+    spec.loader.exec_module(mod)
+
+
+@pytest.fixture
+def bpmn_exemplo() -> Path:
+    """BPMN pequeno: 3 atividades (uma em subprocesso), documentação escapada, raias."""
+    return DADOS / "sample.bpmn"
@@ -0,0 +1,40 @@
+import json
+
+from POP import audit
+from POP.build_context.extraction_plan import DEFAULT_TEMPLATE_JSON, compile_plan
+from POP.build_context.pipeline_pop import hydrate_from_bpmn
+
+def _sem(bpmn_exemplo, tmp_path, *props):
+    xml = bpmn_exemplo.read_text(encoding="utf-8")
+    for p in props:
+        linha = next(l for l in xml.splitlines() if f'name="pop:{p}"' in l)
+        xml = xml.replace(linha + "\n", "")
+    out = tmp_path / "faltando.bpmn"
+    out.write_text(xml, encoding="utf-8")
+    return out
+
+def test_obrigatorios_vem_do_template():
+    assert compile_plan().required_fields == [
+        "nomeProcesso", "objetivoEstrategico1", "codigo", "superintendenciaResponsavel",
+        "departamentoResponsavel", "versao"]
+
+def test_bpmn_completo_e_valido_com_contagem_da_geracao(bpmn_exemplo):
+    rec = audit.audit_record("ok.bpmn", str(bpmn_exemplo))
+    assert (rec["status"], rec["faltando"], rec["valido"]) == ("ok", [], True)
+    ctx = hydrate_from_bpmn(str(bpmn_exemplo), str(DEFAULT_TEMPLATE_JSON))
+    assert rec["atividades"] == len(ctx["descricao_processo_atividades"]) == 3
+
+def test_campo_obrigatorio_faltando(bpmn_exemplo, tmp_path):
+    rec = audit.audit_record("x.bpmn", str(_sem(bpmn_exemplo, tmp_path, "codigo", "departamentoResponsavel")))
+    assert rec["status"] == "ok" and rec["valido"] is False
+    assert rec["faltando"] == ["pop:codigo", "pop:departamentoResponsavel"]
+
+def test_obrigatorio_novo_no_template_entra_sem_codigo(bpmn_exemplo, tmp_path):
+    arr = json.loads(DEFAULT_TEMPLATE_JSON.read_text(encoding="utf-8"))
+    for p in arr[0]["properties"]:
+        if p["binding"].get("name") == "pop:aprovacao_setor":
+            p["constraints"] = {"notEmpty": True}
+    tpl = tmp_path / "pop-template.json"
+    tpl.write_text(json.dumps(arr, ensure_ascii=False), encoding="utf-8")
+    rec = audit.audit_record("x.bpmn", bpmn_exemplo.read_bytes(), camunda_map_path=tpl)
+    assert rec["faltando"] == ["pop:aprovacao_setor"]
@@ -0,0 +1,67 @@
+import io, json, tarfile, warnings, zipfile
+
+import pytest
+
+from POP.batch import MANIFEST_NAME, run_archive_batch
+from POP.limits import JobLimits
+
+def _tar(membros, modo="w:gz"):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode=modo) as t:
+        for nome, blob in membros:
+            ti = tarfile.TarInfo(nome)
+            ti.size = len(blob)
+            t.addfile(ti, io.BytesIO(blob))
+    return buf.getvalue()
+
+def _zip(membros):
+    buf = io.BytesIO()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)        # nome duplicado é proposital
+        with zipfile.ZipFile(buf, "w") as z:
+            for nome, blob in membros:
+                z.writestr(nome, blob)
+    return buf.getvalue()
+
+def _le_zip(path):
+    with zipfile.ZipFile(path) as z:
+        return {n: z.read(n) for n in z.namelist()}
+
+def test_entrada_tar_gz_e_saida_zip(bpmn_exemplo, tmp_path):
+    src = tmp_path / "lote.tar.gz"
+    src.write_bytes(_tar([("a/p1.bpmn", bpmn_exemplo.read_bytes()), ("leia-me.txt", b"x"),
+                          ("a/._p1.bpmn", b"lixo do macOS")]))
+    manifest = run_archive_batch(src, tmp_path / "saida.zip", limits=JobLimits())
+    assert [(r["membro"], r["status"]) for r in manifest] == [("a/p1.bpmn", "ok")]
+    saida = _le_zip(tmp_path / "saida.zip")
+    assert json.loads(saida[MANIFEST_NAME]) == manifest
+    assert zipfile.is_zipfile(io.BytesIO(saida[manifest[0]["arquivo"]]))
+
+@pytest.mark.parametrize("empacota", [_zip, _tar], ids=["zip", "tar"])
+def test_membros_com_nome_repetido_viram_arquivos_distintos(bpmn_exemplo, tmp_path, empacota):
+    blob = bpmn_exemplo.read_bytes()
+    src = tmp_path / ("lote.zip" if empacota is _zip else "lote.tar.gz")
+    src.write_bytes(empacota([("p.bpmn", blob), ("p.bpmn", blob), ("outro/p.bpmn", blob)]))
+    manifest = run_archive_batch(src, tmp_path / "saida.tar", limits=JobLimits())
+    assert [r["status"] for r in manifest] == ["ok"] * 3
+    arquivos = [r["arquivo"] for r in manifest]
+    assert len(set(arquivos)) == 3 and MANIFEST_NAME not in arquivos
+    with tarfile.open(tmp_path / "saida.tar") as t:
+        assert sorted(t.getnames()) == sorted(arquivos + [MANIFEST_NAME])
+
+def test_membro_ruim_vira_linha_de_erro_e_o_lote_segue(bpmn_exemplo, tmp_path):
+    bom = bpmn_exemplo.read_bytes()
+    src = tmp_path / "lote.zip"
+    src.write_bytes(_zip([("ruim.bpmn", b"<definitions><nao-fecha>"),
+                          ("sem-participante.bpmn", b"<definitions/>"),
+                          ("grande.bpmn", b"<a>" + b" " * len(bom) + b"</a>"),
+                          ("bom.bpmn", bom)]))
+    manifest = run_archive_batch(src, tmp_path / "saida.zip", limits=JobLimits(input_bytes=len(bom)))
+    por_membro = {r["membro"]: r for r in manifest}
+    assert (por_membro["ruim.bpmn"]["status"], por_membro["ruim.bpmn"]["tipo"]) == ("erro", "xml_invalido")
+    assert (por_membro["sem-participante.bpmn"]["tipo"]) == "bpmn_invalido"
+    assert (por_membro["grande.bpmn"]["tipo"]) == "entrada_grande"
+    for nome in ("ruim.bpmn", "sem-participante.bpmn", "grande.bpmn"):
+        assert por_membro[nome]["erro"] and por_membro[nome]["arquivo"] == ""
+    assert por_membro["bom.bpmn"]["status"] == "ok"
+    assert set(_le_zip(tmp_path / "saida.zip")) == {por_membro["bom.bpmn"]["arquivo"], MANIFEST_NAME}
@@ -0,0 +1,72 @@
+import copy, json, pickle, time
+
+import pytest
+
+from POP.build_context import pipeline_pop
+from POP.cache import TEXTO_LIMPO, ContentCache, ListaCongelada
+
+HTML = "<p>Receber o pedido</p><ul><li>conferir</li><li>registrar</li></ul>"
+
+def test_documentacao_em_cache_e_compartilhada_e_so_leitura():
+    TEXTO_LIMPO.clear()
+    primeira = pipeline_pop._converte_documentacoes([HTML])[0]
+    segunda = pipeline_pop._converte_documentacoes([HTML])[0]
+    assert TEXTO_LIMPO.stats()["hits"] == 1
+    assert segunda["blocos"] is primeira["blocos"]          # sem cópia por hit
+    with pytest.raises(TypeError):
+        primeira["blocos"].clear()
+    with pytest.raises(TypeError):
+        primeira["blocos"][0]["linhas"].append("x")
+    editavel = copy.deepcopy(primeira["blocos"])            # cópia comum, editável
+    editavel[0]["linhas"].append("x")
+    editavel.clear()
+    assert primeira["blocos"] == segunda["blocos"] != []
+
+def test_blocos_congelados_atravessam_pickle_e_json():
+    b = pipeline_pop._converte_documentacoes([HTML])[0]["blocos"]
+    b2 = pickle.loads(pickle.dumps(b))
+    assert type(b2) is ListaCongelada and b2 == b and b2.chave == b.chave
+    assert json.loads(json.dumps(b)) == b
+
+def test_chave_muda_com_a_versao_do_conversor(monkeypatch):
+    TEXTO_LIMPO.clear()
+    pipeline_pop._converte_documentacoes([HTML])
+    monkeypatch.setattr(pipeline_pop, "CONVERSOR_VERSAO", pipeline_pop.CONVERSOR_VERSAO + 1)
+    pipeline_pop._converte_documentacoes([HTML])
+    assert TEXTO_LIMPO.stats()["hits"] == 0
+
+def test_entrada_corrompida_em_disco_vale_como_miss(tmp_path, capsys):
+    c = ContentCache("t", disk_dir=tmp_path)
+    c.put("ab" * 32, {"x": 1})
+    p = next((tmp_path / "t").rglob("*.json"))
+    p.write_text('{"x": ')                                  # truncada
+    c.clear()
+    assert c.get("ab" * 32) is None
+    assert not p.exists() and "AVISO" in capsys.readouterr().out
+    c.put("ab" * 32, {"x": 2})
+    c.clear()
+    assert c.get("ab" * 32) == {"x": 2}
+
+def test_pop_cache_max_invalido_usa_o_padrao(monkeypatch):
+    monkeypatch.setenv("POP_CACHE_MAX", "muitos")
+    assert ContentCache("t").max_entries == 4096
+
+def test_render_das_descricoes_com_cache_quente_e_mais_rapido():
+    """Medição: 200 atividades (conversão + fragmento DOM), cache frio x quente."""
+    from POP.cache import ELEMENTOS, FRAGMENTOS
+    from POP.render.fill_first_page_xml import ESTILO_DESCRICAO, _elementos_descricao
+    htmls = [f"<p>Atividade {i}: receber e conferir.</p><ol><li>um {i}<ul><li>sub</li></ul>resto</li>"
+             f"<li>dois</li></ol><p>Encaminhar.</p>" for i in range(200)]
+
+    def rodada():
+        t0 = time.perf_counter()
+        for conv in pipeline_pop._converte_documentacoes(htmls):
+            _elementos_descricao({"descricao": conv["texto"], "blocos": conv["blocos"]}, ESTILO_DESCRICAO)
+        return time.perf_counter() - t0
+
+    for c in (TEXTO_LIMPO, FRAGMENTOS, ELEMENTOS):
+        c.clear()
+    frio = rodada()
+    quente = min(rodada() for _ in range(3))
+    print(f"200 descrições: frio {frio * 1000:.1f} ms, quente {quente * 1000:.1f} ms ({frio / quente:.1f}x)")
+    assert quente * 3 < frio
@@ -0,0 +1,36 @@
+# Partida a frio do CLI: integrações de editor chamam `python -m POP.cli` a
+# cada gravação, então o --help não pode pagar lxml nem o serviço.
+import json, os, subprocess, sys, time
+
+from conftest import RAIZ
+
+ORCAMENTO_S = 0.5       # tempo de parede do --help, com folga para máquina de CI
+
+SONDA = """
+import json, runpy, sys
+sys.argv = ["POP.cli", "--help"]
+try:
+    runpy.run_module("POP.cli", run_name="__main__")
+except SystemExit:
+    pass
+print(json.dumps(sorted(m for m in sys.modules if m.split(".")[0] == "lxml" or m == "POP.service")), file=sys.stderr)
+"""
+
+def _ambiente(tmp_path):
+    (tmp_path / "POP").symlink_to(RAIZ, target_is_directory=True)
+    env = dict(os.environ, PYTHONPATH=str(tmp_path), POP_WORKDIR=str(tmp_path / "work"))
+    return env
+
+def test_help_nao_importa_lxml_nem_service(tmp_path):
+    r = subprocess.run([sys.executable, "-c", SONDA], env=_ambiente(tmp_path), cwd=tmp_path,
+                       capture_output=True, text=True, check=True)
+    assert "usage" in r.stdout.lower()
+    assert json.loads(r.stderr.strip().splitlines()[-1]) == []
+
+def test_help_dentro_do_orcamento(tmp_path):
+    env = _ambiente(tmp_path)
+    cmd = [sys.executable, "-m", "POP.cli", "--help"]
+    subprocess.run(cmd, env=env, cwd=tmp_path, capture_output=True, check=True)    # aquece o cache de bytecode
+    t0 = time.perf_counter()
+    subprocess.run(cmd, env=env, cwd=tmp_path, capture_output=True, check=True)
+    assert time.perf_counter() - t0 < ORCAMENTO_S
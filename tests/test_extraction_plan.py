@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from lxml import etree
+
+from POP.build_context.extraction_plan import DEFAULT_TEMPLATE_JSON, compile_plan
+
+# ---- como era antes do plano compilado (mapping_builder + laço do parser) ----
+
+def _mapas_antigos(template_json_path):
+    with open(template_json_path, "r", encoding="utf-8") as f:
+        arr = json.load(f)
+    maps = {}
+    for p in arr[0].get("properties", []):
+        name, choices = p.get("binding", {}).get("name"), p.get("choices")
+        if name and choices:
+            maps[name] = {ch.get("value"): ch.get("name") for ch in choices if ch.get("value") is not None}
+    return maps
+
+_LISTAS_ANTIGAS = [
+    'palavrasChaveAdicionais', 'dicionarioAdicionais_termos', 'dicionarioAdicionais_significados',
+    'referenciasAdicionais_refs', 'referenciasAdicionais_descs', 'sistemasAdicionais',
+    'indicadoresMonAdicionais_nomes', 'indicadoresMonAdicionais_descs', 'observacoesAdicionais',
+    'riscoDigitado3_adicionais', 'alteracao_itens',
+]
+
+def _valores_antigos(pares):
+    out = {}
+    for name, value in pares:
+        value = (value or "").strip()
+        if name and name.startswith("pop:"):
+            nome = name.split(":", 1)[1]
+            out[nome] = [i.strip() for i in value.split("//")] if nome in _LISTAS_ANTIGAS and value else value
+    return out
+
+# ------------------------------------------------------------------------------
+
+def _pares_do_template(escolha: int):
+    """Uma propriedade por campo do template: choice `escolha`, "a // b" nas listas, texto nos demais."""
+    arr = json.loads(DEFAULT_TEMPLATE_JSON.read_text(encoding="utf-8"))
+    pares = []
+    for p in arr[0]["properties"]:
+        nome = (p.get("binding") or {}).get("name") or ""
+        if not nome.startswith("pop:"):
+            continue
+        if p.get("choices"):
+            valor = p["choices"][escolha % len(p["choices"])]["value"]
+        elif nome[4:] in _LISTAS_ANTIGAS:
+            valor = " primeiro // segundo //terceiro "
+        else:
+            valor = f"  texto de {nome}  "
+        pares.append((nome, valor))
+    return pares
+
+def test_listas_iguais_as_fixas_de_antes():
+    assert sorted(compile_plan().list_fields) == sorted(_LISTAS_ANTIGAS)
+
+def test_choice_maps_iguais_ao_mapping_builder_antigo():
+    assert compile_plan().choice_maps() == _mapas_antigos(DEFAULT_TEMPLATE_JSON)
+
+@pytest.mark.parametrize("escolha", [0, 1, -1])
+def test_extract_igual_a_extracao_antiga(escolha):
+    pares = _pares_do_template(escolha) + [("pop:campoForaDoTemplate", " x "), ("outro:ignorado", "y")]
+    res = compile_plan().extract((n, v) for n, v in pares if n.startswith("pop:"))
+    assert res["valores"] == _valores_antigos(pares)
+    mapas = _mapas_antigos(DEFAULT_TEMPLATE_JSON)
+    # o hydrate antigo traduzia os campos de dados; cabeçalhos visuais (pop:__x__) nunca
+    rotulos_antigos = {n[4:]: mapas[n].get(v, v) for n, v in pares
+                       if n in mapas and v and not n.startswith("pop:__")}
+    assert res["rotulos"] == rotulos_antigos
+    # grupos: mesmos valores que o hydrate antigo lia de nomeN / nomeN_campo
+    for g in res["grupos"].get("objetivoEstrategico", []):
+        n = f"objetivoEstrategico{g['n']}"
+        assert g["valor"] == rotulos_antigos.get(n, res["valores"][n])
+
+def test_extract_no_bpmn_de_exemplo(bpmn_exemplo):
+    ns = {"zeebe": "http://camunda.org/schema/zeebe/1.0"}
+    pares = [(p.get("name"), p.get("value", ""))
+             for p in etree.parse(str(bpmn_exemplo)).iterfind(".//zeebe:property", ns)]
+    assert pares
+    res = compile_plan().extract((n, v) for n, v in pares if (n or "").startswith("pop:"))
+    assert res["valores"] == _valores_antigos(pares)
@@ -0,0 +1,102 @@
+import base64, io, zipfile
+
+import pytest
+from lxml import etree as ET
+
+from POP.render import flat_odt
+
+NS = {"office": "urn:oasis:names:tc:opendocument:xmlns:office:1.0",
+      "style": flat_odt.STYLE_NS, "draw": flat_odt.DRAW_NS, "xlink": flat_odt.XLINK_NS,
+      "text": "urn:oasis:names:tc:opendocument:xmlns:text:1.0"}
+_DECL = " ".join(f'xmlns:{k}="{v}"' for k, v in NS.items())
+PNG = b"\x89PNG\r\n\x1a\n" + b"imagem de teste" * 4
+
+STYLES = f"""<office:document-styles {_DECL} office:version="1.3">
+  <office:automatic-styles>
+    <style:page-layout style:name="pm1"/>
+    <style:style style:name="P1" style:family="paragraph"/>
+    <style:style style:name="MP1" style:family="paragraph"/>
+    <style:style style:name="Rodape" style:family="paragraph"/>
+  </office:automatic-styles>
+  <office:master-styles>
+    <style:master-page style:name="Standard" style:page-layout-name="pm1">
+      <style:footer><text:p text:style-name="P1">rodapé</text:p>
+        <draw:frame><draw:image xlink:href="Pictures/logo.png" xlink:type="simple"/></draw:frame>
+      </style:footer>
+    </style:master-page>
+  </office:master-styles>
+</office:document-styles>"""
+
+CONTENT = f"""<office:document-content {_DECL} office:version="1.3">
+  <office:automatic-styles>
+    <style:style style:name="P1" style:family="paragraph"/>
+    <style:page-layout style:name="pm1"/>
+  </office:automatic-styles>
+  <office:body><office:text>
+    <text:p text:style-name="P1">corpo</text:p>
+    <draw:frame><draw:image xlink:href="Pictures/logo.png"/></draw:frame>
+    <draw:frame><draw:image xlink:href="http://exemplo.invalid/x.png"/></draw:frame>
+  </office:text></office:body>
+</office:document-content>"""
+
+@pytest.fixture
+def pacote():
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("mimetype", flat_odt.FODT_MIME)
+        z.writestr("content.xml", CONTENT)
+        z.writestr("styles.xml", STYLES)
+        z.writestr("Pictures/logo.png", PNG)
+    return zipfile.ZipFile(buf)
+
+def _nomes(doc, xpath):
+    return [e.get(f"{{{flat_odt.STYLE_NS}}}name") for e in doc.xpath(xpath, namespaces=NS)]
+
+def test_automaticos_que_colidem_sao_renomeados(pacote, tmp_path):
+    rel = flat_odt.write_fodt(pacote, {}, tmp_path / "a.fodt")
+    assert rel["estilos_renomeados"] == 2           # P1 -> MMP1 (MP1 já existe), pm1 -> Mpm1
+    doc = ET.parse(str(tmp_path / "a.fodt"))
+    nomes = _nomes(doc, "/office:document/office:automatic-styles/*")
+    assert len(nomes) == len(set(nomes))
+    assert {"MMP1", "Mpm1", "MP1", "Rodape", "P1", "pm1"} == set(nomes)
+    # referências de styles.xml seguem o novo nome; as de content.xml ficam
+    assert doc.xpath("//style:master-page/@style:page-layout-name", namespaces=NS) == ["Mpm1"]
+    assert doc.xpath("//style:footer/text:p/@text:style-name", namespaces=NS) == ["MMP1"]
+    assert doc.xpath("//office:text/text:p/@text:style-name", namespaces=NS) == ["P1"]
+
+def test_imagens_inline(pacote, tmp_path):
+    rel = flat_odt.write_fodt(pacote, {}, tmp_path / "a.fodt")
+    doc = ET.parse(str(tmp_path / "a.fodt"))
+    assert rel["imagens"] == 2
+    dados = doc.xpath("//draw:image/office:binary-data/text()", namespaces=NS)
+    assert [base64.b64decode(d) for d in dados] == [PNG, PNG]
+    assert doc.xpath("//draw:image/@xlink:href", namespaces=NS) == ["http://exemplo.invalid/x.png"]
+
+def test_imagens_externas(pacote, tmp_path):
+    pasta = tmp_path / "a_imagens"
+    rel = flat_odt.write_fodt(pacote, {}, tmp_path / "a.fodt", pictures="external", pictures_dir=pasta)
+    doc = ET.parse(str(tmp_path / "a.fodt"))
+    assert rel["imagens"] == 2
+    assert sorted(p.name for p in pasta.iterdir()) == ["logo.png"]
+    assert (pasta / "logo.png").read_bytes() == PNG
+    assert doc.xpath("//draw:image/@xlink:href", namespaces=NS) == [
+        "a_imagens/logo.png", "a_imagens/logo.png", "http://exemplo.invalid/x.png"]
+    assert not doc.xpath("//office:binary-data", namespaces=NS)
+
+def test_modo_de_imagens_invalido(pacote, tmp_path):
+    with pytest.raises(ValueError):
+        flat_odt.write_fodt(pacote, {}, tmp_path / "a.fodt", pictures="external")
+    with pytest.raises(ValueError):
+        flat_odt.write_fodt(pacote, {}, tmp_path / "a.fodt", pictures="link")
+
+def test_erro_no_meio_nao_troca_o_arquivo(pacote, tmp_path, monkeypatch):
+    destino = tmp_path / "a.fodt"
+    destino.write_bytes(b"versao anterior")
+    def quebra(fh, **kw):
+        fh.write(b"<office:document")
+        raise OSError("disco cheio")
+    monkeypatch.setattr(flat_odt.ET, "xmlfile", quebra)
+    with pytest.raises(OSError):
+        flat_odt.write_fodt(pacote, {}, destino)
+    assert destino.read_bytes() == b"versao anterior"
+    assert [p.name for p in tmp_path.iterdir()] == ["a.fodt"]
@@ -0,0 +1,67 @@
+import shutil, threading, time
+
+import pytest
+
+from POP import render, service
+
+@pytest.fixture
+def lote(bpmn_exemplo, tmp_path):
+    entradas = []
+    for i in range(6):
+        p = tmp_path / f"p{i}.bpmn"
+        shutil.copy(bpmn_exemplo, p)
+        entradas.append(p)
+    return entradas
+
+def _threads_do_pipeline():
+    return [t for t in threading.enumerate() if t.name.startswith("pop-pipe-")]
+
+def test_um_worker_por_etapa_preserva_a_ordem(lote, tmp_path):
+    res = list(service.iter_generate(lote, out_dir=tmp_path / "out", parse_workers=1,
+                                     render_workers=1, write_workers=1))
+    assert [r["indice"] for r in res] == list(range(len(lote)))
+    assert all(r["status"] == "ok" for r in res)
+
+def test_varios_workers_devolvem_cada_entrada_uma_vez(lote, tmp_path):
+    res = list(service.iter_generate(lote, out_dir=tmp_path / "out", parse_workers=3,
+                                     render_workers=3, write_workers=2, queue_size=1))
+    assert sorted(r["indice"] for r in res) == list(range(len(lote)))
+    assert {r["bpmn"] for r in res} == {str(p) for p in lote}
+
+def test_erro_numa_etapa_do_meio_vira_item_e_o_lote_segue(lote, tmp_path, monkeypatch):
+    original, chamadas = render.render_odt, []
+    def render_odt(template, ctx):
+        chamadas.append(1)
+        if len(chamadas) == 3:
+            raise ValueError("template corrompido")
+        return original(template, ctx)
+    monkeypatch.setattr(render, "render_odt", render_odt)
+    res = list(service.iter_generate(lote, out_dir=tmp_path / "out", render_workers=1))
+    erros = [r for r in res if r["status"] == "erro"]
+    assert len(res) == len(lote) and len(erros) == 1
+    assert (erros[0]["etapa"], erros[0]["erro"]) == ("renderizar", "template corrompido")
+    assert "odt_bytes" not in erros[0] and "output_path" not in erros[0]
+
+def test_entrada_que_falha_no_meio_da_iteracao(lote, tmp_path):
+    def entradas():
+        yield lote[0]
+        raise OSError("corpus ilegível")
+    res = list(service.iter_generate(entradas(), out_dir=tmp_path / "out"))
+    assert {(r["indice"], r["status"]) for r in res} == {(0, "ok"), (-1, "erro")}
+    assert [r["etapa"] for r in res if r["status"] == "erro"] == ["entrada"]
+
+def test_consumidor_que_para_cedo_encerra_as_threads(bpmn_exemplo, tmp_path):
+    consumidas = []
+    def infinitas():
+        while True:
+            consumidas.append(1)
+            yield bpmn_exemplo
+    gen = service.iter_generate(infinitas(), out_dir=tmp_path / "out", queue_size=1)
+    primeiro = next(gen)
+    assert primeiro["status"] == "ok"
+    assert _threads_do_pipeline()
+    gen.close()                         # finally: parar.set() + join
+    assert not _threads_do_pipeline()
+    n = len(consumidas)
+    time.sleep(0.2)
+    assert len(consumidas) == n < 50    # filas limitadas: a entrada não foi esvaziada
@@ -0,0 +1,99 @@
+import io, os, sys, time
+
+import pytest
+
+from POP.build_context.parser_bpmn import parse_seguro
+from POP.limits import JobError, JobLimits, LimitedWorker
+
+@pytest.fixture
+def importavel(tmp_path, monkeypatch):
+    """Filhos spawn importam `POP` do sys.path: expõe o checkout com esse nome."""
+    from conftest import RAIZ
+    (tmp_path / "POP").symlink_to(RAIZ, target_is_directory=True)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+def test_wall_s_mata_e_troca_o_filho(importavel):
+    w = LimitedWorker(JobLimits(wall_s=0.2))
+    try:
+        t0 = time.monotonic()
+        with pytest.raises(JobError) as e:
+            w.run(time.sleep, 10)
+        assert e.value.kind == "tempo_excedido" and time.monotonic() - t0 < 5
+        assert w.run(abs, -3) == 3                  # filho novo atende o próximo job
+        assert w.trocas == 1
+    finally:
+        w.close()
+
+@pytest.mark.skipif(sys.platform == "win32", reason="RLIMIT_AS só existe em POSIX")
+def test_rlimit_as_vira_memoria_excedida(importavel):
+    w = LimitedWorker(JobLimits(mem_mb=256))
+    try:
+        with pytest.raises(JobError) as e:
+            w.run(bytearray, 1024 ** 3)
+        assert e.value.kind == "memoria_excedida"
+        assert w.run(len, "abc") == 3
+    finally:
+        w.close()
+
+def _profundo(n):
+    return io.BytesIO(b"<a>" * n + b"</a>" * n)
+
+def test_teto_de_elementos_e_de_profundidade():
+    largo = io.BytesIO(b"<r>" + b"<x/>" * 50 + b"</r>")
+    with pytest.raises(JobError) as e:
+        parse_seguro(largo, JobLimits(max_elements=20))
+    assert (e.value.kind, e.value.detalhe["limite"]) == ("xml_limite", 20)
+    with pytest.raises(JobError) as e:
+        parse_seguro(_profundo(30), JobLimits(max_depth=10))
+    assert (e.value.kind, e.value.detalhe["limite"]) == ("xml_limite", 10)
+    assert parse_seguro(_profundo(10), JobLimits(max_depth=10)).tag == "a"
+
+def test_entrada_muito_profunda_nao_estoura_a_pilha():
+    # bem além do limite padrão (256) e do recursion limit do Python
+    with pytest.raises(JobError) as e:
+        parse_seguro(_profundo(100_000), JobLimits())
+    assert e.value.kind in ("xml_limite", "xml_invalido")
+
+def test_teto_de_tamanho():
+    with pytest.raises(JobError) as e:
+        parse_seguro(io.BytesIO(b"<a>" + b" " * 2000 + b"</a>"), JobLimits(input_bytes=1000))
+    assert e.value.kind == "entrada_grande"
+
+BILLION_LAUGHS = b"""<?xml version="1.0"?>
+<!DOCTYPE lolz [
+ <!ENTITY lol "lol">
+ <!ENTITY lol1 "&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;">
+ <!ENTITY lol2 "&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;&lol1;">
+ <!ENTITY lol3 "&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;&lol2;">
+ <!ENTITY lol4 "&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;&lol3;">
+ <!ENTITY lol5 "&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;&lol4;">
+ <!ENTITY lol6 "&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;&lol5;">
+ <!ENTITY lol7 "&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;&lol6;">
+ <!ENTITY lol8 "&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;&lol7;">
+ <!ENTITY lol9 "&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;&lol8;">
+]>
+<lolz>&lol9;</lolz>"""
+
+@pytest.mark.parametrize("xml", [
+    BILLION_LAUGHS,
+    b'<?xml version="1.0"?><!DOCTYPE x [<!ENTITY e SYSTEM "file:///etc/passwd">]><x>&e;</x>',
+    b'<?xml version="1.0"?><!DOCTYPE x SYSTEM "http://exemplo.invalid/x.dtd"><x/>',
+], ids=["billion_laughs", "entidade_externa", "dtd_externo"])
+def test_dtd_e_entidades_recusados(xml):
+    t0 = time.monotonic()
+    with pytest.raises(JobError) as e:
+        parse_seguro(io.BytesIO(xml), JobLimits())
+    assert e.value.kind == "xml_invalido" and "DOCTYPE" in str(e.value)
+    assert time.monotonic() - t0 < 1
+
+@pytest.mark.parametrize("valor", ["abc", "1,5", "10MB"])
+def test_variavel_malformada_usa_o_padrao(monkeypatch, capsys, valor):
+    for nome in ("POP_MAX_INPUT_MB", "POP_BPMN_MAX_ELEMENTS", "POP_JOB_TIMEOUT"):
+        monkeypatch.setenv(nome, valor)
+    lim = JobLimits.from_env()
+    assert (lim.input_bytes, lim.max_elements, lim.wall_s) == (20 * 1024 * 1024, 500_000, None)
+    assert "POP_BPMN_MAX_ELEMENTS" in capsys.readouterr().err
+
+def test_zero_desliga_o_limite(monkeypatch):
+    monkeypatch.setenv("POP_BPMN_MAX_DEPTH", "0")
+    assert JobLimits.from_env().max_depth is None
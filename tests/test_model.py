@@ -0,0 +1,34 @@
+import copy, json, pickle
+
+import pytest
+
+from POP.build_context.model import PopContext
+
+CONTEXTOS = [
+    {
+        "nome_processo": "Gerir contratos",
+        "codigo": "POP-001",
+        "versao": "2",
+        "setor_superior": "Superintendência (IEAPM-SUP)",
+        "setor_executor": "Departamento (IEAPM-DEP)",
+        "objetivos_estrategicos": ["OE1", "OE2"],
+        "indicadores_estrategicos": [],
+        "dicionario": [{"termo": "POP", "significado": "Procedimento"}],
+        "descricao_processo_atividades": [
+            {"elemento": "Receber", "descricao": "x", "blocos": [{"tipo": "p", "texto": "x"}], "raia": "R", "nivel": 1},
+            {"elemento": "Analisar"},                       # sem blocos/raia/nivel
+            {"elemento": "Fechar", "descricao": "y"},
+            {"nivel": 2, "elemento": "Fora de ordem"},
+        ],
+        "NVL_GERENCIAL": "X",
+    },
+    {"codigo": "POP-002", "descricao_processo_atividades": [{}]},
+]
+
+@pytest.mark.parametrize("d", CONTEXTOS)
+@pytest.mark.parametrize("copia", [lambda c: pickle.loads(pickle.dumps(c)), copy.deepcopy, copy.copy])
+def test_round_trip_sobrevive_a_copia(d, copia):
+    c = copia(PopContext.from_dict(d))
+    assert c.to_dict() == d
+    assert list(c.to_dict()) == list(d)
+    json.dumps(c.to_dict())
@@ -0,0 +1,74 @@
+from lxml import etree
+
+import pytest
+
+from POP.build_context.parser_bpmn import build_graph_index, ordered_documented_activities
+
+NS = {"bpmn": "http://www.omg.org/spec/BPMN/20100524/MODEL"}
+
+def _processo(corpo: str):
+    xml = f'<bpmn:process xmlns:bpmn="{NS["bpmn"]}" id="P">{corpo}</bpmn:process>'
+    return etree.fromstring(xml)
+
+def _tarefa(id_, tag="task", **attr):
+    extra = "".join(f' {k}="{v}"' for k, v in attr.items())
+    return f'<bpmn:{tag} id="{id_}" name="{id_}"{extra}><bpmn:documentation>doc {id_}</bpmn:documentation></bpmn:{tag}>'
+
+def _fluxos(*pares):       # "AB" ou ("A", "S1")
+    return "".join(f'<bpmn:sequenceFlow id="f{a}{b}" sourceRef="{a}" targetRef="{b}"/>' for a, b in pares)
+
+def _ordem(proc):
+    return [a["elemento"] for a in ordered_documented_activities(build_graph_index(proc))]
+
+def _ordem_antiga(proc):
+    """Ordem da versão anterior (.//*[bpmn:documentation]): ordem do documento."""
+    return [e.get("name") for e in proc.xpath(".//*[bpmn:documentation]", namespaces=NS)]
+
+def test_linear_em_ordem_de_documento_igual_a_antiga():
+    proc = _processo(_tarefa("A") + _tarefa("B") + _tarefa("C") + _fluxos("AB", "BC"))
+    assert _ordem(proc) == _ordem_antiga(proc) == ["A", "B", "C"]
+
+def test_linear_fora_de_ordem_segue_o_fluxo():
+    proc = _processo(_tarefa("C") + _tarefa("A") + _tarefa("B") + _fluxos("AB", "BC"))
+    assert _ordem_antiga(proc) == ["C", "A", "B"]
+    assert _ordem(proc) == ["A", "B", "C"]
+
+def test_gateway_divide_e_junta():
+    corpo = (_tarefa("D") + '<bpmn:parallelGateway id="J"/>' + _tarefa("C") + _tarefa("B")
+             + '<bpmn:parallelGateway id="S"/>' + _tarefa("A")
+             + _fluxos("AS", "SB", "SC", "BJ", "CJ", "JD"))
+    proc = _processo(corpo)
+    nova = _ordem(proc)
+    assert sorted(nova) == sorted(_ordem_antiga(proc))
+    assert nova[0] == "A" and nova[-1] == "D"       # o join espera os dois ramos
+    assert set(nova[1:3]) == {"B", "C"}
+
+def test_laco_de_retrabalho_quebra_o_ciclo_em_ordem_de_documento():
+    # A -> B -> C -> B (retrabalho); C -> D. B nunca chega a grau 0 pelo Kahn.
+    proc = _processo(_tarefa("A") + _tarefa("B") + _tarefa("C") + _tarefa("D")
+                     + _fluxos("AB", "BC", "CB", "CD"))
+    assert _ordem(proc) == ["A", "B", "C", "D"]
+    # ciclo sem entrada: começa pelo primeiro do documento e não perde nós
+    proc = _processo(_tarefa("Y") + _tarefa("X") + _fluxos("XY", "YX"))
+    assert _ordem(proc) == _ordem_antiga(proc) == ["Y", "X"]
+
+def test_evento_de_fronteira_vem_depois_do_hospedeiro():
+    corpo = (_tarefa("T", tag="boundaryEvent", attachedToRef="A") + _tarefa("E") + _tarefa("B")
+             + _tarefa("A") + _fluxos("AB", "TE"))
+    proc = _processo(corpo)
+    nova = _ordem(proc)
+    assert _ordem_antiga(proc) == ["T", "E", "B", "A"]
+    assert nova[0] == "A"
+    assert nova.index("T") < nova.index("E")
+    assert sorted(nova) == sorted(_ordem_antiga(proc))
+
+def test_subprocesso_aninhado_expande_logo_apos_o_no():
+    interno = _tarefa("Z") + _tarefa("Y") + _fluxos("YZ")
+    sub = (f'<bpmn:subProcess id="S2" name="S2">{interno}</bpmn:subProcess>')
+    s1 = (f'<bpmn:subProcess id="S1" name="S1"><bpmn:documentation>doc S1</bpmn:documentation>'
+          f'{sub}{_tarefa("X")}{_fluxos(("X", "S2"))}</bpmn:subProcess>')
+    proc = _processo(_tarefa("B") + s1 + _tarefa("A") + _fluxos(("A", "S1"), ("S1", "B")))
+    itens = ordered_documented_activities(build_graph_index(proc))
+    assert [(a["elemento"], a["nivel"]) for a in itens] == [
+        ("A", 0), ("S1", 0), ("X", 1), ("Y", 2), ("Z", 2), ("B", 0)]
+    assert _ordem_antiga(proc) == ["B", "S1", "Z", "Y", "X", "A"]
@@ -0,0 +1,47 @@
+from lxml import etree as ET
+
+import pytest
+
+from POP import service
+from POP.build_context.rules_pop import html_to_blocks
+from POP.render import fill_first_page_xml as fill
+from POP.render.skeleton import render_skeleton_parts
+
+TEMPLATE = str(service.DEFAULT_TEMPLATE)
+
+_BASE = {"nome_processo": "Processo", "codigo": "P-1", "versao": "02", "POP_SETOR_SUPERIOR": "Sup",
+         "POP_SETOR_EXECUTOR": "Exec", "NVL_GERENCIAL": "G", "NVL_OPERACIONAL": "O",
+         "rodape_elaborador": "R", "aprovacao_responsavel": "A", "aprovacao_data": "01/02/2025",
+         "EORG_SUP": "(IEAPM-1)", "EORG_EXEC": "(IEAPM-2)", "objetivos_estrategicos": ["o1", "o2"],
+         "indicadores_estrategicos": [], "palavras_chave": ["k"], "descricao_processo_atividades": []}
+
+def _atividade(elemento, html):
+    return {"elemento": elemento, "descricao": "", "blocos": html_to_blocks(html)}
+
+CONTEXTOS = {
+    "especiais": dict(_BASE, nome_processo='A & B <c> "d" \'e\'', codigo="]]> &amp;",
+                      objetivos_estrategicos=["x < y", "a & b"], palavras_chave=["<k>", "ç ã é"],
+                      descricao_processo_atividades=[{"elemento": "T <1> & 2", "descricao": "d < e\n& f"}]),
+    "eorg_vazios": dict(_BASE, EORG_SUP="", EORG_EXEC=""),
+    "eorg_um_vazio": dict(_BASE, EORG_SUP="", EORG_EXEC="(X)"),
+    "varios_paragrafos": dict(_BASE, descricao_processo_atividades=[
+        _atividade("T1", "<p>um</p><p>dois<br>três</p><p>&lt;quatro&gt; &amp; cinco</p>"),
+        _atividade("T2", "<ol><li>a<ul><li>a.1</li></ul>depois</li><li>b</li></ol><p>fim</p>"),
+        {"elemento": "T3", "descricao": "linha 1\n\nlinha 3"}]),
+    "vazio": {},
+}
+
+def _c14n(xml: bytes) -> bytes:
+    return ET.tostring(ET.fromstring(xml), method="c14n")
+
+@pytest.mark.parametrize("nome", CONTEXTOS)
+def test_esqueleto_igual_ao_dom(nome, monkeypatch):
+    ctx = CONTEXTOS[nome]
+    monkeypatch.delenv("POP_RENDER", raising=False)
+    assert render_skeleton_parts(TEMPLATE, ctx) is not None     # o caminho rápido foi mesmo usado
+    _, rapido = fill.render_parts(TEMPLATE, ctx)
+    monkeypatch.setenv("POP_RENDER", "dom")
+    _, dom = fill.render_parts(TEMPLATE, ctx)
+    assert rapido.keys() == dom.keys()
+    for membro in dom:
+        assert _c14n(rapido[membro]) == _c14n(dom[membro]), membro
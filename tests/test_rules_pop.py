@@ -0,0 +1,56 @@
+# Conversor da documentação (html_to_blocks) contra o strip_html_preserve_breaks
+# da baseline: mesmo texto para tudo o que não é lista.
+import re
+from html import unescape
+
+import pytest
+
+from POP.build_context.rules_pop import blocks_to_text, html_to_blocks
+
+def _baseline(html_text: str) -> str:
+    s = unescape(html_text)
+    s = re.sub(r"(?i)<\s*br\s*/?\s*>", "\n", s)
+    s = re.sub(r"(?i)</\s*p\s*>", "\n\n", s)
+    s = re.sub(r"<[^>]+>", "", s)
+    s = s.replace("\xa0", " ").replace("​", "")
+    s = re.sub(r"[ \t]+", " ", s).strip()
+    return re.sub(r"\n{3,}", "\n\n", s)
+
+@pytest.mark.parametrize("html", [
+    "&lt;p&gt;texto&lt;/p&gt;",
+    "&lt;p&gt;um&lt;/p&gt;&lt;p&gt;dois&lt;br/&gt;três&lt;/p&gt;",
+    "<p>a</p><p>b</p>",
+    "linha 1<br>linha 2<br/>linha 3<BR />linha 4",
+    "1 < 2",
+    "1 &lt; 2",
+    "Tom &amp; Jerry&nbsp;juntos",
+    "texto puro\nsegunda linha",
+])
+def test_paridade_com_a_baseline(html):
+    assert blocks_to_text(html_to_blocks(html)) == _baseline(html)
+
+def _palavras(s):
+    # a baseline achatava as listas (sem marcador nem quebra): compara só o texto
+    return re.sub(r"[\s•\d.]", "", s)
+
+@pytest.mark.parametrize("html", [
+    "<ul><li>a<ul><li>b</li></ul>c</li><li>d</li></ul>",
+    "&lt;ol&gt;&lt;li&gt;um&lt;ol&gt;&lt;li&gt;sub&lt;/li&gt;&lt;/ol&gt;resto&lt;/li&gt;&lt;li&gt;dois&lt;/li&gt;&lt;/ol&gt;",
+])
+def test_listas_aninhadas_mantem_conteudo_da_baseline(html):
+    assert _palavras(blocks_to_text(html_to_blocks(html))) == _palavras(_baseline(html))
+
+def test_texto_depois_de_sublista_nao_quebra_a_lista():
+    blocos = html_to_blocks("<ul><li>a<ul><li>b</li></ul>c</li><li>d</li></ul>")
+    assert [b["tipo"] for b in blocos] == ["lista"]
+    itens = blocos[0]["itens"]
+    assert [(i["nivel"], i["linhas"], bool(i.get("continuacao"))) for i in itens] == [
+        (0, ["a"], False), (1, ["b"], False), (0, ["c"], True), (0, ["d"], False)]
+
+def test_continuacao_fica_no_mesmo_list_item():
+    from POP.render.fill_first_page_xml import _lista_de_blocos, TEXT_NS
+    lista = _lista_de_blocos(html_to_blocks("<ul><li>a<ul><li>b</li></ul>c</li><li>d</li></ul>")[0], "P")
+    itens = lista.findall(f"{{{TEXT_NS}}}list-item")
+    assert len(itens) == 2
+    assert [c.tag.split("}")[1] for c in itens[0]] == ["p", "list", "p"]
+    assert "".join(itens[0][2].itertext()) == "c"
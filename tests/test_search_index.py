@@ -0,0 +1,32 @@
+from POP import search_index
+from POP.sinks import JournalSink
+
+def _ctx(codigo, nome):
+    return {"codigo": codigo, "versao": "1", "nome_processo": nome, "descricao_processo_atividades": []}
+
+def test_reindex_le_o_journal(tmp_path, monkeypatch):
+    monkeypatch.setenv("POP_INDEX", str(tmp_path / "idx.sqlite3"))
+    j = JournalSink(tmp_path / "contexts" / "journal")
+    j.write("job-a", _ctx("POP-001", "Registro de Software"), "a.contexto.json")
+    j.write("job-b", _ctx("POP-002", "Pagamento de Diárias"), "b.contexto.json")
+    j.close()
+    assert search_index.reindex_contexts(tmp_path / "contexts") == 2
+    assert [r["codigo"] for r in search_index.search("diarias")] == ["POP-002"]
+
+def test_falha_de_disco_nao_derruba_a_geracao(tmp_path, monkeypatch, capsys):
+    arquivo = tmp_path / "arquivo"
+    arquivo.write_text("")
+    monkeypatch.setenv("POP_INDEX", str(arquivo / "idx.sqlite3"))    # pai é arquivo: OSError
+    search_index.index_context(_ctx("POP-001", "x"))
+    assert "AVISO" in capsys.readouterr().out
+
+def test_indexacao_desligada_no_processo(tmp_path, monkeypatch):
+    monkeypatch.setenv("POP_INDEX", str(tmp_path / "idx.sqlite3"))
+    search_index.set_indexing(False)
+    try:
+        search_index.index_context(_ctx("POP-003", "Carga sintética"))
+    finally:
+        search_index.set_indexing(True)
+    assert search_index.search("sintetica") == []
+    search_index.index_context(_ctx("POP-003", "Carga sintética"))
+    assert [r["codigo"] for r in search_index.search("sintetica")] == ["POP-003"]
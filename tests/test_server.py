@@ -0,0 +1,114 @@
+import io, json, queue, threading, time, zipfile
+
+import pytest
+
+from POP import server, service
+from POP.limits import JobError, JobLimits
+
+@pytest.fixture
+def pool_lento(monkeypatch):
+    def render_lento(*args):
+        time.sleep(0.3)
+        return {"ok": True}
+    monkeypatch.setattr(service, "render_pop", render_lento)
+    monkeypatch.setattr(server, "stage_blob", lambda job_id, blob, name: "/dev/null")
+    p = server.GenerationPool(workers=1, queue_size=1).start()
+    yield p
+    p.shutdown()
+
+def test_timeout_devolve_vaga_e_descarta_resultado(pool_lento):
+    rodando = pool_lento.submit(b"a")
+    time.sleep(0.05)
+    na_fila = pool_lento.submit(b"b")
+    with pytest.raises(queue.Full):
+        pool_lento.submit(b"c")
+    pool_lento.abandon(na_fila)                 # na fila: cancelado, vaga liberada
+    assert na_fila.cancelled()
+    depois = pool_lento.submit(b"d")
+    pool_lento.abandon(rodando)                 # já rodando: resultado descartado
+    assert depois.result(timeout=2) == {"ok": True}
+    snap = pool_lento.snapshot()
+    assert (snap["cancelados"], snap["abandonados"], snap["concluidos"]) == (1, 1, 2)
+    assert not pool_lento._abandonados
+
+@pytest.fixture
+def http(request):
+    """Sobe o servidor numa porta livre; devolve post(corpo) -> (status, headers, corpo)."""
+    import http.client
+    servidores = []
+
+    def sobe(pool, request_timeout=30.0):
+        httpd = server.make_server("127.0.0.1", 0, pool, request_timeout=request_timeout)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servidores.append(httpd)
+
+        def post(corpo: bytes, query: str = ""):
+            conn = http.client.HTTPConnection("127.0.0.1", httpd.server_address[1], timeout=30)
+            conn.request("POST", "/pop" + query, body=corpo)
+            r = conn.getresponse()
+            dados = r.read()
+            conn.close()
+            return r.status, dict(r.getheaders()), dados
+        return post
+
+    yield sobe
+    for httpd in servidores:
+        httpd.shutdown()
+        httpd.server_close()
+        httpd.pool.shutdown()
+
+def _pool(**kw):
+    return server.GenerationPool(workers=1, queue_size=2, limits=JobLimits(), **kw).start()
+
+def test_post_devolve_odt(http, bpmn_exemplo):
+    post = http(_pool())
+    status, headers, corpo = post(bpmn_exemplo.read_bytes())
+    assert status == 200
+    assert headers["Content-Type"] == server.ODT_MIME
+    with zipfile.ZipFile(io.BytesIO(corpo)) as z:
+        assert z.read("mimetype") == server.ODT_MIME.encode()
+        assert b"<office:document-content" in z.read("content.xml")
+
+def test_bpmn_invalido_e_422(http):
+    post = http(_pool())
+    status, _, corpo = post(b"<definitions/>")
+    assert status == 422
+    assert json.loads(corpo)["tipo"] in ("xml_invalido", "bpmn_invalido")
+
+@pytest.mark.parametrize("kind, status", [("entrada_grande", 413), ("tempo_excedido", 504),
+                                          ("memoria_excedida", 507), ("xml_limite", 422)])
+def test_job_error_vira_status(http, monkeypatch, kind, status):
+    def render(*args):
+        raise JobError(kind, "x", limite=1)
+    monkeypatch.setattr(service, "render_pop", render)
+    monkeypatch.setattr(server, "stage_blob", lambda job_id, blob, name: "/dev/null")
+    post = http(_pool())
+    st, _, corpo = post(b"<x/>")
+    assert st == status
+    assert json.loads(corpo) == {"tipo": kind, "erro": "x", "limite": 1}
+
+@pytest.mark.parametrize("erro, no_log", [(OSError("disco cheio"), "Traceback"),
+                                          (KeyError("bug"), "Traceback"),
+                                          (JobError("falha", "bug no filho"), "bug no filho")])
+def test_erro_interno_e_500_com_rastro_no_log(http, monkeypatch, capsys, erro, no_log):
+    def render(*args):
+        raise erro
+    monkeypatch.setattr(service, "render_pop", render)
+    monkeypatch.setattr(server, "stage_blob", lambda job_id, blob, name: "/dev/null")
+    post = http(_pool())
+    st, _, corpo = post(b"<x/>")
+    assert st == 500
+    assert json.loads(corpo) == {"tipo": "falha", "erro": "erro interno na geração"}
+    assert no_log in capsys.readouterr().err
+
+def test_timeout_da_requisicao_e_504_e_abandona(http, pool_lento, monkeypatch):
+    abandonados = []
+    original = pool_lento.abandon
+    monkeypatch.setattr(pool_lento, "abandon", lambda fut: (abandonados.append(fut), original(fut)))
+    post = http(pool_lento, request_timeout=0.05)
+    st, _, corpo = post(b"<x/>")
+    assert st == 504 and json.loads(corpo)["erro"] == "tempo de geração excedido"
+    assert len(abandonados) == 1
+    time.sleep(0.4)             # o job termina e o resultado é descartado
+    snap = pool_lento.snapshot()
+    assert (snap["abandonados"], snap["concluidos"]) == (1, 1)
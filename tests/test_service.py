@@ -0,0 +1,27 @@
+import zipfile
+
+import pytest
+
+from POP import service, workspace
+
+@pytest.fixture
+def durabilidade():
+    yield workspace.set_durability
+    workspace.set_durability("none")
+
+def test_modo_group_entrega_so_no_checkpoint(durabilidade, bpmn_exemplo, tmp_path):
+    durabilidade("group", 64)
+    res = service.generate_pop_odt(str(bpmn_exemplo), out_dir=str(tmp_path))
+    assert not (tmp_path / res["filename"]).exists()
+    assert workspace.durability_stats()["pendentes"] >= 1
+    workspace.checkpoint()
+    assert res["output_path"] == str(tmp_path / res["filename"])
+    assert zipfile.is_zipfile(res["output_path"])
+    assert not list(tmp_path.glob(".*.tmp"))
+
+@pytest.mark.parametrize("modo", ["none", "file"])
+def test_demais_modos_entregam_no_retorno(durabilidade, bpmn_exemplo, tmp_path, modo):
+    durabilidade(modo)
+    res = service.generate_pop_odt(str(bpmn_exemplo), out_dir=str(tmp_path))
+    assert zipfile.is_zipfile(res["output_path"])
+    assert workspace.durability_stats()["pendentes"] == 0
@@ -0,0 +1,43 @@
+from pathlib import Path
+
+from POP.sinks import FileSink, JournalSink, NullSink
+
+CTX = {"codigo": "POP-001", "versao": "1"}
+
+def test_localizador_de_cada_sink(tmp_path):
+    arq = FileSink(tmp_path / "files").write("job-a", CTX, "c.contexto.json")
+    assert Path(arq).is_file()
+
+    j = JournalSink(tmp_path / "journal")
+    loc = j.write("job-b", CTX, "c.contexto.json")
+    arquivo, job_id = str(loc).split("#")
+    assert Path(arquivo) == j.index_path and job_id == "job-b"
+    assert j.read(job_id) == CTX
+    j.close()
+
+    assert NullSink().write("job-c", CTX, "c.contexto.json") is None
+
+def test_meia_linha_no_indice_nao_corrompe_o_journal(tmp_path):
+    from POP.sinks import iter_journal
+    base = tmp_path / "journal"
+    j = JournalSink(base)
+    j.write("job-a", {"codigo": "A"}, "c.contexto.json")
+    j.close()
+    with open(base / "index.jsonl", "ab") as f:      # worker morto no meio da escrita
+        f.write(b'{"job_id":"job-x","arquivo":"c.con')
+    j = JournalSink(base)
+    j.write("job-b", {"codigo": "B"}, "c.contexto.json")
+    j.close()
+
+    novo = JournalSink(base)
+    assert novo.read("job-a") == {"codigo": "A"}
+    assert novo.read("job-b") == {"codigo": "B"}
+    novo.close()
+    assert [job for job, _, _ in iter_journal(base)] == ["job-a", "job-b"]
+
+def test_localizador_so_depois_de_gravado(tmp_path):
+    j = JournalSink(tmp_path / "journal")
+    loc = j.write("job-a", CTX, "c.contexto.json")      # sem close/flush: já está no arquivo
+    dados = (tmp_path / "journal" / "index.jsonl").read_bytes()
+    assert b'"job-a"' in dados and loc.endswith("#job-a")
+    j.close()
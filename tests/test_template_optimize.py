@@ -0,0 +1,74 @@
+import os, shutil, struct, subprocess, sys, zipfile, zlib
+
+from conftest import RAIZ
+from POP import service
+from POP.render import template_optimize as topt
+
+def _png(largura=64, altura=64, nivel=0):
+    """PNG RGB com IDAT mal comprimido e dividido em dois chunks, mais um tEXt."""
+    linhas = b"".join(b"\x00" + bytes((x * 4 + y) % 256 for x in range(largura * 3)) for y in range(altura))
+    idat = zlib.compress(linhas, nivel)
+    meio = len(idat) // 2
+    ihdr = struct.pack(">IIBBBBB", largura, altura, 8, 2, 0, 0, 0)
+    return (topt.PNG_SIG + topt._chunk(b"IHDR", ihdr) + topt._chunk(b"tEXt", b"Comment\x00teste")
+            + topt._chunk(b"IDAT", idat[:meio]) + topt._chunk(b"IDAT", idat[meio:])
+            + topt._chunk(b"IEND", b""))
+
+def _pixels(png: bytes) -> bytes:
+    return zlib.decompress(b"".join(c for t, c, _ in topt._chunks(png) if t == b"IDAT"))
+
+def _demais_chunks(png: bytes) -> list:
+    return [bruto for t, _, bruto in topt._chunks(png) if t != b"IDAT"]
+
+def test_png_recomprimido_tem_os_mesmos_pixels():
+    orig = _png()
+    novo = topt.recompress_png(orig)
+    assert len(novo) < len(orig)
+    assert _pixels(novo) == _pixels(orig)
+    assert _demais_chunks(novo) == _demais_chunks(orig)
+    assert [t for t, _, _ in topt._chunks(novo)].count(b"IDAT") == 1
+    # crc de cada chunk confere
+    for t, corpo, bruto in topt._chunks(novo):
+        assert struct.unpack(">I", bruto[-4:])[0] == zlib.crc32(t + corpo) & 0xFFFFFFFF
+
+def test_png_sem_ganho_ou_invalido_fica_igual():
+    ja_bom = topt.recompress_png(_png())
+    assert topt.recompress_png(ja_bom) == ja_bom
+    assert topt.recompress_png(b"nao e png") == b"nao e png"
+    assert topt.recompress_png(topt.PNG_SIG + b"\x00\x00\x00\x05IDATxx") == topt.PNG_SIG + b"\x00\x00\x00\x05IDATxx"
+
+def _cli(tmp_path, *args):
+    (tmp_path / "POP").symlink_to(RAIZ, target_is_directory=True)
+    env = dict(os.environ, PYTHONPATH=str(tmp_path), POP_WORKDIR=str(tmp_path / "work"))
+    return subprocess.run([sys.executable, "-m", "POP.cli", *args], env=env, cwd=tmp_path,
+                          capture_output=True, text=True, check=True)
+
+def test_cli_gera_variante_menor_com_os_mesmos_pngs(tmp_path):
+    fonte = tmp_path / "modelo.odt"
+    shutil.copy(service.DEFAULT_TEMPLATE, fonte)
+    r = _cli(tmp_path, "--optimize-template", str(fonte))
+    variante = topt.variant_path(fonte)
+    assert r.stdout.strip().splitlines()[-1].startswith(f"OK: {variante}")
+    assert variante.stat().st_size < fonte.stat().st_size
+    with zipfile.ZipFile(fonte) as a, zipfile.ZipFile(variante) as b:
+        assert b.namelist()[0] == "mimetype" and b.getinfo("mimetype").compress_type == zipfile.ZIP_STORED
+        for nome in b.namelist():
+            if nome.lower().endswith(".png"):
+                assert _pixels(b.read(nome)) == _pixels(a.read(nome)), nome
+            elif nome != "META-INF/manifest.xml":
+                assert b.read(nome) == a.read(nome), nome
+    assert topt.optimized_template(fonte) == str(variante)
+
+def test_variante_desatualizada_cai_para_o_template(tmp_path, monkeypatch):
+    fonte = tmp_path / "modelo.odt"
+    shutil.copy(service.DEFAULT_TEMPLATE, fonte)
+    topt.build_optimized(fonte)
+    assert topt.optimized_template(fonte) == str(topt.variant_path(fonte))
+    with zipfile.ZipFile(fonte, "a") as z:          # template editado depois da variante
+        z.writestr("extra.txt", "novo")
+    assert topt.optimized_template(fonte) == str(fonte)
+    topt.build_optimized(fonte)
+    os.utime(fonte, ns=(0, 1))                      # nova chave (mtime) para o cache de resolução
+    assert topt.optimized_template(fonte) == str(topt.variant_path(fonte))
+    monkeypatch.setenv("POP_TEMPLATE_OTIMIZADO", "0")
+    assert topt.optimized_template(fonte) == str(fonte)
@@ -0,0 +1,39 @@
+import shutil, threading
+
+import pytest
+
+from POP import workspace
+
+def test_shard_removido_e_recriado_na_escrita():
+    job_id, _ = workspace.new_job(prefix="t")
+    primeiro = workspace.write_artifact(job_id, b"a", "odt", "a.bin")
+    shutil.rmtree(primeiro.parent)              # limpeza externa com o shard ainda em _made
+    assert primeiro.parent in workspace._made
+    assert workspace.write_artifact(job_id, b"b", "odt", "b.bin").read_bytes() == b"b"
+    assert workspace.stage_blob(job_id, b"c", "c.bpmn").read_bytes() == b"c"
+
+def test_origem_ausente_nao_e_confundida_com_shard_removido(tmp_path):
+    job_id, _ = workspace.new_job(prefix="t")
+    with pytest.raises(FileNotFoundError, match="nao-existe"):
+        workspace.stage_input(job_id, tmp_path / "nao-existe.bpmn")
+
+def test_travas_em_numero_fixo(tmp_path):
+    locks = workspace.WORKDIR / "locks"
+    for i in range(2000):
+        with workspace.file_lock(tmp_path / f"destino-{i}.odt"):
+            pass
+    nomes = {p.name for p in locks.glob("*.lock")}
+    assert len(nomes) <= workspace._N_LOCKS
+
+def test_trava_exclui_no_mesmo_destino(tmp_path):
+    alvo, dentro, maximo = tmp_path / "x.odt", [0], [0]
+    def entra():
+        for _ in range(50):
+            with workspace.file_lock(alvo):
+                dentro[0] += 1
+                maximo[0] = max(maximo[0], dentro[0])
+                dentro[0] -= 1
+    ts = [threading.Thread(target=entra) for _ in range(4)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    assert maximo[0] == 1
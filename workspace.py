@@ -1,43 +1,359 @@
 from __future__ import annotations
+from contextlib import contextmanager
 from pathlib import Path
-import os, time, uuid, shutil, json
+import hashlib, os, re, threading, time, uuid, shutil
 
 _DEFAULT = Path(__file__).resolve().parent / ".work"
 WORKDIR = Path(os.environ.get("POP_WORKDIR", _DEFAULT))
-_SUBS = ["inbox", "contexts", "odt", "pdf", "tmp", "logs", "archive"]
+_SUBS = ["inbox", "contexts", "odt", "pdf", "tmp", "logs", "archive", "locks"]
 
-def ensure_workdirs(): 
+# Layout fragmentado: <sub>/<AAAAMMDD>/<2 hex do hash do job>/<job>-<arquivo>
+# Mantém cada diretório pequeno mesmo com milhares de jobs por dia.
+_JOB_DATE_RE = re.compile(r"-(\d{8})-\d{6}-")
+_init_pid = None                 # ensure_workdirs roda uma vez por processo
+_made: set = set()               # shards já criados neste processo
+_made_lock = threading.Lock()
+
+def ensure_workdirs():
+    global _init_pid
+    if _init_pid == os.getpid():
+        return
     for s in _SUBS: (WORKDIR / s).mkdir(parents=True, exist_ok=True)
+    _made.clear()
+    _init_pid = os.getpid()
+
+def shard_of(job_id: str) -> Path:
+    """Caminho relativo do shard de um job: <AAAAMMDD>/<hh>."""
+    m = _JOB_DATE_RE.search(job_id)
+    day = m.group(1) if m else time.strftime("%Y%m%d")
+    return Path(day) / hashlib.sha1(job_id.encode("utf-8")).hexdigest()[:2]
+
+def job_path(sub: str, job_id: str, filename: str) -> Path:
+    """Arquivo `<job_id>-<filename>` no shard do job dentro de WORKDIR/<sub>, criando o shard se preciso."""
+    d = WORKDIR / sub / shard_of(job_id)
+    if d not in _made:
+        d.mkdir(parents=True, exist_ok=True)
+        with _made_lock:
+            _made.add(d)
+    return d / f"{job_id}-{filename}"
+
+def _no_shard(dst: Path, escreve):
+    """
+    Roda `escreve(dst)` para um caminho de job_path. Se o shard sumiu depois de
+    cacheado em _made (limpeza externa do WORKDIR), recria o diretório e tenta
+    de novo uma vez.
+    """
+    try:
+        return escreve(dst)
+    except FileNotFoundError:
+        if dst.parent.is_dir():
+            raise               # o que falta é outra coisa (ex.: a origem da cópia)
+        with _made_lock:
+            _made.discard(dst.parent)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        with _made_lock:
+            _made.add(dst.parent)
+        return escreve(dst)
 
 def new_job(prefix: str = "job"):
     ensure_workdirs()
     ts = time.strftime("%Y%m%d-%H%M%S")
-    jid = f"{prefix}-{ts}-{uuid.uuid4().hex[:6]}"
-    jobdir = WORKDIR / "tmp" / jid
+    # pid + 48 bits aleatórios: ids únicos mesmo com vários workers no mesmo segundo
+    jid = f"{prefix}-{ts}-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    jobdir = WORKDIR / "tmp" / shard_of(jid) / jid
     jobdir.mkdir(parents=True, exist_ok=True)
     return jid, jobdir
 
 def stage_input(job_id: str, src, name: str | None = None) -> Path:
     src = Path(src); name = name or src.name
-    dst = WORKDIR / "inbox" / f"{job_id}-{name}"
-    shutil.copy2(src, dst); return dst
+    dst = job_path("inbox", job_id, name)
+    _no_shard(dst, lambda d: shutil.copy2(src, d)); return dst
 
-def write_context(job_id: str, ctx: dict, filename="contexto.json") -> Path:
-    out = WORKDIR / "contexts" / f"{job_id}-{filename}"
-    out.parent.mkdir(parents=True, exist_ok=True)
-    with open(out, "w", encoding="utf-8") as f: json.dump(ctx, f, ensure_ascii=False, indent=2)
-    return out
+# destino do contexto de auditoria: files (padrão) | journal | none
+_SINK = None
+
+def make_context_sink(kind: str):
+    from .sinks import FileSink, JournalSink, NullSink
+    kind = (kind or "files").strip().lower()
+    if kind == "files":   return FileSink(WORKDIR / "contexts", shard=shard_of)
+    if kind == "journal": return JournalSink(WORKDIR / "contexts" / "journal")
+    if kind == "none":    return NullSink()
+    raise ValueError(f"sink de contexto desconhecido: {kind!r} (use files, journal ou none)")
+
+def set_context_sink(sink) -> None:
+    """Troca o sink ativo (instância de sinks.ContextSink ou nome: files/journal/none)."""
+    global _SINK
+    if _SINK is not None and _SINK is not sink:
+        _SINK.close()
+    _SINK = make_context_sink(sink) if isinstance(sink, str) else sink
+
+def get_context_sink():
+    global _SINK
+    if _SINK is None:
+        _SINK = make_context_sink(os.environ.get("POP_CONTEXT_SINK", "files"))
+    return _SINK
+
+def write_context(job_id: str, ctx: dict, filename="contexto.json") -> str | None:
+    """
+    Grava o contexto no sink ativo e devolve o localizador (ver ContextSink.write),
+    ou None se o sink descarta. `ctx` pode ser o dict ou um
+    build_context.model.PopContext (gravado no formato dict).
+    """
+    if not isinstance(ctx, dict):
+        ctx = ctx.to_dict()
+    loc = get_context_sink().write(job_id, ctx, filename)
+    return str(loc) if loc is not None else None
+
+def read_context(job_id: str, filename: str | None = None) -> dict | None:
+    return get_context_sink().read(job_id, filename)
 
 def write_artifact(job_id: str, blob: bytes, kind: str, filename: str) -> Path:
-    outdir = WORKDIR / kind; outdir.mkdir(parents=True, exist_ok=True)
-    out = outdir / f"{job_id}-{filename}"
-    with open(out, "wb") as f: f.write(blob)
+    out = job_path(kind, job_id, filename)
+    _no_shard(out, lambda d: _grava(d, blob, _DUR.modo == "file"))
+    if _DUR.modo == "file": _DUR.fsync_dir(out.parent)
+    elif _DUR.modo == "group": _DUR.adiciona(out, None)
     return out
 
+# Durabilidade das gravações (set_durability; sem chamada explícita, POP_DURABILITY
+# e POP_DURABILITY_GROUP, lidos na primeira consulta e não no import):
+#   none : só os.replace (padrão; rápido, mas um crash do host pode deixar arquivo truncado)
+#   file : fsync de cada arquivo antes do rename e do diretório depois
+#   group: as entregas ficam em .tmp e a cada `group_size` (ou em checkpoint())
+#          todos os .tmp recebem fsync, são renomeados e cada diretório recebe um
+#          único fsync. Um arquivo entregue só aparece no destino já durável.
+DURABILITY_MODES = ("none", "file", "group")
+
+def _grupo(v) -> int:
+    try:
+        return max(1, int(v))
+    except (TypeError, ValueError):
+        raise ValueError(f"tamanho de grupo de durabilidade inválido: {v!r}") from None
+
+class _Durabilidade:
+    def __init__(self):
+        self._modo = None               # None: ainda não configurado (ver `modo`)
+        self.group_size = 64
+        self._lock = threading.Lock()
+        self._pendentes: list = []      # (arquivo, destino do rename ou None)
+        self._ckpt_lock = threading.Lock()
+        self._local = threading.local()
+        self.grupo = 1                  # grupo aberto (recebendo entregas)
+        self.efetivado = 0              # último grupo já efetivado
+        self.stats = {"arquivos": 0, "diretorios": 0, "checkpoints": 0, "fsync_s": 0.0}
+        self._finalizador = None
+
+    @property
+    def modo(self) -> str:
+        if self._modo is None:
+            v = os.environ.get("POP_DURABILITY", "none")
+            try:
+                self.configura(v)
+            except ValueError as e:
+                raise ValueError(f"POP_DURABILITY={v!r}: {e}") from None
+        return self._modo
+
+    def configura(self, modo: str, group_size: int | None = None):
+        modo = (modo or "none").strip().lower()
+        if modo not in DURABILITY_MODES:
+            raise ValueError(f"durabilidade desconhecida: {modo!r} (use none, file ou group)")
+        if group_size:
+            group_size = _grupo(group_size)
+        elif self._modo is None and os.environ.get("POP_DURABILITY_GROUP"):
+            group_size = _grupo(os.environ["POP_DURABILITY_GROUP"])
+        if self._modo == "group" and modo != "group":
+            self.checkpoint()
+        self._modo = modo
+        if group_size:
+            self.group_size = group_size
+        # filhos de fork herdam o objeto; os de spawn recebem durability_config() explicitamente
+        if modo == "group" and self._finalizador is None:
+            from multiprocessing.util import register_after_fork
+            self._registra_saida()
+            register_after_fork(self, _Durabilidade._apos_fork)
+
+    def _registra_saida(self):
+        # roda no atexit do processo principal e na saída dos filhos do multiprocessing
+        from multiprocessing.util import Finalize
+        self._finalizador = Finalize(self, self.checkpoint, exitpriority=10)
+
+    def _apos_fork(self):
+        # o filho começa sem pendências nem travas herdadas, e com a própria finalização
+        self._lock, self._ckpt_lock, self._pendentes = threading.Lock(), threading.Lock(), []
+        self._registra_saida()
+
+    def fsync_fd(self, f):
+        t0 = time.perf_counter()
+        f.flush(); os.fsync(f.fileno())
+        self._conta("arquivos", time.perf_counter() - t0)
+
+    def fsync_path(self, path):
+        t0 = time.perf_counter()
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try: os.fsync(fd)
+        finally: os.close(fd)
+        self._conta("arquivos", time.perf_counter() - t0)
+
+    def fsync_dir(self, d):
+        if os.name == "nt":
+            return      # Windows não abre diretório para fsync; o NTFS registra o rename no journal
+        t0 = time.perf_counter()
+        fd = os.open(d, os.O_RDONLY)
+        try: os.fsync(fd)
+        finally: os.close(fd)
+        self._conta("diretorios", time.perf_counter() - t0)
+
+    def _conta(self, k, dt):
+        with self._lock:
+            self.stats[k] += 1
+            self.stats["fsync_s"] += dt
+
+    def adiciona(self, arquivo: Path, destino: Path | None):
+        with self._lock:
+            self._pendentes.append((arquivo, destino))
+            self._local.grupo = self.grupo
+            cheio = len(self._pendentes) >= self.group_size
+        if cheio:
+            self.checkpoint()
+
+    def checkpoint(self) -> int:
+        """Efetiva o grupo pendente: fsync dos arquivos, renames e um fsync por diretório."""
+        with self._ckpt_lock:       # grupos efetivados em ordem
+            with self._lock:
+                lote, self._pendentes = self._pendentes, []
+                grupo = self.grupo
+                if lote:
+                    self.grupo += 1
+            if not lote:
+                return 0
+            dirs = {}
+            for arquivo, destino in lote:
+                self.fsync_path(arquivo)
+            for arquivo, destino in lote:
+                if destino is not None:
+                    with file_lock(destino):
+                        os.replace(arquivo, destino)
+                dirs[(destino or arquivo).parent] = True
+            for d in dirs:
+                self.fsync_dir(d)
+            with self._lock:
+                self.efetivado = grupo
+                self.stats["checkpoints"] += 1
+            return len(lote)
+
+_DUR = _Durabilidade()
+
+def set_durability(mode: str, group_size: int | None = None) -> None:
+    """Troca o modo de durabilidade (none/file/group); sair de group efetiva o grupo pendente."""
+    _DUR.configura(mode, group_size)
+
+def get_durability() -> str:
+    """Modo atual; levanta ValueError se POP_DURABILITY for inválido e nada foi configurado."""
+    return _DUR.modo
+
+def durability_config() -> tuple:
+    """(modo, group_size) para repassar a processos filhos: set_durability(*durability_config())."""
+    return _DUR.modo, _DUR.group_size
+
+def checkpoint() -> int:
+    """Efetiva as entregas pendentes do modo group (no-op nos demais). Devolve quantas."""
+    return _DUR.checkpoint()
+
+def delivery_group() -> int:
+    """Grupo da última entrega desta thread no modo group (0 se nenhuma ficou pendente)."""
+    return getattr(_DUR._local, "grupo", 0)
+
+def committed_group() -> int:
+    """Último grupo efetivado: entregas de grupo <= este já estão no destino e duráveis."""
+    return _DUR.efetivado
+
+def durability_stats() -> dict:
+    """Contadores de fsync do processo (arquivos, diretórios, checkpoints, tempo em fsync)."""
+    modo = _DUR.modo
+    with _DUR._lock:
+        st = dict(_DUR.stats, modo=modo, pendentes=len(_DUR._pendentes))
+    st["fsync_ms"] = round(st.pop("fsync_s") * 1000, 3)
+    return st
+
+def sync_file(path) -> None:
+    """fsync de um arquivo já fechado (e do seu diretório), se a durabilidade não for none."""
+    if _DUR.modo != "none":
+        path = Path(path)
+        _DUR.fsync_path(path)
+        _DUR.fsync_dir(path.parent)
+
+_N_LOCKS = 256     # travas fixas em WORKDIR/locks; destinos distintos podem dividir uma
+
+@contextmanager
+def file_lock(target):
+    """
+    Trava exclusiva entre processos para `target`; serializa entregas no mesmo
+    destino. O caminho absoluto cai num de _N_LOCKS arquivos fixos
+    (WORKDIR/locks/<hh>.lock), para o diretório não crescer com os destinos;
+    dois destinos no mesmo balde apenas se esperam.
+    """
+    ensure_workdirs()
+    balde = int(hashlib.sha1(str(Path(target).resolve()).encode("utf-8")).hexdigest()[:8], 16) % _N_LOCKS
+    with open(WORKDIR / "locks" / f"{balde:02x}.lock", "a+b") as fh:
+        if os.name == "nt":
+            import msvcrt
+            fh.seek(0)
+            espera = 0.001
+            while True:
+                try:
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(espera)          # backoff em vez de girar a CPU
+                    espera = min(espera * 2, 0.05)
+            try:
+                yield
+            finally:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
 def deliver(src, dst) -> Path:
+    """
+    Copia `src` para `dst` de forma atômica (tmp + os.replace sob file_lock).
+    No modo group devolve `dst` antes de ele existir: o rename fica para o
+    próximo checkpoint().
+    """
     src, dst = Path(src), Path(dst)
     dst.parent.mkdir(parents=True, exist_ok=True)
-    tmp = dst.with_suffix(dst.suffix + ".tmp")
-    shutil.copy2(src, tmp); os.replace(tmp, dst)
+    # tmp exclusivo por escritor; a trava ordena entregas concorrentes no mesmo destino
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp")
+    if _DUR.modo == "group":
+        try:
+            shutil.copy2(src, tmp)
+        except BaseException:
+            if tmp.exists(): tmp.unlink()
+            raise
+        _DUR.adiciona(tmp, dst)     # rename no próximo checkpoint
+        return dst
+    with file_lock(dst):
+        try:
+            shutil.copy2(src, tmp)
+            if _DUR.modo == "file": _DUR.fsync_path(tmp)
+            os.replace(tmp, dst)
+        finally:
+            if tmp.exists(): tmp.unlink()
+    if _DUR.modo == "file": _DUR.fsync_dir(dst.parent)
     return dst
 
+
+def _grava(dst: Path, blob: bytes, fsync: bool = False):
+    with open(dst, "wb") as f:
+        f.write(blob)
+        if fsync: _DUR.fsync_fd(f)
+
+def stage_blob(job_id: str, blob: bytes, name: str) -> Path:
+    """Como stage_input, mas para conteúdo recebido em memória (ex.: upload HTTP)."""
+    dst = job_path("inbox", job_id, name)
+    _no_shard(dst, lambda d: _grava(d, blob))
+    return dst